@@ -1,12 +1,571 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import json
+from tkinter import ttk, messagebox, filedialog, font as tkfont
 import os
+import time
 from datetime import datetime
+from todo_engine import (FILTER_PREDICATES, SCHEDULE_FILTERS, TaskEngine, current_seconds, current_timestamp,
+                         display_key, parse_when, read_import_file)
+from todo_perf import PerfMonitor
+# todo_analytics, todo_export and todo_rpc (which pulls in asyncio) are imported
+# when first used, so they add nothing to startup
 
-class ModernTodoApp:
+# Virtualized list layout: every card occupies a fixed-height slot on the canvas
+TASK_ROW_HEIGHT = 130
+VIRTUAL_OVERSCAN = 2
+VIRTUAL_TEXT_LIMIT = 100
+
+# Filter combobox labels and the filter each one selects
+FILTER_KEYS = {
+    "All": 'all',
+    "📋 Pending": 'pending',
+    "✅ Completed": 'completed',
+    "🔴 High Priority": 'high',
+    "🟡 Medium Priority": 'medium',
+    "🟢 Low Priority": 'low',
+    "⏰ Overdue": 'overdue'
+}
+
+# Timing spans for the handlers below. TODO_PERF_LOG=<file> appends every span as a
+# JSON line, TODO_PROFILE=<file> records a cProfile of the whole session, and
+# TODO_PERF_OVERLAY=1 shows the overlay at startup (F12 toggles it, Ctrl+Shift+P
+# starts and stops a cProfile capture).
+PERF = PerfMonitor(os.environ.get("TODO_PERF_LOG"))
+PERF_OVERLAY_INTERVAL_MS = 500
+
+# Progressive startup: the first batch is shown before mainloop starts, the rest is
+# loaded in slices of at most LOAD_STEP_SECONDS between events
+LOAD_BATCH_SIZE = 2000
+LOAD_STEP_SECONDS = 0.012
+
+# Search runs once typing pauses for this long
+SEARCH_DEBOUNCE_MS = 150
+
+# Other windows and scripts may save the same file: how often to look for their
+# changes, and above how many at once the list is rebuilt instead of patched
+EXTERNAL_POLL_MS = 1000
+EXTERNAL_RECONCILE_LIMIT = 50
+
+# With TODO_ARCHIVE_DAYS set (e.g. 30), tasks completed more than that many days ago
+# move to per-month archive files at startup; the Completed filter and searches
+# still show them. Off by default (None), like the command line's --archive-days;
+# TODO_ARCHIVE_DAYS=0 turns it off too.
+DEFAULT_ARCHIVE_DAYS = None
+
+# TODO_RPC_SOCKET=<path> serves the tasks over JSON-RPC on that Unix socket (see
+# todo_rpc). Requests queued by the server thread are run this often, for at most
+# RPC_DRAIN_SECONDS per slice, each slice as one save and one redraw.
+RPC_DRAIN_MS = 15
+RPC_DRAIN_SECONDS = 0.008
+
+# Reminders and due dates share one timer, set for whichever comes first; it also
+# wakes up at least this often, in case the clock was changed or the machine slept.
+# A burst of reminders is listed in one dialog, up to REMINDER_LIST_LIMIT of them.
+REMINDER_MAX_WAIT_MS = 60000
+REMINDER_LIST_LIMIT = 10
+
+# Analytics window: column charts of this size, redrawn at most this often while
+# tasks change (the report itself is cached until they do)
+ANALYTICS_CHART_WIDTH = 480
+ANALYTICS_CHART_HEIGHT = 110
+ANALYTICS_REFRESH_MS = 1000
+
+# Exports read the shown list on this thread in slices of at most EXPORT_STEP_SECONDS,
+# this often, while a worker thread writes the file; the dialog shows how far it got
+EXPORT_STEP_MS = 1
+EXPORT_STEP_SECONDS = 0.008
+
+# Bindtags of card widgets. The app binds these once with bind_class, and the
+# handlers find the card from the widget the event came from, so building a card
+# binds nothing and allocates no closures.
+CARD_TAG = "TodoCard"
+CARD_HOVER_TAG = "TodoCardHover"
+CARD_BUTTON_TAG = "TodoCardButton"
+
+# Subtasks are indented this much per level, down to SUBTASK_MAX_DEPTH levels
+SUBTASK_INDENT = 24
+SUBTASK_MAX_DEPTH = 8
+
+class RenderScheduler:
+    # Redraw work requested by handlers, done at most once per frame. Handlers mark
+    # regions dirty; a single after_idle pass, which runs once the current burst of
+    # events has been handled, renders the dirty regions in pass order. A region can
+    # cover others (a rebuilt list comes with fresh rows and stats), which are then
+    # skipped. requested - rendered is the number of redraws that were coalesced.
     def __init__(self, root):
         self.root = root
+        self.passes = []
+        self.dirty = set()
+        self.job = None
+        self.requested = 0
+        self.rendered = 0
+        self.frames = 0
+    
+    def add_pass(self, region, render, covers=()):
+        self.passes.append((region, render, set(covers)))
+    
+    def mark(self, region):
+        self.requested += 1
+        self.dirty.add(region)
+        if self.job is None:
+            self.job = self.root.after_idle(self.render_frame)
+    
+    def pending(self, region):
+        return region in self.dirty
+    
+    @property
+    def coalesced(self):
+        return self.requested - self.rendered
+    
+    @PERF.timed
+    def render_frame(self):
+        # Also called directly when something needs the display current right away
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+        dirty, self.dirty = self.dirty, set()
+        if not dirty:
+            return
+        self.frames += 1
+        for region, render, covers in self.passes:
+            if region in dirty:
+                dirty -= covers
+                render()
+                self.rendered += 1
+
+def format_times(task, overdue, progress=None):
+    # The bottom line of a card: when the task was created and, if set, when it is
+    # due, then how many of its subtasks are done
+    text = f"Created: {task['created_at']}"
+    if 'due_at' in task:
+        text += f"  •  {'⚠️ Overdue since' if overdue else '⏰ Due'} {task['due_at']}"
+    if progress is not None:
+        text += f"  •  ☑️ {progress[0]}/{progress[1]} subtasks"
+    return text
+
+def draw_columns(canvas, columns, color, text_color):
+    # A column chart of (label, count) pairs on an emptied canvas, scaled to the largest count
+    canvas.delete('all')
+    largest = max([count for _, count in columns] + [1])
+    slot = ANALYTICS_CHART_WIDTH / max(len(columns), 1)
+    bottom = ANALYTICS_CHART_HEIGHT - 16
+    for position, (label, count) in enumerate(columns):
+        left = position * slot
+        top = bottom - (bottom - 14) * count / largest
+        canvas.create_rectangle(left + 3, top, left + slot - 3, bottom, fill=color, width=0)
+        canvas.create_text(left + slot / 2, top - 2, text=f"{count:,}", anchor='s', fill=text_color, font=('Segoe UI', 7))
+        canvas.create_text(left + slot / 2, bottom + 2, text=label, anchor='n', fill=text_color, font=('Segoe UI', 7))
+
+def format_size(size):
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+class Theme:
+    # Colour tokens and named fonts shared by every card and row, made once per app
+    # from its colour scheme. A card refers to a font by name instead of passing a
+    # font tuple that Tk parses again for each label.
+    def __init__(self, root, colors):
+        self.colors = dict(colors,
+                           card_bg='#353560',
+                           card_hover='#404070',
+                           edit_hover='#0a2c50',
+                           delete_hover='#c23e37')
+        self.fonts = {
+            'task': tkfont.Font(root, family='Segoe UI', size=12),
+            'task_done': tkfont.Font(root, family='Segoe UI', size=12, overstrike=1),
+            'checkbox': tkfont.Font(root, family='Segoe UI', size=16, weight='bold'),
+            'badge': tkfont.Font(root, family='Segoe UI', size=10, weight='bold'),
+            'small': tkfont.Font(root, family='Segoe UI', size=9)
+        }
+        self.priority_colors = {
+            'High': colors['danger'],
+            'Medium': colors['warning'],
+            'Low': colors['success']
+        }
+
+def tag_widget(widget, tag, widget_class):
+    # After the widget's own and its class bindings (a button is drawn released before
+    # the tag's handler runs), before the toplevel and 'all' ones
+    widget.bindtags((str(widget), widget_class, tag, '.', 'all'))
+
+class TaskCard:
+    # A task card that can be rebound to a different task dict
+    def __init__(self, app, parent):
+        self.app = app
+        self.task = None
+        self.row = None
+        self.window = None
+        self.indent = 0
+        self.placed_indent = None
+        self._options = {}
+        theme = app.theme
+        colors = theme.colors
+        fonts = theme.fonts
+        card_bg = colors['card_bg']
+        
+        # Modern task card; the frame leads the card's widgets back to the card
+        self.frame = tk.Frame(parent, bg=card_bg, relief='flat', bd=0)
+        self.frame.task_card = self
+        
+        # Task content
+        content_frame = tk.Frame(self.frame, bg=card_bg)
+        content_frame.pack(fill=tk.X, padx=20, pady=15)
+        
+        # Top row: checkbox, text, priority
+        top_row = tk.Frame(content_frame, bg=card_bg)
+        top_row.pack(fill=tk.X, pady=(0, 10))
+        
+        # Expander, blank unless the task has subtasks
+        self.expand_btn = tk.Button(top_row, 
+                                    font=fonts['badge'],
+                                    bg=card_bg,
+                                    fg=colors['text_muted'],
+                                    activebackground=card_bg,
+                                    relief='flat',
+                                    bd=0,
+                                    width=1,
+                                    cursor='hand2')
+        self.expand_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
+        # Custom checkbox
+        checkbox_frame = tk.Frame(top_row, bg=card_bg)
+        checkbox_frame.pack(side=tk.LEFT, padx=(0, 15))
+        
+        self.checkbox_btn = tk.Button(checkbox_frame, 
+                                      font=fonts['checkbox'],
+                                      fg=colors['text'],
+                                      relief='flat',
+                                      bd=0,
+                                      width=2, 
+                                      height=1,
+                                      cursor='hand2')
+        self.checkbox_btn.pack()
+        
+        # Task text
+        text_frame = tk.Frame(top_row, bg=card_bg)
+        text_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.task_label = tk.Label(text_frame, 
+                                   bg=card_bg, 
+                                   anchor='w',
+                                   justify='left',
+                                   wraplength=400)
+        self.task_label.pack(anchor='w')
+        
+        # Priority badge
+        priority_frame = tk.Frame(top_row, bg=card_bg)
+        priority_frame.pack(side=tk.RIGHT, padx=(10, 0))
+        
+        self.priority_badge = tk.Label(priority_frame, 
+                                       font=fonts['badge'],
+                                       bg=card_bg)
+        self.priority_badge.pack()
+        
+        # Bottom row: timestamp and actions
+        bottom_row = tk.Frame(content_frame, bg=card_bg)
+        bottom_row.pack(fill=tk.X, pady=(5, 0))
+        
+        # Timestamp
+        self.time_label = tk.Label(bottom_row, 
+                                   font=fonts['small'],
+                                   bg=card_bg, 
+                                   fg=colors['text_muted'])
+        self.time_label.pack(side=tk.LEFT)
+        
+        # Action buttons
+        actions_frame = tk.Frame(bottom_row, bg=card_bg)
+        actions_frame.pack(side=tk.RIGHT)
+        
+        # Modern buttons
+        self.subtask_btn = tk.Button(actions_frame, 
+                                     text="➕ Subtask", 
+                                     bg=colors['secondary'], 
+                                     fg=colors['text'],
+                                     font=fonts['small'],
+                                     relief='flat', 
+                                     bd=0,
+                                     padx=12, 
+                                     pady=4,
+                                     cursor='hand2')
+        self.subtask_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.edit_btn = tk.Button(actions_frame, 
+                                  text="✏️ Edit", 
+                                  bg=colors['secondary'], 
+                                  fg=colors['text'],
+                                  font=fonts['small'],
+                                  relief='flat', 
+                                  bd=0,
+                                  padx=12, 
+                                  pady=4,
+                                  cursor='hand2')
+        self.edit_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.delete_btn = tk.Button(actions_frame, 
+                                    text="🗑️ Delete", 
+                                    bg=colors['danger'], 
+                                    fg=colors['text'],
+                                    font=fonts['small'],
+                                    relief='flat', 
+                                    bd=0,
+                                    padx=12, 
+                                    pady=4,
+                                    cursor='hand2')
+        self.delete_btn.pack(side=tk.LEFT)
+        
+        # Event handling comes from the tags: the buttons act on release and light
+        # up on hover, the frame lights up on hover, and a click anywhere else on the
+        # card selects it (see ModernTodoApp.setup_card_bindings)
+        for button in (self.expand_btn, self.checkbox_btn, self.subtask_btn, self.edit_btn, self.delete_btn):
+            tag_widget(button, CARD_BUTTON_TAG, 'Button')
+        tag_widget(self.frame, CARD_HOVER_TAG, 'Frame')
+        for widget in (content_frame, top_row, text_frame, priority_frame, bottom_row):
+            tag_widget(widget, CARD_TAG, 'Frame')
+        for widget in (self.task_label, self.priority_badge, self.time_label):
+            tag_widget(widget, CARD_TAG, 'Label')
+    
+    def set_hover(self, hovered):
+        colors = self.app.theme.colors
+        self.frame.config(bg=colors['card_hover'] if hovered else colors['card_bg'])
+    
+    def set_button_hover(self, button, hovered):
+        colors = self.app.theme.colors
+        if button is self.edit_btn or button is self.subtask_btn:
+            button.config(bg=colors['edit_hover'] if hovered else colors['secondary'])
+        elif button is self.delete_btn:
+            button.config(bg=colors['delete_hover'] if hovered else colors['danger'])
+    
+    def bind_task(self, task, text_limit=None):
+        self.task = task
+        theme = self.app.theme
+        colors = theme.colors
+        
+        text = task['text']
+        if text_limit and len(text) > text_limit:
+            text = text[:text_limit - 1] + "…"
+        
+        if task['completed']:
+            self._configure(self.checkbox_btn, text="✓", bg=colors['success'])
+            self._configure(self.task_label, text=text, fg=colors['text_muted'],
+                            font=theme.fonts['task_done'])
+        else:
+            self._configure(self.checkbox_btn, text="○", bg=colors['border'])
+            self._configure(self.task_label, text=text, fg=colors['text'],
+                            font=theme.fonts['task'])
+        
+        self._configure(self.priority_badge, text=f"● {task['priority']}",
+                        fg=theme.priority_colors.get(task['priority'], colors['text_muted']))
+        overdue = task['id'] in self.app.engine.schedule.overdue_ids
+        progress = self.app.engine.tree.progress(task['id'])
+        self._configure(self.time_label, text=format_times(task, overdue, progress),
+                        fg=colors['danger'] if overdue else colors['text_muted'])
+        self._configure(self.expand_btn, text=self.app.expander_of(task, progress))
+        self.indent = self.app.indent_of(task)
+        
+        selected = task['id'] in self.app.selected
+        self._configure(self.frame,
+                        highlightthickness=2 if selected else 0,
+                        highlightbackground=colors['accent'],
+                        highlightcolor=colors['accent'])
+    
+    def place(self, row, width):
+        canvas = self.app.canvas
+        canvas.coords(self.window, 20 + self.indent, row * TASK_ROW_HEIGHT + 8)
+        canvas.itemconfigure(self.window, width=max(width - 40 - self.indent, 1), state='normal')
+        self.row = row
+        self.placed_indent = self.indent
+    
+    def hide(self):
+        self.app.canvas.itemconfigure(self.window, state='hidden')
+        self.row = None
+    
+    def _configure(self, widget, **options):
+        # Only push options that actually changed since the last bind
+        current = self._options.setdefault(widget, {})
+        changed = {key: value for key, value in options.items() if current.get(key) != value}
+        if changed:
+            widget.config(**changed)
+            current.update(changed)
+
+class CanvasRow:
+    # A task row drawn straight onto the list canvas: the same card as TaskCard
+    # made of ten canvas items instead of fifteen packed widgets. The items have
+    # no bindings of their own; the app hit-tests clicks and pointer motion with
+    # part_at(). Every item carries the row's tag, so moving or hiding the row
+    # is a single canvas call.
+    CHECKBOX_SIZE = 34
+    EXPANDER_WIDTH = 16
+    BUTTON_HEIGHT = 24
+    SUBTASK_WIDTH = 96
+    EDIT_WIDTH = 72
+    DELETE_WIDTH = 86
+    
+    def __init__(self, app, canvas, slot):
+        self.app = app
+        self.canvas = canvas
+        self.task = None
+        self.row = None
+        self.top = None
+        self.width = None
+        self.indent = 0
+        self.placed_indent = None
+        self.hover = None
+        self.parts = []
+        self.tag = f"row{slot}"
+        self._options = {}
+        theme = app.theme
+        colors = theme.colors
+        fonts = theme.fonts
+        
+        def item(create, **options):
+            return create(0, 0, 0, 0, tags=(self.tag,), state='hidden', **options)
+        
+        def label(**options):
+            return canvas.create_text(0, 0, tags=(self.tag,), state='hidden', **options)
+        
+        self.background = item(canvas.create_rectangle, fill=colors['card_bg'], outline=colors['accent'], width=0)
+        self.expand_label = label(font=fonts['badge'], fill=colors['text_muted'])
+        self.checkbox = item(canvas.create_rectangle, fill=colors['border'], width=0)
+        self.check_mark = label(font=fonts['checkbox'], fill=colors['text'])
+        self.task_label = label(anchor='nw', font=fonts['task'], fill=colors['text'], width=400)
+        self.priority_badge = label(anchor='ne', font=fonts['badge'])
+        self.time_label = label(anchor='w', font=fonts['small'], fill=colors['text_muted'])
+        self.subtask_btn = item(canvas.create_rectangle, fill=colors['secondary'], width=0)
+        self.subtask_label = label(text="➕ Subtask", font=fonts['small'], fill=colors['text'])
+        self.edit_btn = item(canvas.create_rectangle, fill=colors['secondary'], width=0)
+        self.edit_label = label(text="✏️ Edit", font=fonts['small'], fill=colors['text'])
+        self.delete_btn = item(canvas.create_rectangle, fill=colors['danger'], width=0)
+        self.delete_label = label(text="🗑️ Delete", font=fonts['small'], fill=colors['text'])
+    
+    def bind_task(self, task, text_limit=None):
+        if self.task is not None and self.task['id'] != task['id']:
+            self.set_hover(None)
+        self.task = task
+        theme = self.app.theme
+        colors = theme.colors
+        
+        text = task['text']
+        if text_limit and len(text) > text_limit:
+            text = text[:text_limit - 1] + "…"
+        
+        if task['completed']:
+            self._configure(self.checkbox, fill=colors['success'])
+            self._configure(self.check_mark, text="✓")
+            self._configure(self.task_label, text=text, fill=colors['text_muted'],
+                            font=theme.fonts['task_done'])
+        else:
+            self._configure(self.checkbox, fill=colors['border'])
+            self._configure(self.check_mark, text="○")
+            self._configure(self.task_label, text=text, fill=colors['text'],
+                            font=theme.fonts['task'])
+        
+        self._configure(self.priority_badge, text=f"● {task['priority']}",
+                        fill=theme.priority_colors.get(task['priority'], colors['text_muted']))
+        overdue = task['id'] in self.app.engine.schedule.overdue_ids
+        progress = self.app.engine.tree.progress(task['id'])
+        self._configure(self.time_label, text=format_times(task, overdue, progress),
+                        fill=colors['danger'] if overdue else colors['text_muted'])
+        self._configure(self.expand_label, text=self.app.expander_of(task, progress))
+        self._configure(self.background, width=2 if task['id'] in self.app.selected else 0)
+        self.indent = self.app.indent_of(task)
+    
+    def place(self, row, width):
+        # Moving to another row is one canvas.move of the row's tag; only a new
+        # width or indent lays the items out again
+        top = row * TASK_ROW_HEIGHT + 8
+        if width != self.width or self.indent != self.placed_indent:
+            self.layout(top, width)
+        elif top != self.top:
+            self.canvas.move(self.tag, 0, top - self.top)
+        self.top = top
+        if self.row is None:
+            self.canvas.itemconfigure(self.tag, state='normal')
+        self.row = row
+    
+    def hide(self):
+        if self.row is not None:
+            self.canvas.itemconfigure(self.tag, state='hidden')
+            self.row = None
+            self.set_hover(None)
+    
+    def layout(self, top, width):
+        # The card spans the canvas less 20px each side (and its indent), like the
+        # card windows; parts remember their boxes relative to the card top for part_at()
+        canvas = self.canvas
+        left, right = 20 + self.indent, max(width - 20, 80 + self.indent)
+        height = TASK_ROW_HEIGHT - 16
+        inner_left, inner_right = left + 20, right - 20
+        size = self.CHECKBOX_SIZE
+        checkbox_left = inner_left + self.EXPANDER_WIDTH + 5
+        text_left = checkbox_left + size + 15
+        button_bottom = height - 15
+        button_top = button_bottom - self.BUTTON_HEIGHT
+        delete_left = inner_right - self.DELETE_WIDTH
+        edit_right = delete_left - 5
+        edit_left = edit_right - self.EDIT_WIDTH
+        subtask_right = edit_left - 5
+        subtask_left = subtask_right - self.SUBTASK_WIDTH
+        
+        boxes = {
+            'expand': (inner_left, 15, inner_left + self.EXPANDER_WIDTH, 15 + size),
+            'checkbox': (checkbox_left, 15, checkbox_left + size, 15 + size),
+            'subtask': (subtask_left, button_top, subtask_right, button_bottom),
+            'edit': (edit_left, button_top, edit_right, button_bottom),
+            'delete': (delete_left, button_top, inner_right, button_bottom),
+            'card': (left, 0, right, height)
+        }
+        for item, part in ((self.background, 'card'), (self.checkbox, 'checkbox'), (self.subtask_btn, 'subtask'),
+                           (self.edit_btn, 'edit'), (self.delete_btn, 'delete')):
+            x1, y1, x2, y2 = boxes[part]
+            canvas.coords(item, x1, top + y1, x2, top + y2)
+        for item, part in ((self.expand_label, 'expand'), (self.check_mark, 'checkbox'), (self.subtask_label, 'subtask'),
+                           (self.edit_label, 'edit'), (self.delete_label, 'delete')):
+            x1, y1, x2, y2 = boxes[part]
+            canvas.coords(item, (x1 + x2) / 2, top + (y1 + y2) / 2)
+        canvas.coords(self.task_label, text_left, top + 15)
+        canvas.coords(self.priority_badge, inner_right, top + 15)
+        canvas.coords(self.time_label, inner_left, top + (button_top + button_bottom) / 2)
+        # Wrap like the label's wraplength, leaving room for the priority badge
+        self._configure(self.task_label, width=max(min(400, inner_right - 90 - text_left), 40))
+        
+        # Buttons first: they sit on top of the card
+        self.parts = [(part, boxes[part]) for part in ('expand', 'checkbox', 'subtask', 'edit', 'delete', 'card')]
+        self.width = width
+        self.placed_indent = self.indent
+    
+    def part_at(self, x, y):
+        # 'expand', 'checkbox', 'subtask', 'edit', 'delete', 'card' or None (the gap
+        # between cards)
+        if self.row is None:
+            return None
+        y -= self.top
+        for part, (x1, y1, x2, y2) in self.parts:
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                return part
+        return None
+    
+    def set_hover(self, part):
+        if part == self.hover:
+            return
+        self.hover = part
+        colors = self.app.theme.colors
+        self._configure(self.background, fill=colors['card_hover'] if part else colors['card_bg'])
+        self._configure(self.subtask_btn, fill=colors['edit_hover'] if part == 'subtask' else colors['secondary'])
+        self._configure(self.edit_btn, fill=colors['edit_hover'] if part == 'edit' else colors['secondary'])
+        self._configure(self.delete_btn, fill=colors['delete_hover'] if part == 'delete' else colors['danger'])
+    
+    def _configure(self, item, **options):
+        # Only push options that actually changed since the last bind
+        current = self._options.setdefault(item, {})
+        changed = {key: value for key, value in options.items() if current.get(key) != value}
+        if changed:
+            self.canvas.itemconfigure(item, **changed)
+            current.update(changed)
+
+class ModernTodoApp:
+    def __init__(self, root, virtualized=True, storage_kind='json', save_interval=None, progressive=True,
+                 renderer='widgets', archive_days=None, rpc_socket=None):
+        self.root = root
         self.root.title("✨ Modern To-Do Manager")
         self.root.geometry("800x700")
         self.root.configure(bg='#1a1a2e')
@@ -28,14 +587,93 @@ class ModernTodoApp:
             'border': '#3a3a5a'
         }
         
+        # Instrumentation; a session profile has to start before the tasks are loaded
+        self.perf = PERF
+        self.profile_path = os.environ.get("TODO_PROFILE")
+        if self.profile_path:
+            self.perf.start_profile()
+        self.perf_overlay = None
+        self.perf_job = None
+        self.loop_tick = None
+        
         # File to store tasks
         self.data_file = "tasks.json"
-        self.tasks = self.load_tasks()
-        
-        # Configure ttk styles
+        self.engine = TaskEngine(self.data_file, 
+                                 storage_kind, 
+                                 save_interval,
+                                 on_error=self.report_save_error,
+                                 verify_stats=os.environ.get("TODO_VERIFY_STATS") == "1",
+                                 on_external_change=self.apply_external_changes,
+                                 archive_days=archive_days)
+        if progressive:
+            self.start_loading()
+        else:
+            self.load_tasks()
+        self.store = self.engine.store
+        self.stats = self.engine.stats
+        
+        # Virtualized list: a pool of cards rebound to the rows inside the viewport.
+        # With renderer='canvas' the pool holds CanvasRows drawn on the list canvas
+        # instead of TaskCard widgets; that needs the fixed-height virtual rows.
+        self.virtualized = virtualized
+        self.renderer = renderer if virtualized else 'widgets'
+        self.query_view = self.engine.storage.supports_queries
+        self.card_pool = []
+        self.viewport = None
+        self.hover_card = None
+        self.canvas_cursor = ''
+        
+        # Reconciliation state: the displayed rows in order and the card bound to each
+        # task id, and whether the rows are an outline (subtasks under their parents)
+        self.visible_tasks = []
+        self.task_cards = {}
+        self.empty_state = None
+        self.outline_shown = False
+        
+        # Search text applied on top of the filter, and the pending debounce timer
+        self.search_query = ""
+        self.search_job = None
+        
+        # Selected task ids for bulk actions, and where a Shift+click range starts
+        self.selected = set()
+        self.selection_anchor = None
+        
+        # Redraws requested by handlers are done once per frame, in this order
+        self.render = RenderScheduler(self.root)
+        self.render.add_pass('list', self.refresh_task_list, covers=('rows', 'scrollregion', 'stats'))
+        self.render.add_pass('rows', self.render_rows)
+        self.render.add_pass('scrollregion', self.update_frame_scrollregion)
+        self.render.add_pass('selection', self.update_selection)
+        self.render.add_pass('stats', self.update_stats)
+        self.flash_job = None
+        self.flash_bg = None
+        self.reminder_job = None
+        self.reminders_since = None
+        self.analytics = None
+        self.analytics_window = None
+        self.analytics_job = None
+        self.analytics_shown = None
+        self.export = None
+        self.export_window = None
+        self.export_job = None
+        
+        # Configure ttk styles, the shared card fonts and the card event handlers
         self.setup_styles()
+        self.theme = Theme(self.root, self.colors)
+        self.setup_card_bindings()
         self.setup_ui()
         self.refresh_task_list()
+        self.setup_perf_hooks()
+        if self.engine.loading:
+            self.root.after(1, self.continue_loading)
+        else:
+            self.start_reminders()
+        self.root.after(EXTERNAL_POLL_MS, self.poll_external)
+        self.rpc = None
+        if rpc_socket:
+            self.start_rpc(rpc_socket)
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def setup_styles(self):
         style = ttk.Style()
@@ -177,6 +815,36 @@ class ModernTodoApp:
         # Hover effects
         add_btn.bind('<Enter>', lambda e: add_btn.config(bg='#d63851'))
         add_btn.bind('<Leave>', lambda e: add_btn.config(bg=self.colors['accent']))
+        
+        import_btn = tk.Button(controls_row, 
+                              text="📥 Import", 
+                              command=self.import_tasks,
+                              bg=self.colors['secondary'], 
+                              fg=self.colors['text'], 
+                              font=('Segoe UI', 11, 'bold'),
+                              relief='flat', 
+                              bd=0,
+                              padx=20, 
+                              pady=12,
+                              cursor='hand2')
+        import_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        import_btn.bind('<Enter>', lambda e: import_btn.config(bg='#0a2c50'))
+        import_btn.bind('<Leave>', lambda e: import_btn.config(bg=self.colors['secondary']))
+        
+        export_btn = tk.Button(controls_row, 
+                              text="📤 Export", 
+                              command=self.export_tasks,
+                              bg=self.colors['secondary'], 
+                              fg=self.colors['text'], 
+                              font=('Segoe UI', 11, 'bold'),
+                              relief='flat', 
+                              bd=0,
+                              padx=20, 
+                              pady=12,
+                              cursor='hand2')
+        export_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        export_btn.bind('<Enter>', lambda e: export_btn.config(bg='#0a2c50'))
+        export_btn.bind('<Leave>', lambda e: export_btn.config(bg=self.colors['secondary']))
     
     def create_filter_section(self, parent):
         filter_card = tk.Frame(parent, bg=self.colors['card'])
@@ -197,13 +865,13 @@ class ModernTodoApp:
         self.filter_var = tk.StringVar(value="All")
         filter_combo = ttk.Combobox(filter_row, 
                                   textvariable=self.filter_var,
-                                  values=["All", "📋 Pending", "✅ Completed", "🔴 High Priority", "🟡 Medium Priority", "🟢 Low Priority"],
+                                  values=list(FILTER_KEYS),
                                   state="readonly", 
                                   style='Modern.TCombobox',
                                   width=18,
                                   font=('Segoe UI', 10))
         filter_combo.pack(side=tk.LEFT, padx=(15, 0))
-        filter_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_task_list())
+        filter_combo.bind('<<ComboboxSelected>>', lambda e: self.on_filter_changed())
         
         # Quick stats
         self.quick_stats = tk.Label(filter_row, text="", 
@@ -211,6 +879,72 @@ class ModernTodoApp:
                                    bg=self.colors['card'], 
                                    fg=self.colors['text_muted'])
         self.quick_stats.pack(side=tk.RIGHT)
+        
+        # Search row: every word typed must start a word of the task, within the selected filter
+        search_row = tk.Frame(filter_content, bg=self.colors['card'])
+        search_row.pack(fill=tk.X, pady=(12, 0))
+        
+        tk.Label(search_row, text="🔎 Search:", 
+                font=('Segoe UI', 12, 'bold'), 
+                bg=self.colors['card'], 
+                fg=self.colors['text']).pack(side=tk.LEFT)
+        
+        search_frame = tk.Frame(search_row, bg=self.colors['secondary'])
+        search_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(15, 0))
+        
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame, 
+                                    textvariable=self.search_var,
+                                    font=('Segoe UI', 11), 
+                                    bg=self.colors['secondary'],
+                                    fg=self.colors['text'],
+                                    insertbackground=self.colors['text'],
+                                    relief='flat',
+                                    bd=0)
+        self.search_entry.pack(fill=tk.X, padx=10, pady=6)
+        
+        # The word index is built on focus, so it is ready by the first keystroke
+        self.search_entry.bind('<FocusIn>', lambda e: self.engine.search_index)
+        self.search_entry.bind('<Escape>', lambda e: self.search_var.set(""))
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        
+        # Bulk actions, shown while any card is selected
+        self.bulk_bar = tk.Frame(filter_content, bg=self.colors['card'])
+        self.bulk_bar_shown = False
+        
+        self.bulk_label = tk.Label(self.bulk_bar, text="", 
+                                  font=('Segoe UI', 11, 'bold'), 
+                                  bg=self.colors['card'], 
+                                  fg=self.colors['accent'])
+        self.bulk_label.pack(side=tk.LEFT)
+        
+        for text, command, color in (("✅ Complete", self.complete_selected, self.colors['success']),
+                                     ("🗑️ Delete", self.delete_selected, self.colors['danger']),
+                                     ("✖ Clear", self.clear_selection, self.colors['border'])):
+            tk.Button(self.bulk_bar, 
+                     text=text, 
+                     command=command,
+                     bg=color, 
+                     fg=self.colors['text'],
+                     font=('Segoe UI', 9, 'bold'),
+                     relief='flat', 
+                     bd=0,
+                     padx=12, 
+                     pady=4,
+                     cursor='hand2').pack(side=tk.RIGHT, padx=(5, 0))
+        
+        self.bulk_priority_var = tk.StringVar(value="Set priority")
+        bulk_priority = ttk.Combobox(self.bulk_bar, 
+                                    textvariable=self.bulk_priority_var,
+                                    values=["🔴 High", "🟡 Medium", "🟢 Low"], 
+                                    state="readonly",
+                                    style='Modern.TCombobox',
+                                    width=12,
+                                    font=('Segoe UI', 10))
+        bulk_priority.pack(side=tk.RIGHT, padx=(5, 0))
+        bulk_priority.bind('<<ComboboxSelected>>', lambda e: self.set_selected_priority())
+        
+        self.root.bind('<Escape>', lambda e: self.clear_selection())
     
     def create_task_list_section(self, parent):
         # Task list container
@@ -238,13 +972,24 @@ class ModernTodoApp:
         scrollbar = ttk.Scrollbar(scroll_frame, orient="vertical", command=self.canvas.yview)
         self.scrollable_frame = tk.Frame(self.canvas, bg=self.colors['card'])
         
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        if self.virtualized:
+            # Scrollregion follows the row count; the viewport is rebound on every scroll
+            self.canvas.configure(yscrollcommand=lambda first, last: self._on_canvas_scroll(scrollbar, first, last))
+            self.canvas.bind("<Configure>", lambda e: self.render.mark('rows'))
+        else:
+            # Every card resize reports here; the bbox is measured once per frame
+            self.scrollable_frame.bind("<Configure>", lambda e: self.render.mark('scrollregion'))
+            self.canvas.configure(yscrollcommand=scrollbar.set)
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.frame_window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        
+        if self.renderer == 'canvas':
+            # Drawn rows have no widgets to bind: clicks and hover are hit-tested here
+            self.canvas.bind('<Button-1>', lambda e: self.on_row_click(e, 'single'))
+            self.canvas.bind('<Control-Button-1>', lambda e: self.on_row_click(e, 'toggle'))
+            self.canvas.bind('<Shift-Button-1>', lambda e: self.on_row_click(e, 'range'))
+            self.canvas.bind('<Motion>', lambda e: self.set_hover_row(*self.row_at(e)))
+            self.canvas.bind('<Leave>', lambda e: self.set_hover_row(None, None))
         
         self.canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -255,18 +1000,117 @@ class ModernTodoApp:
     def _on_mousewheel(self, event):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
     
+    def _on_canvas_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        self.update_viewport()
+    
+    def setup_card_bindings(self):
+        root = self.root
+        root.bind_class(CARD_TAG, '<Button-1>', lambda e: self.on_card_click(e, 'single'))
+        root.bind_class(CARD_TAG, '<Control-Button-1>', lambda e: self.on_card_click(e, 'toggle'))
+        root.bind_class(CARD_TAG, '<Shift-Button-1>', lambda e: self.on_card_click(e, 'range'))
+        root.bind_class(CARD_HOVER_TAG, '<Enter>', lambda e: self.card_of(e.widget).set_hover(True))
+        root.bind_class(CARD_HOVER_TAG, '<Leave>', lambda e: self.card_of(e.widget).set_hover(False))
+        root.bind_class(CARD_BUTTON_TAG, '<Enter>', lambda e: self.card_of(e.widget).set_button_hover(e.widget, True))
+        root.bind_class(CARD_BUTTON_TAG, '<Leave>', lambda e: self.card_of(e.widget).set_button_hover(e.widget, False))
+        root.bind_class(CARD_BUTTON_TAG, '<ButtonRelease-1>', self.on_card_button)
+    
+    def card_of(self, widget):
+        # The TaskCard a card widget belongs to: the nearest frame that knows it
+        while not hasattr(widget, 'task_card'):
+            widget = widget.master
+        return widget.task_card
+    
+    @PERF.timed
+    def on_card_click(self, event, mode):
+        self.select_task(self.card_of(event.widget).task, mode)
+    
+    @PERF.timed
+    def on_card_button(self, event):
+        # Like a button's command: only when released over the button it was pressed on
+        button = event.widget
+        if not (0 <= event.x < button.winfo_width() and 0 <= event.y < button.winfo_height()):
+            return
+        card = self.card_of(button)
+        task_id = card.task['id']
+        if button is card.checkbox_btn:
+            self.toggle_task(task_id)
+        elif button is card.expand_btn:
+            self.toggle_expanded(task_id)
+        elif button is card.subtask_btn:
+            self.add_subtask(task_id)
+        elif button is card.edit_btn:
+            self.edit_task(task_id)
+        elif button is card.delete_btn:
+            self.delete_task(task_id)
+    
+    def row_at(self, event):
+        # The drawn row under the pointer and the part of it there, or (None, None)
+        if not self.card_pool:
+            return None, None
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        row = int(y) // TASK_ROW_HEIGHT
+        card = self.card_pool[row % len(self.card_pool)]
+        part = card.part_at(x, y) if card.row == row else None
+        return (card, part) if part else (None, None)
+    
+    @PERF.timed
+    def on_row_click(self, event, mode):
+        card, part = self.row_at(event)
+        if card is None:
+            return
+        if part == 'checkbox':
+            self.toggle_task(card.task['id'])
+        elif part == 'expand':
+            self.toggle_expanded(card.task['id'])
+        elif part == 'subtask':
+            self.add_subtask(card.task['id'])
+        elif part == 'edit':
+            self.edit_task(card.task['id'])
+        elif part == 'delete':
+            self.delete_task(card.task['id'])
+        else:
+            self.select_task(card.task, mode)
+    
+    def set_hover_row(self, card, part):
+        if self.hover_card is not None and self.hover_card is not card:
+            self.hover_card.set_hover(None)
+        if card is not None:
+            card.set_hover(part)
+        self.hover_card = card
+        
+        cursor = 'hand2' if part in ('expand', 'checkbox', 'subtask', 'edit', 'delete') else ''
+        if cursor != self.canvas_cursor:
+            self.canvas.configure(cursor=cursor)
+            self.canvas_cursor = cursor
+    
     def create_footer(self, parent):
         footer = tk.Frame(parent, bg=self.colors['primary'], height=60)
         footer.pack(fill=tk.X, pady=(20, 0))
         footer.pack_propagate(False)
         
+        tk.Button(footer, 
+                 text="📈 Analytics", 
+                 command=self.show_analytics,
+                 bg=self.colors['secondary'], 
+                 fg=self.colors['text'],
+                 font=('Segoe UI', 9, 'bold'),
+                 relief='flat', 
+                 bd=0,
+                 padx=12, 
+                 pady=4,
+                 cursor='hand2').pack(side=tk.RIGHT, padx=(0, 15))
+        
         self.stats_label = tk.Label(footer, text="", 
                                    font=('Segoe UI', 12, 'bold'), 
                                    bg=self.colors['primary'], 
                                    fg=self.colors['text'])
         self.stats_label.pack(expand=True)
     
+    @PERF.timed
     def add_task(self):
+        if not self.ensure_loaded():
+            return
         task_text = self.task_entry.get().strip()
         if not task_text:
             messagebox.showwarning("⚠️ Warning", "Please enter a task!")
@@ -276,181 +1120,209 @@ class ModernTodoApp:
         priority_raw = self.priority_var.get()
         priority = priority_raw.split(' ')[1] if ' ' in priority_raw else priority_raw
         
-        task = {
-            'id': max([t.get('id', 0) for t in self.tasks], default=0) + 1,
-            'text': task_text,
-            'priority': priority,
-            'completed': False,
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
-        
-        self.tasks.append(task)
-        self.save_tasks()
+        task = self.engine.add(task_text, priority)
         self.task_entry.delete(0, tk.END)
-        self.refresh_task_list()
+        self.reconcile_task(task)
         
-        # Success animation effect
-        original_bg = self.task_entry.master.cget('bg')
-        self.task_entry.master.config(bg=self.colors['success'])
-        self.root.after(200, lambda: self.task_entry.master.config(bg=original_bg))
+        # Success animation effect; another add during the flash restarts it
+        entry_frame = self.task_entry.master
+        if self.flash_job is None:
+            self.flash_bg = entry_frame.cget('bg')
+        else:
+            self.root.after_cancel(self.flash_job)
+        entry_frame.config(bg=self.colors['success'])
+        self.flash_job = self.root.after(200, self.end_flash)
     
+    def end_flash(self):
+        self.flash_job = None
+        self.task_entry.master.config(bg=self.flash_bg)
+    
+    @PERF.timed
     def create_task_widget(self, task):
-        # Modern task card
-        task_card = tk.Frame(self.scrollable_frame, bg='#353560', relief='flat', bd=0)
-        task_card.pack(fill=tk.X, padx=20, pady=8)
-        
-        # Hover effect
-        def on_enter(e):
-            task_card.config(bg='#404070')
-        def on_leave(e):
-            task_card.config(bg='#353560')
-        
-        task_card.bind('<Enter>', on_enter)
-        task_card.bind('<Leave>', on_leave)
-        
-        # Task content
-        content_frame = tk.Frame(task_card, bg='#353560')
-        content_frame.pack(fill=tk.X, padx=20, pady=15)
-        
-        # Top row: checkbox, text, priority
-        top_row = tk.Frame(content_frame, bg='#353560')
-        top_row.pack(fill=tk.X, pady=(0, 10))
-        
-        # Custom checkbox
-        checkbox_frame = tk.Frame(top_row, bg='#353560')
-        checkbox_frame.pack(side=tk.LEFT, padx=(0, 15))
-        
-        checkbox_color = self.colors['success'] if task['completed'] else self.colors['border']
-        checkbox_text = "✓" if task['completed'] else "○"
-        
-        checkbox_btn = tk.Button(checkbox_frame, 
-                               text=checkbox_text, 
-                               font=('Segoe UI', 16, 'bold'),
-                               bg=checkbox_color, 
-                               fg=self.colors['text'],
-                               relief='flat',
-                               bd=0,
-                               width=2, 
-                               height=1,
-                               cursor='hand2',
-                               command=lambda: self.toggle_task(task['id']))
-        checkbox_btn.pack()
-        
-        # Task text
-        text_frame = tk.Frame(top_row, bg='#353560')
-        text_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        
-        text_color = self.colors['text_muted'] if task['completed'] else self.colors['text']
-        font_style = ('Segoe UI', 12, 'overstrike') if task['completed'] else ('Segoe UI', 12)
-        
-        task_label = tk.Label(text_frame, 
-                            text=task['text'], 
-                            font=font_style,
-                            bg='#353560', 
-                            fg=text_color, 
-                            anchor='w',
-                            wraplength=400)
-        task_label.pack(anchor='w')
-        
-        # Priority badge
-        priority_colors = {
-            'High': self.colors['danger'],
-            'Medium': self.colors['warning'],
-            'Low': self.colors['success']
-        }
-        
-        priority_frame = tk.Frame(top_row, bg='#353560')
-        priority_frame.pack(side=tk.RIGHT, padx=(10, 0))
-        
-        priority_badge = tk.Label(priority_frame, 
-                                text=f"● {task['priority']}", 
-                                font=('Segoe UI', 10, 'bold'),
-                                bg='#353560',
-                                fg=priority_colors.get(task['priority'], self.colors['text_muted']))
-        priority_badge.pack()
-        
-        # Bottom row: timestamp and actions
-        bottom_row = tk.Frame(content_frame, bg='#353560')
-        bottom_row.pack(fill=tk.X, pady=(5, 0))
-        
-        # Timestamp
-        time_label = tk.Label(bottom_row, 
-                            text=f"Created: {task['created_at']}", 
-                            font=('Segoe UI', 9),
-                            bg='#353560', 
-                            fg=self.colors['text_muted'])
-        time_label.pack(side=tk.LEFT)
+        card = TaskCard(self, self.scrollable_frame)
+        card.bind_task(task)
+        card.frame.pack(fill=tk.X, padx=(20 + card.indent, 20), pady=8)
+        return card
+    
+    @PERF.timed
+    def create_pool_card(self):
+        if self.renderer == 'canvas':
+            return CanvasRow(self, self.canvas, len(self.card_pool))
+        card = TaskCard(self, self.canvas)
+        card.window = self.canvas.create_window(20, 0, 
+                                                window=card.frame, 
+                                                anchor="nw",
+                                                height=TASK_ROW_HEIGHT - 16,
+                                                state='hidden')
+        return card
+    
+    @PERF.timed
+    def update_viewport(self, force=False):
+        if not self.virtualized:
+            return
         
-        # Action buttons
-        actions_frame = tk.Frame(bottom_row, bg='#353560')
-        actions_frame.pack(side=tk.RIGHT)
+        # Rows inside the visible canvas area plus a small overscan
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        top = int(self.canvas.canvasy(0))
+        first = max(top // TASK_ROW_HEIGHT - VIRTUAL_OVERSCAN, 0)
+        last = min((top + height) // TASK_ROW_HEIGHT + 1 + VIRTUAL_OVERSCAN, len(self.visible_tasks))
         
-        # Modern buttons
-        edit_btn = tk.Button(actions_frame, 
-                           text="✏️ Edit", 
-                           command=lambda: self.edit_task(task['id']),
-                           bg=self.colors['secondary'], 
-                           fg=self.colors['text'],
-                           font=('Segoe UI', 9),
-                           relief='flat', 
-                           bd=0,
-                           padx=12, 
-                           pady=4,
-                           cursor='hand2')
-        edit_btn.pack(side=tk.LEFT, padx=(0, 5))
+        viewport = (first, last, width)
+        if viewport == self.viewport and not force:
+            return
+        resized = self.viewport is None or self.viewport[2] != width
+        self.viewport = viewport
+        
+        # The pool only grows to the largest viewport ever shown
+        while len(self.card_pool) < last - first:
+            self.card_pool.append(self.create_pool_card())
+        
+        # Each row keeps a stable slot, so scrolling by one row rebinds one card
+        pool_size = len(self.card_pool)
+        used = set()
+        self.task_cards = {}
+        for row in range(first, last):
+            card = self.card_pool[row % pool_size]
+            used.add(card)
+            card.bind_task(self.visible_tasks[row], VIRTUAL_TEXT_LIMIT)
+            self.task_cards[card.task['id']] = card
+            if card.row != row or resized or card.indent != card.placed_indent:
+                card.place(row, width)
+        
+        for card in self.card_pool:
+            if card not in used and card.row is not None:
+                card.hide()
+    
+    @PERF.timed
+    def reconcile_task(self, task, old_key=None, removed=False):
+        # Patch the displayed list for one changed task instead of rebuilding it.
+        # old_key is the task's display key before the change (None for new tasks);
+        # the filter view itself is already up to date. Row layout and stats are
+        # left to the next frame.
+        if self.render.pending('list'):
+            # The rebuild already due picks this change up
+            return
+        if self.search_query or self.current_filter() in SCHEDULE_FILTERS:
+            # Search results are a snapshot and overdue tasks are not in display
+            # order; querying again costs a few milliseconds
+            self.render.mark('list')
+            return
         
-        delete_btn = tk.Button(actions_frame, 
-                             text="🗑️ Delete", 
-                             command=lambda: self.delete_task(task['id']),
-                             bg=self.colors['danger'], 
-                             fg=self.colors['text'],
-                             font=('Segoe UI', 9),
-                             relief='flat', 
-                             bd=0,
-                             padx=12, 
-                             pady=4,
-                             cursor='hand2')
-        delete_btn.pack(side=tk.LEFT)
+        # Subtasks sit under their parent whatever the filter, and a parent's rows
+        # move with it (or lift a level when it goes): the tree places those rows
+        tree = self.engine.tree
+        task_id = task['id']
+        parent = task.parent if removed else tree.parent_of(task_id)
+        nested = (parent is not None and parent in self.store) or task_id in tree.children
+        if not nested:
+            matches = FILTER_PREDICATES[self.current_filter()]
+            was_visible = old_key is not None and matches(old_key)
+            new_key = None if removed else display_key(task)
+            is_visible = new_key is not None and matches(new_key)
+            
+            if not was_visible and not is_visible:
+                self.render.mark('stats')
+                return
+            
+            if was_visible and new_key == old_key:
+                # Same position: only the card's contents changed
+                card = self.task_cards.get(task_id)
+                if card:
+                    card.bind_task(task, VIRTUAL_TEXT_LIMIT if self.virtualized else None)
+                self.render.mark('stats')
+                return
+        
+        if self.query_view:
+            self.visible_tasks.invalidate()
+        
+        if not self.visible_tasks:
+            self.show_empty_state()
+        elif self.empty_state is not None:
+            self.hide_empty_state()
+        
+        if self.virtualized:
+            # Rebinding the rows also shows the new counts of the task's ancestors
+            self.render.mark('rows')
+        elif nested:
+            self.render.mark('list')
+        else:
+            self.place_card(task, self.visible_tasks.index_of(task) if is_visible else None)
         
-        # Button hover effects
-        def edit_hover_in(e): edit_btn.config(bg='#0a2c50')
-        def edit_hover_out(e): edit_btn.config(bg=self.colors['secondary'])
-        def delete_hover_in(e): delete_btn.config(bg='#c23e37')
-        def delete_hover_out(e): delete_btn.config(bg=self.colors['danger'])
+        self.render.mark('stats')
+    
+    def place_card(self, task, index):
+        # Move, create or drop the card of a single task in the packed list
+        card = self.task_cards.pop(task['id'], None)
+        if index is None:
+            if card:
+                card.frame.destroy()
+            return
         
-        edit_btn.bind('<Enter>', edit_hover_in)
-        edit_btn.bind('<Leave>', edit_hover_out)
-        delete_btn.bind('<Enter>', delete_hover_in)
-        delete_btn.bind('<Leave>', delete_hover_out)
+        if card is None:
+            card = TaskCard(self, self.scrollable_frame)
+        card.bind_task(task)
+        self.task_cards[task['id']] = card
+        
+        padx = (20 + card.indent, 20)
+        if index > 0:
+            previous = self.task_cards[self.visible_tasks[index - 1]['id']]
+            card.frame.pack(fill=tk.X, padx=padx, pady=8, after=previous.frame)
+        elif len(self.visible_tasks) > 1:
+            following = self.task_cards[self.visible_tasks[1]['id']]
+            card.frame.pack(fill=tk.X, padx=padx, pady=8, before=following.frame)
+        else:
+            card.frame.pack(fill=tk.X, padx=padx, pady=8)
     
+    @PERF.timed
     def toggle_task(self, task_id):
-        for task in self.tasks:
-            if task['id'] == task_id:
-                task['completed'] = not task['completed']
-                if task['completed']:
-                    task['completed_at'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                else:
-                    task.pop('completed_at', None)
-                break
+        if not self.ensure_loaded():
+            return
+        task = self.engine.get(task_id)
+        if not task:
+            return
         
-        self.save_tasks()
-        self.refresh_task_list()
+        old_key = display_key(task)
+        archived = task_id not in self.store
+        # The tree's rolled-up counts follow through its store listener, which only
+        # walks the task's ancestors
+        task = self.engine.toggle(task_id)
+        if archived:
+            # Back in the task file: it moves from the history rows to the live ones
+            self.render.mark('list')
+        else:
+            self.reconcile_task(task, old_key)
     
+    @PERF.timed
     def delete_task(self, task_id):
+        if not self.ensure_loaded():
+            return
         if messagebox.askyesno("🗑️ Confirm Delete", "Are you sure you want to delete this task?"):
-            self.tasks = [task for task in self.tasks if task['id'] != task_id]
-            self.save_tasks()
-            self.refresh_task_list()
+            if self.engine.get(task_id) is None:
+                return
+            archived = task_id not in self.store
+            task = self.engine.delete(task_id)
+            # Cards are rebound first: the deleted task's card must not be redrawn
+            if archived:
+                self.render.mark('list')
+            else:
+                self.reconcile_task(task, display_key(task), removed=True)
+            if task_id in self.selected:
+                self.selected.discard(task_id)
+                self.render.mark('selection')
     
+    @PERF.timed
     def edit_task(self, task_id):
-        task = next((t for t in self.tasks if t['id'] == task_id), None)
+        if not self.ensure_loaded():
+            return
+        task = self.engine.get(task_id)
         if not task:
             return
         
         # Modern edit dialog
         edit_window = tk.Toplevel(self.root)
         edit_window.title("✏️ Edit Task")
-        edit_window.geometry("500x300")
+        edit_window.geometry("500x470")
         edit_window.configure(bg=self.colors['dark'])
         edit_window.grab_set()
         edit_window.resizable(False, False)
@@ -500,20 +1372,59 @@ class ModernTodoApp:
                                     state="readonly",
                                     style='Modern.TCombobox',
                                     font=('Segoe UI', 10))
-        priority_combo.pack(anchor='w', pady=(0, 30))
+        priority_combo.pack(anchor='w', pady=(0, 20))
+        
+        # Due date and reminder, each in one row: a label and a short entry
+        def time_entry(label, value):
+            row = tk.Frame(content, bg=self.colors['card'])
+            row.pack(fill=tk.X, pady=(0, 10))
+            tk.Label(row, text=label, 
+                    font=('Segoe UI', 10, 'bold'), 
+                    width=12,
+                    anchor='w',
+                    bg=self.colors['card'], 
+                    fg=self.colors['text_muted']).pack(side=tk.LEFT)
+            field = tk.Entry(row, 
+                             font=('Segoe UI', 11), 
+                             bg=self.colors['secondary'],
+                             fg=self.colors['text'],
+                             insertbackground=self.colors['text'],
+                             relief='flat', 
+                             bd=0)
+            field.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=6)
+            field.insert(0, value or "")
+            return field
+        
+        due_entry = time_entry("⏰ Due:", task.get('due_at'))
+        remind_entry = time_entry("🔔 Remind me:", task.get('remind_at'))
+        tk.Label(content, text="YYYY-MM-DD HH:MM, a date, today, tomorrow or +30m / +2h / +3d; empty for none", 
+                font=('Segoe UI', 8), 
+                bg=self.colors['card'], 
+                fg=self.colors['text_muted']).pack(anchor='w', pady=(0, 20))
         
         # Buttons
         btn_frame = tk.Frame(content, bg=self.colors['card'])
         btn_frame.pack(fill=tk.X)
         
+        @PERF.timed
         def save_edit():
             new_text = entry.get().strip()
             if new_text:
-                task['text'] = new_text
+                try:
+                    due_at = parse_when(due_entry.get())
+                    remind_at = parse_when(remind_entry.get())
+                except ValueError as e:
+                    messagebox.showwarning("⚠️ Warning", str(e))
+                    return
+                old_key = display_key(task)
+                archived = task_id not in self.store
                 priority_raw = priority_var.get()
-                task['priority'] = priority_raw.split(' ')[1] if ' ' in priority_raw else priority_raw
-                self.save_tasks()
-                self.refresh_task_list()
+                priority = priority_raw.split(' ')[1] if ' ' in priority_raw else priority_raw
+                changed = self.engine.edit(task_id, text=new_text, priority=priority, due_at=due_at, remind_at=remind_at)
+                if archived:
+                    self.render.mark('list')
+                else:
+                    self.reconcile_task(changed, old_key)
                 edit_window.destroy()
             else:
                 messagebox.showwarning("⚠️ Warning", "Task cannot be empty!")
@@ -547,99 +1458,842 @@ class ModernTodoApp:
         # Enter key binding
         entry.bind('<Return>', lambda e: save_edit())
     
-    def get_filtered_tasks(self):
-        filter_value = self.filter_var.get()
+    def current_filter(self):
+        return FILTER_KEYS.get(self.filter_var.get(), 'all')
+    
+    def get_filtered_tasks(self, outline=True):
+        # Archived tasks are read only when history is asked for: a search, or the
+        # Completed filter. With outline the filter picks the top-level tasks and
+        # expanded ones are followed by their subtasks; otherwise every task of the
+        # filter is listed flat, subtasks included.
+        filter_key = self.current_filter()
+        if self.search_query:
+            return self.engine.search(self.search_query, filter_key, history=True)
+        if outline:
+            return self.engine.outline(filter_key, history=filter_key == 'completed')
+        return self.engine.filtered(filter_key, history=filter_key == 'completed')
+    
+    def expander_of(self, task, progress):
+        # "▸" or "▾" for a task with subtasks in the outline, blank otherwise
+        if progress is None or not self.outline_shown:
+            return ""
+        return "▾" if task['id'] in self.engine.tree.expanded else "▸"
+    
+    def indent_of(self, task):
+        # Outline rows are indented by depth; flat lists (search, overdue) are not
+        if not self.outline_shown:
+            return 0
+        depth = 0
+        for _ in self.engine.tree.ancestors(task['id']):
+            depth += 1
+            if depth == SUBTASK_MAX_DEPTH:
+                break
+        return depth * SUBTASK_INDENT
+    
+    @PERF.timed
+    def toggle_expanded(self, task_id):
+        # Only the rows in view are bound, so a task with thousands of subtasks opens
+        # and closes as fast as one with two
+        tree = self.engine.tree
+        if not self.outline_shown or tree.progress(task_id) is None:
+            return
+        tree.set_expanded(task_id, task_id not in tree.expanded)
+        self.render.mark('rows' if self.virtualized else 'list')
+    
+    @PERF.timed
+    def add_subtask(self, task_id):
+        if not self.ensure_loaded():
+            return
+        parent = self.store.get(task_id)
+        if parent is None:
+            messagebox.showwarning("⚠️ Warning", "Archived tasks cannot get subtasks!")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("➕ Add Subtask")
+        dialog.geometry("500x230")
+        dialog.configure(bg=self.colors['dark'])
+        dialog.grab_set()
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        
+        content = tk.Frame(dialog, bg=self.colors['card'])
+        content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        parent_text = parent['text'] if len(parent['text']) <= 50 else parent['text'][:49] + "…"
+        tk.Label(content, text=f"➕ Subtask of: {parent_text}", 
+                font=('Segoe UI', 12, 'bold'), 
+                bg=self.colors['card'], 
+                fg=self.colors['text']).pack(anchor='w', pady=(0, 15))
+        
+        entry_frame = tk.Frame(content, bg=self.colors['secondary'])
+        entry_frame.pack(fill=tk.X, pady=(0, 20))
+        
+        entry = tk.Entry(entry_frame, 
+                        font=('Segoe UI', 12), 
+                        bg=self.colors['secondary'],
+                        fg=self.colors['text'],
+                        insertbackground=self.colors['text'],
+                        relief='flat', 
+                        bd=0)
+        entry.pack(fill=tk.X, padx=15, pady=12)
+        entry.focus()
+        
+        btn_frame = tk.Frame(content, bg=self.colors['card'])
+        btn_frame.pack(fill=tk.X)
+        
+        @PERF.timed
+        def save_subtask():
+            text = entry.get().strip()
+            if not text:
+                messagebox.showwarning("⚠️ Warning", "Task cannot be empty!")
+                return
+            if task_id not in self.store:
+                # Deleted or archived meanwhile (another window, a merge)
+                dialog.destroy()
+                return
+            # Same priority as the add bar would give it; the parent opens to show it
+            priority_raw = self.priority_var.get()
+            priority = priority_raw.split(' ')[1] if ' ' in priority_raw else priority_raw
+            task = self.engine.add(text, priority, parent_id=task_id)
+            self.engine.tree.set_expanded(task_id)
+            self.reconcile_task(task)
+            dialog.destroy()
+        
+        tk.Button(btn_frame, 
+                 text="➕ Add Subtask", 
+                 command=save_subtask,
+                 bg=self.colors['success'], 
+                 fg=self.colors['text'],
+                 font=('Segoe UI', 11, 'bold'),
+                 relief='flat', 
+                 bd=0,
+                 padx=20, 
+                 pady=10,
+                 cursor='hand2').pack(side=tk.LEFT, padx=(0, 10))
+        
+        tk.Button(btn_frame, 
+                 text="❌ Cancel", 
+                 command=dialog.destroy,
+                 bg=self.colors['danger'], 
+                 fg=self.colors['text'],
+                 font=('Segoe UI', 11, 'bold'),
+                 relief='flat', 
+                 bd=0,
+                 padx=20, 
+                 pady=10,
+                 cursor='hand2').pack(side=tk.LEFT)
+        
+        entry.bind('<Return>', lambda e: save_subtask())
+    
+    def schedule_search(self):
+        # Debounced: a burst of keystrokes runs one query
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+    
+    @PERF.timed
+    def run_search(self):
+        self.search_job = None
+        query = self.search_var.get().strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        self.canvas.yview_moveto(0)
+        self.clear_selection()
+        self.render.mark('list')
+    
+    def select_task(self, task, mode='single'):
+        task_id = task['id']
+        anchor = self.engine.get(self.selection_anchor) if mode == 'range' and self.selection_anchor is not None else None
+        if anchor is not None:
+            # Everything between the anchor and this card, in display order
+            start = self.visible_tasks.index_of(anchor)
+            end = self.visible_tasks.index_of(task)
+            if start is not None and end is not None:
+                low, high = sorted((start, end))
+                self.selected.update(selected['id'] for selected in self.visible_tasks[low:high + 1])
+                self.render.mark('selection')
+                return
+        
+        if mode == 'toggle' or self.selected == {task_id}:
+            self.selected ^= {task_id}
+        else:
+            self.selected = {task_id}
+        self.selection_anchor = task_id
+        self.render.mark('selection')
+    
+    def clear_selection(self):
+        if self.selected:
+            self.selected = set()
+            self.selection_anchor = None
+            self.render.mark('selection')
+    
+    def update_selection(self):
+        limit = VIRTUAL_TEXT_LIMIT if self.virtualized else None
+        for card in self.task_cards.values():
+            card.bind_task(card.task, limit)
+        
+        if self.selected:
+            self.bulk_label.config(text=f"☑️ {len(self.selected)} selected")
+            if not self.bulk_bar_shown:
+                self.bulk_bar.pack(fill=tk.X, pady=(12, 0))
+                self.bulk_bar_shown = True
+        elif self.bulk_bar_shown:
+            self.bulk_bar.pack_forget()
+            self.bulk_bar_shown = False
+    
+    def selected_ids(self):
+        return sorted(task_id for task_id in self.selected if self.engine.get(task_id) is not None)
+    
+    @PERF.timed
+    def complete_selected(self):
+        if not self.ensure_loaded() or not self.selected:
+            return
+        self.engine.set_completed_many(self.selected_ids())
+        self.finish_bulk_change()
+    
+    @PERF.timed
+    def delete_selected(self):
+        if not self.ensure_loaded() or not self.selected:
+            return
+        task_ids = self.selected_ids()
+        if messagebox.askyesno("🗑️ Confirm Delete", f"Are you sure you want to delete {len(task_ids)} selected tasks?"):
+            self.engine.delete_many(task_ids)
+            self.finish_bulk_change()
+    
+    @PERF.timed
+    def set_selected_priority(self):
+        priority_raw = self.bulk_priority_var.get()
+        self.bulk_priority_var.set("Set priority")
+        if not self.ensure_loaded() or not self.selected or ' ' not in priority_raw:
+            return
+        self.engine.set_priority_many(self.selected_ids(), priority_raw.split(' ')[1])
+        self.finish_bulk_change()
+    
+    @PERF.timed
+    def import_tasks(self):
+        if not self.ensure_loaded():
+            return
+        path = filedialog.askopenfilename(title="📥 Import Tasks",
+                                          filetypes=[("Task lists", "*.csv *.json *.txt *.md"),
+                                                     ("All files", "*.*")])
+        if not path:
+            return
+        
+        try:
+            entries = read_import_file(path)
+        except Exception as e:
+            messagebox.showerror("💥 Error", f"Could not read {os.path.basename(path)}: {str(e)}")
+            return
+        if not entries:
+            messagebox.showwarning("⚠️ Warning", "No tasks found in that file!")
+            return
+        
+        if messagebox.askyesno("📥 Import Tasks", f"Import {len(entries)} tasks from {os.path.basename(path)}?"):
+            self.engine.import_tasks(entries)
+            self.finish_bulk_change()
+    
+    @PERF.timed
+    def export_tasks(self):
+        # The list as shown, with the current filter and search
+        if self.export is not None:
+            self.export_window.lift()
+            return
+        if not self.ensure_loaded():
+            return
+        path = filedialog.asksaveasfilename(title="📤 Export Tasks",
+                                            defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"),
+                                                       ("Markdown checklist", "*.md"),
+                                                       ("iCalendar", "*.ics")])
+        if not path:
+            return
+        
+        from todo_export import TaskExport, export_format
+        try:
+            export_format(path)
+        except ValueError as e:
+            messagebox.showwarning("⚠️ Warning", str(e))
+            return
+        # Collapsed or not, every subtask of the filter goes in
+        self.export = TaskExport(self.get_filtered_tasks(outline=False), path)
+        
+        window = tk.Toplevel(self.root)
+        window.title("📤 Export Tasks")
+        window.geometry("420x170")
+        window.configure(bg=self.colors['dark'])
+        window.transient(self.root)
+        window.protocol("WM_DELETE_WINDOW", self.cancel_export)
+        self.export_window = window
+        
+        content = tk.Frame(window, bg=self.colors['card'])
+        content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        tk.Label(content, text=f"📤 {os.path.basename(path)}", 
+                font=('Segoe UI', 12, 'bold'), 
+                bg=self.colors['card'], 
+                fg=self.colors['text']).pack(pady=(0, 10))
+        
+        self.export_bar = ttk.Progressbar(content, mode='determinate', maximum=max(self.export.total, 1))
+        self.export_bar.pack(fill=tk.X, padx=15)
+        self.export_label = tk.Label(content, text="", 
+                                    font=('Segoe UI', 9), 
+                                    bg=self.colors['card'], 
+                                    fg=self.colors['text_muted'])
+        self.export_label.pack(pady=(5, 10))
+        
+        tk.Button(content, 
+                 text="❌ Cancel", 
+                 command=self.cancel_export,
+                 bg=self.colors['danger'], 
+                 fg=self.colors['text'],
+                 font=('Segoe UI', 10, 'bold'),
+                 relief='flat', 
+                 bd=0,
+                 padx=15, 
+                 pady=6,
+                 cursor='hand2').pack()
+        
+        self.export_job = self.root.after(EXPORT_STEP_MS, self.continue_export)
+    
+    @PERF.timed
+    def continue_export(self):
+        self.export_job = None
+        export = self.export
+        # Batches are read until the slice is used up or the writer falls behind
+        deadline = time.perf_counter() + EXPORT_STEP_SECONDS
+        while time.perf_counter() < deadline:
+            if export.step() or export.batches.full():
+                break
         
-        if filter_value == "All":
-            return self.tasks
-        elif "Pending" in filter_value:
-            return [task for task in self.tasks if not task['completed']]
-        elif "Completed" in filter_value:
-            return [task for task in self.tasks if task['completed']]
-        elif "High Priority" in filter_value:
-            return [task for task in self.tasks if task['priority'] == 'High']
-        elif "Medium Priority" in filter_value:
-            return [task for task in self.tasks if task['priority'] == 'Medium']
-        elif "Low Priority" in filter_value:
-            return [task for task in self.tasks if task['priority'] == 'Low']
+        if not export.done:
+            total = max(export.total, export.written, 1)
+            self.export_bar.config(maximum=total, value=export.written)
+            self.export_label.config(text=f"{export.written:,} of {total:,} tasks written")
+            self.export_job = self.root.after(EXPORT_STEP_MS, self.continue_export)
+            return
         
-        return self.tasks
+        self.close_export()
+        if export.error is not None:
+            messagebox.showerror("💥 Error", f"Could not export to {os.path.basename(export.path)}: {str(export.error)}")
+        elif not export.cancelled:
+            messagebox.showinfo("📤 Export Tasks", f"Exported {export.written:,} tasks to {os.path.basename(export.path)}")
+    
+    def cancel_export(self):
+        # The worker removes its partial file; the timer sees it stop and closes the dialog
+        if self.export is not None:
+            self.export.cancel()
     
+    def close_export(self):
+        if self.export_job is not None:
+            self.root.after_cancel(self.export_job)
+            self.export_job = None
+        self.export_window.destroy()
+        self.export_window = None
+        self.export = None
+    
+    def finish_bulk_change(self):
+        # The whole batch was saved once; redraw the list once as well
+        self.selected = set()
+        self.selection_anchor = None
+        self.render.mark('list')
+        self.render.mark('selection')
+    
+    @PERF.timed
+    def on_filter_changed(self):
+        self.canvas.yview_moveto(0)
+        self.clear_selection()
+        self.render.mark('list')
+    
+    @PERF.timed
     def refresh_task_list(self):
         # Clear existing widgets
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
+        self.task_cards = {}
+        self.empty_state = None
         
-        filtered_tasks = self.get_filtered_tasks()
+        # Filter views are kept in display order, so nothing is sorted here
+        self.visible_tasks = self.get_filtered_tasks()
+        self.outline_shown = not self.search_query and self.current_filter() not in SCHEDULE_FILTERS
         
-        if not filtered_tasks:
-            # Empty state
-            empty_frame = tk.Frame(self.scrollable_frame, bg=self.colors['card'])
-            empty_frame.pack(expand=True, fill=tk.BOTH, pady=100)
-            
-            tk.Label(empty_frame, 
-                    text="📭", 
-                    font=('Segoe UI', 48), 
-                    bg=self.colors['card'], 
-                    fg=self.colors['text_muted']).pack()
-            
-            tk.Label(empty_frame, 
-                    text="No tasks found", 
-                    font=('Segoe UI', 16, 'bold'), 
-                    bg=self.colors['card'], 
-                    fg=self.colors['text_muted']).pack(pady=(10, 5))
-            
-            tk.Label(empty_frame, 
-                    text="Add a new task to get started!", 
-                    font=('Segoe UI', 12), 
-                    bg=self.colors['card'], 
-                    fg=self.colors['text_muted']).pack()
+        if not self.visible_tasks:
+            self.show_empty_state()
         else:
-            # Sort tasks
-            priority_order = {'High': 0, 'Medium': 1, 'Low': 2}
-            filtered_tasks.sort(key=lambda x: (x['completed'], priority_order.get(x['priority'], 3)))
-            
-            for task in filtered_tasks:
-                self.create_task_widget(task)
+            self.hide_empty_state()
+        
+        if self.virtualized:
+            self.update_scrollregion()
+            self.update_viewport(force=True)
+        else:
+            for task in self.visible_tasks:
+                self.task_cards[task['id']] = self.create_task_widget(task)
         
         self.update_stats()
+        self.measure_layout('refresh_task_list')
+    
+    def update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, 0, len(self.visible_tasks) * TASK_ROW_HEIGHT))
+    
+    def update_frame_scrollregion(self):
+        # Packed list: the scrollregion is whatever the cards add up to
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    
+    def render_rows(self):
+        # Virtual rows after the row count or the canvas size changed
+        if self.visible_tasks and self.empty_state is not None:
+            self.hide_empty_state()
+        self.update_scrollregion()
+        self.update_viewport(force=True)
     
+    def show_empty_state(self):
+        if self.virtualized:
+            self.canvas.itemconfigure(self.frame_window, state='normal')
+        if self.empty_state is not None:
+            return
+        
+        # Empty state
+        empty_frame = tk.Frame(self.scrollable_frame, bg=self.colors['card'])
+        empty_frame.pack(expand=True, fill=tk.BOTH, pady=100)
+        
+        tk.Label(empty_frame, 
+                text="📭", 
+                font=('Segoe UI', 48), 
+                bg=self.colors['card'], 
+                fg=self.colors['text_muted']).pack()
+        
+        tk.Label(empty_frame, 
+                text="No tasks found", 
+                font=('Segoe UI', 16, 'bold'), 
+                bg=self.colors['card'], 
+                fg=self.colors['text_muted']).pack(pady=(10, 5))
+        
+        tk.Label(empty_frame, 
+                text="Add a new task to get started!", 
+                font=('Segoe UI', 12), 
+                bg=self.colors['card'], 
+                fg=self.colors['text_muted']).pack()
+        self.empty_state = empty_frame
+    
+    def hide_empty_state(self):
+        if self.virtualized:
+            # The frame keeps its last size once emptied, so hide its window as well
+            self.canvas.itemconfigure(self.frame_window, state='hidden')
+        if self.empty_state is not None:
+            self.empty_state.destroy()
+            self.empty_state = None
+    
+    @PERF.timed
     def update_stats(self):
-        total = len(self.tasks)
-        completed = len([task for task in self.tasks if task['completed']])
-        pending = total - completed
+        total = self.stats.total
+        completed = self.stats.completed
+        pending = self.stats.pending
         
-        if total == 0:
+        if self.engine.loading:
+            progress_text = f"⏳ Loading tasks... {total:,} loaded"
+        elif total == 0:
             progress_text = "🚀 Ready to be productive!"
         else:
             percentage = int((completed / total) * 100)
             progress_text = f"📊 Progress: {completed}/{total} tasks completed ({percentage}%)"
+            high_pending = self.stats.pending_by_priority['High']
+            if high_pending:
+                progress_text += f" • 🔴 {high_pending} high priority pending"
+            overdue = len(self.engine.schedule.overdue)
+            if overdue:
+                progress_text += f" • ⚠️ {overdue} overdue"
+        
+        # Archive segments: how much history there is and what reading it cost
+        segments = self.engine.archive.segment_sizes()
+        if segments:
+            largest = max(segments, key=segments.get)
+            progress_text += (f"\n🗄️ Archive: {len(segments)} months, {format_size(sum(segments.values()))}"
+                              f" (largest {largest}: {format_size(segments[largest])})")
+            load_seconds = self.engine.archive.load_seconds
+            if load_seconds:
+                slowest = max(load_seconds, key=load_seconds.get)
+                progress_text += (f" • read in {sum(load_seconds.values()) * 1000:.0f} ms"
+                                  f" (slowest {slowest}: {load_seconds[slowest] * 1000:.0f} ms)")
         
         self.stats_label.config(text=progress_text)
         
         # Update quick stats
-        quick_text = f"Total: {total} • Completed: {completed} • Pending: {pending}"
+        quick_text = f"Total: {total} • Completed: {completed} • Pending: {pending} • Done today: {self.stats.completed_today()}"
         self.quick_stats.config(text=quick_text)
+        
+        # An open analytics window catches up once the changes settle
+        if self.analytics_window is not None and self.analytics_job is None:
+            self.analytics_job = self.root.after(ANALYTICS_REFRESH_MS, self.refresh_analytics)
     
+    @PERF.timed
+    def show_analytics(self):
+        if self.analytics_window is not None:
+            self.analytics_window.lift()
+            return
+        if not self.ensure_loaded():
+            return
+        if self.analytics is None:
+            # Reads the archive the first time: history counts as much as the live tasks
+            from todo_analytics import TaskAnalytics
+            self.analytics = TaskAnalytics(self.engine)
+        
+        window = tk.Toplevel(self.root)
+        window.title("📈 Analytics")
+        window.geometry("560x720")
+        window.configure(bg=self.colors['dark'])
+        window.transient(self.root)
+        window.protocol("WM_DELETE_WINDOW", self.close_analytics)
+        self.analytics_window = window
+        
+        content = tk.Frame(window, bg=self.colors['card'])
+        content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        
+        tk.Label(content, text="📈 Productivity", 
+                font=('Segoe UI', 16, 'bold'), 
+                bg=self.colors['card'], 
+                fg=self.colors['text']).pack(pady=(0, 10))
+        
+        # One chart per figure, each under its heading
+        self.analytics_charts = {}
+        for key, title in (('completed_per_day', "✅ Completed per day"),
+                           ('completed_per_week', "🗓️ Completed per week"),
+                           ('backlog_age', "⏳ Age of pending tasks")):
+            tk.Label(content, text=title, 
+                    font=('Segoe UI', 10, 'bold'), 
+                    bg=self.colors['card'], 
+                    fg=self.colors['text_muted']).pack(anchor='w', padx=15, pady=(10, 2))
+            canvas = tk.Canvas(content, 
+                               width=ANALYTICS_CHART_WIDTH, 
+                               height=ANALYTICS_CHART_HEIGHT, 
+                               bg=self.colors['card'], 
+                               highlightthickness=0)
+            canvas.pack(padx=15)
+            self.analytics_charts[key] = canvas
+        
+        tk.Label(content, text="⏱️ Median time to complete", 
+                font=('Segoe UI', 10, 'bold'), 
+                bg=self.colors['card'], 
+                fg=self.colors['text_muted']).pack(anchor='w', padx=15, pady=(10, 2))
+        self.analytics_lead_label = tk.Label(content, text="", 
+                                            font=('Segoe UI', 10), 
+                                            justify=tk.LEFT, 
+                                            bg=self.colors['card'], 
+                                            fg=self.colors['text'])
+        self.analytics_lead_label.pack(anchor='w', padx=15)
+        
+        self.analytics_info_label = tk.Label(content, text="", 
+                                            font=('Segoe UI', 8), 
+                                            bg=self.colors['card'], 
+                                            fg=self.colors['text_muted'])
+        self.analytics_info_label.pack(side=tk.BOTTOM, pady=(10, 0))
+        
+        self.analytics_shown = None
+        self.refresh_analytics()
+    
+    @PERF.timed
+    def refresh_analytics(self):
+        self.analytics_job = None
+        if self.analytics_window is None:
+            return
+        report = self.analytics.report()
+        if report is self.analytics_shown:
+            return
+        self.analytics_shown = report
+        
+        # Days and weeks are labelled MM-DD, weeks by their Monday
+        charts = self.analytics_charts
+        draw_columns(charts['completed_per_day'], [(day[5:], count) for day, count in report['completed_per_day']],
+                     self.colors['success'], self.colors['text_muted'])
+        draw_columns(charts['completed_per_week'], [(day[5:], count) for day, count in report['completed_per_week']],
+                     self.colors['secondary'], self.colors['text_muted'])
+        draw_columns(charts['backlog_age'], report['backlog_age'], self.colors['warning'], self.colors['text_muted'])
+        
+        from todo_analytics import format_duration
+        icons = {'High': '🔴', 'Medium': '🟡', 'Low': '🟢'}
+        self.analytics_lead_label.config(text="\n".join(
+            f"{icons[priority]} {priority}: {format_duration(median)} ({count:,} completed)"
+            for priority, (median, count) in report['median_lead_time'].items()))
+        self.analytics_info_label.config(
+            text=f"{report['tasks']:,} tasks including the archive • worked out in {report['seconds'] * 1000:.0f} ms with {report['backend']}")
+    
+    def close_analytics(self):
+        if self.analytics_job is not None:
+            self.root.after_cancel(self.analytics_job)
+            self.analytics_job = None
+        self.analytics_window.destroy()
+        self.analytics_window = None
+    
+    @PERF.timed
     def load_tasks(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        error = self.engine.load()
+        if error is not None:
+            self.report_load_error(error)
+    
+    def report_load_error(self, error):
+        messagebox.showerror("💥 Error", f"Could not load tasks: {str(error)}\nThe unreadable file was kept as {self.engine.storage.path}.corrupt")
+    
+    def start_loading(self):
+        # Only the first batch is read here, so the window appears just as fast for
+        # a huge file as for a small one. With SQLite that batch is the top of the
+        # list; a JSON file or journal snapshot is read in id order, so the first
+        # paint shows the best of the first LOAD_BATCH_SIZE tasks, and higher ones
+        # further down the file move in as their batches load.
+        self.engine.load_incrementally(LOAD_BATCH_SIZE).step(0)
+    
+    @PERF.timed
+    def continue_loading(self):
+        loader = self.engine.loader
+        loader.step(LOAD_STEP_SECONDS)
+        if not loader.done:
+            # Virtual rows come from the live filter view, so growing it is cheap
+            if self.virtualized and not self.query_view:
+                self.render.mark('rows')
+            self.render.mark('stats')
+            self.root.after(1, self.continue_loading)
+            return
+        
+        if loader.error is not None:
+            self.report_load_error(loader.error)
+        self.start_reminders()
+        if self.virtualized and not self.query_view and not self.search_query:
+            self.render.mark('rows')
+            self.render.mark('stats')
+        else:
+            self.render.mark('list')
+    
+    def start_reminders(self):
+        # Tasks already overdue at startup are listed, not announced; reminders that
+        # came due while the app was closed are shown by the first fire_reminders
+        schedule = self.engine.schedule
+        schedule.advance()
+        self.reminders_since = current_timestamp()
+        schedule.on_sooner = self.arm_reminders
+        self.arm_reminders()
+    
+    def arm_reminders(self):
+        # Also called by the schedule when a change brings the next time forward
+        schedule = self.engine.schedule
+        if self.reminder_job is not None:
+            self.root.after_cancel(self.reminder_job)
+            self.reminder_job = None
+        schedule.armed = schedule.next_time()
+        if schedule.armed is not None:
+            delay = (schedule.armed - current_seconds()) * 1000
+            self.reminder_job = self.root.after(int(min(max(delay, 0), REMINDER_MAX_WAIT_MS)) + 1, self.fire_reminders)
+    
+    @PERF.timed
+    def fire_reminders(self):
+        self.reminder_job = None
+        self.engine.schedule.armed = None
+        now = current_timestamp()
+        reminders = self.engine.due_reminders(now)
+        overdue = self.engine.schedule.advance(now)
+        if overdue:
+            if self.current_filter() in SCHEDULE_FILTERS:
+                self.render.mark('list')
+            else:
+                for task in overdue:
+                    card = self.task_cards.get(task.id)
+                    if card:
+                        card.bind_task(card.task, VIRTUAL_TEXT_LIMIT if self.virtualized else None)
+            self.render.mark('stats')
+        # Only deadlines that passed while the app was running are announced, not
+        # old ones brought back by reopening or editing a task
+        overdue = [task for task in overdue if task.due > self.reminders_since]
+        self.reminders_since = now
+        self.arm_reminders()
+        if reminders or overdue:
+            self.notify_due(reminders, overdue)
+    
+    def notify_due(self, reminders, overdue):
+        lines = [f"🔔 {task['text']}" for task in reminders]
+        lines += [f"⚠️ {task['text']} (due {task['due_at']})" for task in overdue]
+        if len(lines) > REMINDER_LIST_LIMIT:
+            lines[REMINDER_LIST_LIMIT:] = [f"… and {len(lines) - REMINDER_LIST_LIMIT} more"]
+        self.root.bell()
+        messagebox.showinfo("🔔 Reminder", "\n".join(lines))
+    
+    def ensure_loaded(self):
+        # Changes wait for the full list: ids and saves depend on every task being known
+        if self.engine.loading:
+            messagebox.showinfo("⏳ Loading", "Tasks are still loading, try again in a moment.")
+            return False
+        # Start from the latest saved state, so the change applies to what is shown
+        self.engine.poll()
+        return True
+    
+    @PERF.timed
+    def poll_external(self):
+        # A stat of the task file when nothing changed; merged changes come back
+        # through apply_external_changes
+        self.engine.poll()
+        self.root.after(EXTERNAL_POLL_MS, self.poll_external)
     
+    def start_rpc(self, path):
+        from todo_rpc import RpcServer
+        try:
+            self.rpc = RpcServer(self.engine, path)
+            self.rpc.start()
+        except OSError as e:
+            self.rpc = None
+            messagebox.showerror("💥 Error", f"Could not serve tasks on {path}: {str(e)}")
+            return
+        self.root.after(RPC_DRAIN_MS, self.drain_rpc)
+    
+    def drain_rpc(self):
+        # The server thread only queues requests; they run here, on the Tk thread.
+        # While requests keep coming, the next slice runs as soon as Tk is idle again.
+        if self.rpc.pending and not self.engine.loading:
+            self.run_rpc_requests()
+        self.root.after(1 if self.rpc.pending else RPC_DRAIN_MS, self.drain_rpc)
+    
+    @PERF.timed
+    def run_rpc_requests(self):
+        changes = self.rpc.drain(RPC_DRAIN_SECONDS)
+        if changes.history_changed:
+            self.render.mark('list')
+        if changes.items:
+            self.apply_external_changes(changes.items)
+    
+    def apply_external_changes(self, changes):
+        # Another process's changes are already in the store: patch only their cards
+        if len(changes) > EXTERNAL_RECONCILE_LIMIT or self.search_query:
+            self.render.mark('list')
+        else:
+            for task, old_key, removed in changes:
+                self.reconcile_task(task, old_key, removed)
+        if any(task['id'] in self.selected for task, _, removed in changes if removed):
+            self.selected.intersection_update(self.selected_ids())
+            self.render.mark('selection')
+    
+    @PERF.timed
     def save_tasks(self):
+        self.engine.save()
+    
+    def report_save_error(self, error):
+        # May be called from the writer thread; the dialog has to be shown by the Tk thread
+        self.root.after(0, lambda: messagebox.showerror("💥 Error", f"Could not save tasks: {str(error)}"))
+    
+    def on_close(self):
+        if self.reminder_job is not None:
+            self.root.after_cancel(self.reminder_job)
+        if self.analytics_job is not None:
+            self.root.after_cancel(self.analytics_job)
+        if self.export is not None:
+            # A half-written export is discarded rather than left as a .tmp file
+            self.export.cancel()
+            self.export.thread.join()
+        if self.rpc is not None:
+            self.rpc.close()
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.tasks, f, indent=2)
+            self.engine.close()
         except Exception as e:
             messagebox.showerror("💥 Error", f"Could not save tasks: {str(e)}")
+        if self.perf.profiling:
+            # The report goes beside the profile (and into the perf log, if any)
+            self.perf.stop_profile(self.profile_path or self.profile_file_name())
+        self.perf.close()
+        self.root.destroy()
+    
+    def setup_perf_hooks(self):
+        # Every widget passes its Destroy event through the 'all' bindtag exactly once
+        self.root.bind_all('<Destroy>', self.perf.widget_destroyed, add='+')
+        self.root.bind_all('<F12>', lambda e: self.toggle_perf_overlay())
+        self.root.bind_all('<Control-Shift-P>', lambda e: self.toggle_profile())
+        if os.environ.get("TODO_PERF_OVERLAY") == "1":
+            self.toggle_perf_overlay()
+        elif self.perf.log_file is not None:
+            self.schedule_perf_update()
+    
+    def measure_layout(self, name):
+        # Idle callbacks run in order, so this one fires after the geometry and redraw
+        # work the handler queued: the span is the time Tk spent laying it out
+        start = time.perf_counter()
+        self.root.after_idle(lambda: self.perf.record(name + ".layout", time.perf_counter() - start))
+    
+    def count_widgets(self):
+        count = 0
+        pending = [self.root]
+        while pending:
+            children = pending.pop().winfo_children()
+            count += len(children)
+            pending.extend(children)
+        return count
+    
+    def toggle_perf_overlay(self):
+        if self.perf_overlay is not None:
+            self.perf_overlay.destroy()
+            self.perf_overlay = None
+            return
+        
+        self.perf_overlay = tk.Label(self.root, 
+                                     text="", 
+                                     font=('Consolas', 9), 
+                                     justify=tk.LEFT, 
+                                     anchor='nw', 
+                                     bg='#000000', 
+                                     fg=self.colors['success'], 
+                                     padx=8, 
+                                     pady=6)
+        self.perf_overlay.place(relx=1.0, x=-10, y=10, anchor='ne')
+        if self.perf_job is None:
+            self.schedule_perf_update()
+    
+    def schedule_perf_update(self):
+        # The event loop lag is how late this timer fires: long handlers and layout passes show up here
+        self.loop_tick = time.perf_counter()
+        self.perf_job = self.root.after(PERF_OVERLAY_INTERVAL_MS, self.update_perf_overlay)
+    
+    def update_perf_overlay(self):
+        lag = max(time.perf_counter() - self.loop_tick - PERF_OVERLAY_INTERVAL_MS / 1000, 0)
+        self.perf_job = None
+        
+        live = self.count_widgets()
+        destroyed = self.perf.widgets_destroyed
+        render = self.render
+        self.perf.log({'widgets': live, 'created': live + destroyed, 'destroyed': destroyed, 'lag_ms': round(lag * 1000, 3),
+                       'render_requests': render.requested, 'renders': render.rendered, 'frames': render.frames})
+        
+        if self.perf_overlay is not None:
+            lines = [f"{name:<26}{seconds * 1000:8.2f} ms" for name, seconds in self.perf.latest_spans()]
+            lines.append(f"{'event loop lag':<26}{lag * 1000:8.2f} ms")
+            lines.append(f"{'last write':<26}{self.engine.storage.last_write_seconds * 1000:8.2f} ms")
+            # Every widget ever made is either alive or has passed through <Destroy>
+            lines.append(f"🧩 widgets {live} live • {live + destroyed} created • {destroyed} destroyed")
+            lines.append(f"🎞 {render.frames} frames • {render.requested} redraws asked • {render.coalesced} coalesced")
+            if self.renderer == 'canvas':
+                lines.append(f"🖌 canvas items {len(self.canvas.find_all())} in {len(self.card_pool)} drawn rows")
+            if self.perf.profiling:
+                lines.append("⏺ cProfile recording (Ctrl+Shift+P to stop)")
+            self.perf_overlay.config(text="\n".join(lines))
+            self.perf_overlay.lift()
+        
+        if self.perf_overlay is not None or self.perf.log_file is not None:
+            self.schedule_perf_update()
+    
+    def profile_file_name(self):
+        return f"todo-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof"
+    
+    def toggle_profile(self):
+        if not self.perf.profiling:
+            self.perf.start_profile()
+            return
+        path = self.profile_path or self.profile_file_name()
+        report_path = self.perf.stop_profile(path)
+        messagebox.showinfo("⏱ Profile saved", f"cProfile data written to {path}\nTop functions by cumulative time: {report_path}")
 
 def main():
+    archive_days = os.environ.get("TODO_ARCHIVE_DAYS")
+    archive_days = (int(archive_days) or None) if archive_days else DEFAULT_ARCHIVE_DAYS
     root = tk.Tk()
-    app = ModernTodoApp(root)
+    app = ModernTodoApp(root,
+                        storage_kind=os.environ.get("TODO_STORAGE", "json"),
+                        save_interval=int(os.environ.get("TODO_SAVE_INTERVAL_MS", "0")) / 1000,
+                        progressive=os.environ.get("TODO_PROGRESSIVE_LOAD", "1") != "0",
+                        renderer=os.environ.get("TODO_RENDERER", "widgets"),
+                        archive_days=archive_days,
+                        rpc_socket=os.environ.get("TODO_RPC_SOCKET"))
     
     # Center window on screen
     root.update_idletasks()
@@ -0,0 +1,482 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from todo_engine import FILTER_PREDICATES, STORAGE_BACKENDS, TaskEngine, TaskStore, read_task_file, write_json_atomic
+from todo_rpc import RpcServer
+
+# Benchmarks for loading, filtering, refreshing, counting and saving tasks at scale:
+#   python bench.py --sizes 1000,10000,100000,1000000 --output bench-results.json
+#   python bench.py --gui                       # also time the Tk app (starts Xvfb if needed)
+#   python bench.py --gui --renderer canvas     # ... with task rows drawn on the canvas
+#   python bench.py --rpc                       # also load-test the JSON-RPC socket
+#   python bench.py --baseline old.json         # exit 1 when p50/p95 regress
+# Every size and phase runs in its own process, so peak RSS is per measurement.
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+
+# RPC load test: requests per run, as a mix of methods, drained in slices like the app's
+RPC_REQUESTS = 20000
+RPC_MIX = {'toggle': 40, 'add': 25, 'edit': 20, 'delete': 5, 'list': 7, 'stats': 3}
+
+# GUI phase: task cards built one at a time, to time and weigh card construction alone
+CARD_SAMPLE = 100
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Task-1.py")
+
+# Synthetic data: roughly how a real list looks after a few months of use
+PRIORITY_WEIGHTS = {'High': 20, 'Medium': 50, 'Low': 30}
+COMPLETED_RATIO = 0.4
+WORDS = ("review", "write", "call", "email", "update", "fix", "plan", "buy", "send", "check",
+         "report", "meeting", "invoice", "draft", "slides", "budget", "groceries", "dentist",
+         "release", "notes", "backup", "tickets", "client", "design", "schedule", "team",
+         "the", "for", "with", "about", "before", "friday", "tomorrow", "project", "q3", "docs")
+
+def generate_tasks(count, seed=0):
+    rng = random.Random(seed)
+    priorities = list(PRIORITY_WEIGHTS)
+    weights = list(PRIORITY_WEIGHTS.values())
+    now = datetime.now()
+    tasks = []
+    for task_id in range(1, count + 1):
+        # Mostly short titles with a long tail of pasted notes
+        length = rng.choice((2, 3, 3, 4, 4, 5, 6, 8)) if rng.random() < 0.9 else rng.randint(15, 60)
+        created = now - timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+        task = {
+            'id': task_id,
+            'text': " ".join(rng.choice(WORDS) for _ in range(length)).capitalize(),
+            'priority': rng.choices(priorities, weights)[0],
+            'completed': rng.random() < COMPLETED_RATIO,
+            'created_at': created.strftime("%Y-%m-%d %H:%M")
+        }
+        if task['completed']:
+            done = created + (now - created) * rng.random()
+            task['completed_at'] = done.strftime("%Y-%m-%d %H:%M")
+        tasks.append(task)
+    return {'next_id': count + 1, 'tasks': tasks}
+
+def dataset_path(data_dir, count, seed):
+    # Generated once per size and seed, then reused by later runs
+    path = os.path.join(data_dir, f"tasks-{count}-{seed}.json")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        write_json_atomic(path, generate_tasks(count, seed), indent=2)
+    return path
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(samples):
+    return {
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+        'runs': len(samples)
+    }
+
+def timed(samples, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    samples.append(time.perf_counter() - start)
+    return result
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def prepare_workdir(dataset, storage_kind):
+    # A private copy, so saving never touches the cached dataset
+    workdir = tempfile.mkdtemp(prefix="todo-bench-")
+    shutil.copyfile(dataset, os.path.join(workdir, "tasks.json"))
+    if storage_kind == 'sqlite':
+        storage = STORAGE_BACKENDS['sqlite'](os.path.join(workdir, "tasks.json"))
+        storage.import_json(dataset)
+        storage.close()
+    return workdir
+
+def first_screen(engine, filter_key):
+    tasks = engine.filtered(filter_key)
+    return len(tasks), tasks[:10]
+
+def first_screen_of_search(engine, query, filter_key):
+    tasks = engine.search(query, filter_key)
+    return len(tasks), tasks[:10]
+
+def first_screen_of_outline(engine, task_id, expanded):
+    engine.tree.set_expanded(task_id, expanded)
+    tasks = engine.outline('all')
+    return len(tasks), tasks[:10]
+
+def nest_tasks(store):
+    # Every task under an earlier one, ten to a parent: task 1 is the root of a
+    # tree log10(n) levels deep. Done before the tree exists, which then counts it.
+    for task_id in range(2, len(store) + 1):
+        store.update(task_id, parent_id=(task_id + 8) // 10)
+
+def bench_engine(workdir, storage_kind, repeat):
+    path = os.path.join(workdir, "tasks.json")
+    samples = {name: [] for name in ('load_tasks', 'first_batch', 'index_build', 'get_filtered_tasks',
+                                     'search_index_build', 'search', 'stats_build', 'update_stats',
+                                     'toggle_task', 'save_tasks', 'tree_build', 'expand_collapse',
+                                     'toggle_subtask')}
+    for _ in range(repeat):
+        # Progressive startup only waits for the first batch
+        streaming = TaskEngine(path, storage_kind)
+        timed(samples['first_batch'], streaming.load_incrementally().step, 0)
+        streaming.close()
+        
+        engine = TaskEngine(path, storage_kind)
+        timed(samples['load_tasks'], engine.load, False)
+        if not engine.storage.supports_queries:
+            timed(samples['index_build'], lambda: engine.index)
+        timed(samples['stats_build'], lambda: engine.stats)
+        
+        # What a filter change asks of the engine: the view, its length and the first screen
+        for filter_key in FILTER_PREDICATES:
+            timed(samples['get_filtered_tasks'], first_screen, engine, filter_key)
+        
+        # Search as typed, from one letter to two full words
+        timed(samples['search_index_build'], lambda: engine.search_index)
+        for query in ("r", "re", "rep", "report", "report f", "report friday", "zzz"):
+            for filter_key in ('all', 'pending'):
+                timed(samples['search'], first_screen_of_search, engine, query, filter_key)
+        
+        # Store-only toggles keep indexes and counters in step; persistence is timed separately
+        for task_id in random.Random(1).sample(range(1, len(engine.store) + 1), min(50, len(engine.store))):
+            timed(samples['toggle_task'], engine.store.toggle, task_id)
+            timed(samples['update_stats'], lambda: (engine.stats.total, engine.stats.pending, engine.stats.completed_today()))
+        
+        timed(samples['save_tasks'], engine.save)
+        engine.close()
+        
+        # Subtasks, never saved: the first outline counts every subtree, then opening
+        # a path down the tree and toggling the task at its end only walk that path
+        if not engine.storage.supports_queries:
+            nested = TaskEngine(path, storage_kind)
+            nested.load(False)
+            nest_tasks(nested.store)
+            timed(samples['tree_build'], lambda: (nested.tree.count(), nested.outline('all')[:10]))
+            branch = [1]
+            while branch[-1] * 10 - 8 <= len(nested.store):
+                branch.append(branch[-1] * 10 - 8)
+            for task_id in branch:
+                timed(samples['expand_collapse'], first_screen_of_outline, nested, task_id, True)
+            for _ in range(20):
+                timed(samples['toggle_subtask'], lambda: (nested.store.toggle(branch[-1]), nested.tree.progress(1)))
+            for task_id in reversed(branch):
+                timed(samples['expand_collapse'], first_screen_of_outline, nested, task_id, False)
+            nested.storage.close(None)
+    return {name: summarize(values) for name, values in samples.items() if values}
+
+def memory_per_task(dataset):
+    # Bytes allocated per task by the parsed JSON objects and by the store built
+    # from them; the texts are shared, so the store's figure includes them
+    tracemalloc.start()
+    try:
+        with open(dataset, 'r', encoding='utf-8') as f:
+            tasks, next_id = read_task_file(json.load(f))
+        count = max(len(tasks), 1)
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        store = TaskStore(tasks, next_id)
+        del tasks
+        store_bytes = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {
+        'dict_bytes_per_task': round(dict_bytes / count, 1),
+        'store_bytes_per_task': round(store_bytes / count, 1),
+        'reduction': round(dict_bytes / max(store_bytes, 1), 2)
+    }
+
+def bench_gui(workdir, storage_kind, repeat, renderer='widgets'):
+    import tkinter as tk
+    spec = importlib.util.spec_from_file_location("todo_app", APP_PATH)
+    app_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app_module)
+    
+    # The app reads tasks.json from the working directory
+    os.chdir(workdir)
+    samples = {name: [] for name in ('first_paint', 'load_complete', 'refresh_task_list', 'update_stats', 'scroll',
+                                     'card_build')}
+    root = tk.Tk()
+    start = time.perf_counter()
+    app = app_module.ModernTodoApp(root, storage_kind=storage_kind, renderer=renderer)
+    root.update()
+    samples['first_paint'].append(time.perf_counter() - start)
+    
+    # The rest of the file streams in from after() callbacks
+    while app.engine.loading:
+        root.update()
+    samples['load_complete'].append(time.perf_counter() - start)
+    
+    def refresh():
+        app.refresh_task_list()
+        root.update_idletasks()
+    
+    def scroll(fraction):
+        app.canvas.yview_moveto(fraction)
+        root.update_idletasks()
+    
+    for _ in range(repeat):
+        for label in app_module.FILTER_KEYS:
+            app.filter_var.set(label)
+            timed(samples['refresh_task_list'], refresh)
+        app.filter_var.set("All")
+        app.refresh_task_list()
+        for step in range(20):
+            timed(samples['scroll'], scroll, step / 20)
+        timed(samples['update_stats'], app.update_stats)
+    
+    # Card construction, widget cards whatever the renderer: time per card, then
+    # the Python memory each one holds (traced last, as it slows everything down)
+    tasks = list(app.engine.filtered('all')[:CARD_SAMPLE])
+    scratch = tk.Frame(root)
+    for _ in range(repeat):
+        for task in tasks:
+            timed(samples['card_build'], lambda: app_module.TaskCard(app, scratch).bind_task(task))
+        for widget in scratch.winfo_children():
+            widget.destroy()
+    tracemalloc.start()
+    try:
+        cards = [app_module.TaskCard(app, scratch) for task in tasks]
+        for card, task in zip(cards, tasks):
+            card.bind_task(task)
+        card_bytes = tracemalloc.get_traced_memory()[0] / max(len(cards), 1)
+    finally:
+        tracemalloc.stop()
+    scratch.destroy()
+    
+    app.engine.close()
+    root.destroy()
+    return {name: summarize(values) for name, values in samples.items() if values}, round(card_bytes, 1)
+
+def rpc_requests(count, task_count, seed=0):
+    # Toggles and edits hit random existing tasks; deletes each take a different one
+    rng = random.Random(seed)
+    methods = list(RPC_MIX)
+    weights = list(RPC_MIX.values())
+    deletable = task_count
+    for request_id in range(count):
+        method = rng.choices(methods, weights)[0]
+        if method == 'add':
+            params = {'text': " ".join(rng.choice(WORDS) for _ in range(4)), 'priority': rng.choice(list(PRIORITY_WEIGHTS))}
+        elif method == 'toggle':
+            params = {'id': rng.randint(1, deletable)}
+        elif method == 'edit':
+            params = {'id': rng.randint(1, deletable), 'priority': rng.choice(list(PRIORITY_WEIGHTS))}
+        elif method == 'delete':
+            params = {'id': deletable}
+            deletable -= 1
+        elif method == 'list':
+            params = {'filter': rng.choice(list(FILTER_PREDICATES)), 'limit': 20}
+        else:
+            params = {}
+        yield {'jsonrpc': "2.0", 'id': request_id, 'method': method, 'params': params}
+
+def rpc_client(path, requests, sent, received):
+    # Writes every request up front, as a pipelining client would, while this thread
+    # reads the replies; sent and received are perf_counter times by request id
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(path)
+    lines = [json.dumps(request).encode('utf-8') + b"\n" for request in requests]
+    
+    def send():
+        for request_id, line in enumerate(lines):
+            sent[request_id] = time.perf_counter()
+            client.sendall(line)
+    
+    sender = threading.Thread(target=send)
+    sender.start()
+    with client.makefile('rb') as replies:
+        for line in replies:
+            response = json.loads(line)
+            if 'error' in response and response['error']['code'] != -32000:
+                raise RuntimeError(response['error']['message'])
+            received[response['id']] = time.perf_counter()
+            if len(received) == len(lines):
+                break
+    sender.join()
+    client.close()
+
+def bench_rpc(workdir, storage_kind, repeat):
+    # Throughput and latency of pipelined requests, and how long each drain would
+    # keep the Tk thread busy. Full rewrites go to the background writer, as with
+    # TODO_SAVE_INTERVAL_MS in the app.
+    path = os.path.join(workdir, "tasks.json")
+    samples = {'rpc_request': [], 'drain': []}
+    rates = []
+    for run in range(repeat):
+        engine = TaskEngine(path, storage_kind, save_interval=0.25)
+        engine.load(False)
+        server = RpcServer(engine, os.path.join(workdir, "todo.sock"))
+        server.start()
+        sent, received = {}, {}
+        requests = list(rpc_requests(RPC_REQUESTS, len(engine.store), run))
+        client = threading.Thread(target=rpc_client, args=(server.path, requests, sent, received))
+        client.start()
+        while client.is_alive() or server.pending:
+            if server.wait(0.01):
+                timed(samples['drain'], server.drain, 0.008)
+        client.join()
+        server.close()
+        engine.close()
+        if len(received) != len(requests):
+            raise RuntimeError(f"{len(requests) - len(received)} requests went unanswered")
+        samples['rpc_request'].extend(received[request_id] - sent[request_id] for request_id in received)
+        rates.append(len(requests) / (max(received.values()) - min(sent.values())))
+    return {name: summarize(values) for name, values in samples.items()}, round(sorted(rates)[len(rates) // 2])
+
+def run_worker(args):
+    cwd = os.getcwd()
+    workdir = prepare_workdir(args.dataset, args.storage)
+    output = {}
+    try:
+        if args.phase == 'gui':
+            output['operations'], output['card_bytes'] = bench_gui(workdir, args.storage, args.repeat, args.renderer)
+        elif args.phase == 'rpc':
+            output['operations'], output['ops_per_second'] = bench_rpc(workdir, args.storage, args.repeat)
+        else:
+            output['operations'] = bench_engine(workdir, args.storage, args.repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    output['peak_rss_kb'] = peak_rss_kb()
+    if args.phase == 'engine':
+        # Measured last: tracing allocations would skew the timings and peak RSS
+        output['memory'] = memory_per_task(args.dataset)
+    json.dump(output, sys.stdout)
+
+def start_virtual_display():
+    # Xvfb picks a free display number and writes it to the pipe once it is ready
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None, None
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        display = f.readline().strip()
+    if not display:
+        process.terminate()
+        return None, None
+    return process, f":{display}"
+
+def run_phase(args, dataset, phase, env):
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--phase", phase,
+               "--dataset", dataset, "--storage", args.storage, "--repeat", str(args.repeat),
+               "--renderer", args.renderer]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"}
+    return json.loads(result.stdout)
+
+def find_regressions(results, baseline, tolerance):
+    # A p50 or p95 more than tolerance slower than the same measurement in the baseline
+    regressions = []
+    for key, run in results['runs'].items():
+        for name, current in run.get('operations', {}).items():
+            previous = baseline.get('runs', {}).get(key, {}).get('operations', {}).get(name)
+            if not previous:
+                continue
+            for stat in ('p50_ms', 'p95_ms'):
+                # Sub-millisecond timings are mostly noise
+                if current[stat] > max(previous[stat] * (1 + tolerance), previous[stat] + 1):
+                    regressions.append(f"{key} {name} {stat}: {previous[stat]} -> {current[stat]}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the to-do app on synthetic task lists.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma separated task counts (default: {DEFAULT_SIZES})")
+    parser.add_argument("--storage", choices=list(STORAGE_BACKENDS), default="json")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=".bench", help="where generated datasets are cached")
+    parser.add_argument("--gui", action="store_true", help="also time the Tk app")
+    parser.add_argument("--renderer", choices=("widgets", "canvas"), default="widgets", help="how the app draws task rows")
+    parser.add_argument("--rpc", action="store_true", help="also load-test the JSON-RPC server")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--phase", default="engine", help=argparse.SUPPRESS)
+    parser.add_argument("--dataset", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.worker:
+        run_worker(args)
+        return 0
+    
+    env = dict(os.environ)
+    xvfb = None
+    if args.gui and not env.get("DISPLAY") and sys.platform.startswith("linux"):
+        xvfb, display = start_virtual_display()
+        if display is None:
+            print("No DISPLAY and no Xvfb found; skipping the GUI phase", file=sys.stderr)
+            args.gui = False
+        else:
+            env["DISPLAY"] = display
+    
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': args.storage,
+        'renderer': args.renderer,
+        'repeat': args.repeat,
+        'runs': {}
+    }
+    try:
+        for count in (int(size) for size in args.sizes.split(",")):
+            dataset = dataset_path(args.data_dir, count, args.seed)
+            phases = ('engine',) + (('gui',) if args.gui else ()) + (('rpc',) if args.rpc else ())
+            for phase in phases:
+                run = run_phase(args, dataset, phase, env)
+                results['runs'][f"{phase}:{count}"] = dict(run, tasks=count, phase=phase)
+                if 'error' in run:
+                    print(f"{phase:<6} {count:>8}  failed: {run['error']}", file=sys.stderr)
+                    continue
+                summary = "  ".join(f"{name} {op['p50_ms']}/{op['p95_ms']}" for name, op in run['operations'].items())
+                memory = run.get('memory')
+                if memory:
+                    summary = (f"bytes/task {memory['dict_bytes_per_task']} as dicts, {memory['store_bytes_per_task']} "
+                               f"in the store ({memory['reduction']}x)  {summary}")
+                if 'card_bytes' in run:
+                    summary = f"bytes/card {run['card_bytes']}  {summary}"
+                if 'ops_per_second' in run:
+                    summary = f"{run['ops_per_second']} ops/s  {summary}"
+                print(f"{phase:<6} {count:>8}  rss {run['peak_rss_kb']} KB  {summary}")
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    
+    write_json_atomic(args.output, results, indent=2)
+    print(f"Results written to {args.output} (timings are p50/p95 ms)")
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,48 @@
+# The modules live at the top of the repository, next to Task-1.py
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PRIORITIES = ['High', 'Medium', 'Low']
+
+def make_tasks(count, seed=0, first_id=1):
+    # tasks.json objects with a mix of priorities, completed tasks and words
+    rng = random.Random(seed)
+    words = ["report", "review", "call", "email", "budget", "friday", "team", "notes"]
+    tasks = []
+    for task_id in range(first_id, first_id + count):
+        task = {
+            'id': task_id,
+            'text': " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))),
+            'priority': rng.choice(PRIORITIES),
+            'completed': rng.random() < 0.4,
+            'created_at': f"2024-05-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+        }
+        if task['completed']:
+            task['completed_at'] = f"2024-06-{rng.randint(1, 28):02d} 12:00"
+        tasks.append(task)
+    return tasks
+
+def mutate(store, rng, steps):
+    # Random adds, toggles, edits (text and priority) and deletes
+    for step in range(steps):
+        task_ids = [task.id for task in store]
+        action = rng.choice(['add', 'toggle', 'edit', 'delete'])
+        if action == 'add' or not task_ids:
+            store.add(f"new {rng.choice(['report', 'plan', 'memo'])} {step}", rng.choice(['High', 'Medium', 'Low']))
+        elif action == 'toggle':
+            store.toggle(rng.choice(task_ids))
+        elif action == 'edit':
+            store.update(rng.choice(task_ids), text=f"edited {rng.choice(['report', 'budget'])}",
+                         priority=rng.choice(['High', 'Medium', 'Low']))
+        else:
+            store.delete(rng.choice(task_ids))
+
+@pytest.fixture
+def task_file(tmp_path):
+    # Path of a task file in a fresh directory; nothing is written yet
+    return str(tmp_path / "tasks.json")
\ No newline at end of file
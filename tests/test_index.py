@@ -0,0 +1,37 @@
+# The per-filter index against a plain sort of the store
+import random
+
+from conftest import make_tasks, mutate
+from todo_engine import FILTER_PREDICATES, TaskIndex, TaskStore, display_key
+
+def expected_filter(store, filter_key):
+    matches = FILTER_PREDICATES[filter_key]
+    return [task.id for task in sorted(store, key=display_key) if matches(display_key(task))]
+
+def indexed_store(tasks):
+    store = TaskStore(tasks)
+    index = TaskIndex(store)
+    store.subscribe(index)
+    return store, index
+
+def test_filter_views_follow_the_store():
+    store, index = indexed_store(make_tasks(200))
+    mutate(store, random.Random(2), 300)
+    for filter_key in FILTER_PREDICATES:
+        view = index.view(filter_key)
+        expected = expected_filter(store, filter_key)
+        assert [task.id for task in view] == expected
+        assert len(view) == len(expected)
+        assert [task.id for task in view[3:9]] == expected[3:9]
+        for position in (0, len(expected) // 2, len(expected) - 1):
+            if expected:
+                assert view.index_of(view[position]) == position
+
+def test_batches_out_of_order_are_sorted():
+    tasks = make_tasks(100)
+    store = TaskStore()
+    index = TaskIndex(store)
+    store.subscribe(index)
+    store.extend(tasks[50:])
+    store.extend(tasks[:50])
+    assert [task.id for task in index.view('all')] == expected_filter(store, 'all')
\ No newline at end of file
@@ -0,0 +1,68 @@
+# Streaming loads: the task file parser on chunk boundaries, and the engine filling
+# its store batch by batch with the listeners in step
+import json
+
+import pytest
+
+from conftest import make_tasks
+from todo_engine import TaskEngine, TaskFileStream
+
+@pytest.mark.parametrize('layout', ['object', 'list'])
+@pytest.mark.parametrize('chunk_size', [7, 64, 1 << 16])
+def test_file_stream_reads_both_layouts(task_file, layout, chunk_size):
+    tasks = make_tasks(300)
+    data = {'next_id': 400, 'tasks': tasks} if layout == 'object' else tasks
+    with open(task_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1 if chunk_size == 64 else None)
+    stream = TaskFileStream(task_file, batch_size=50, chunk_size=chunk_size)
+    batches = list(stream.batches())
+    assert [task for batch in batches for task in batch] == tasks
+    assert all(len(batch) <= 50 for batch in batches)
+    assert stream.next_id == (400 if layout == 'object' else 1)
+
+def test_file_stream_rejects_a_truncated_file(task_file):
+    with open(task_file, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'tasks': make_tasks(20)})[:-40])
+    with pytest.raises(ValueError):
+        list(TaskFileStream(task_file, chunk_size=32).batches())
+
+@pytest.mark.parametrize('kind', ['json', 'journal', 'sqlite'])
+def test_incremental_load_matches_a_full_load(task_file, kind):
+    engine = TaskEngine(task_file, kind)
+    engine.load(recover=False)
+    engine.store.extend(make_tasks(1000))
+    engine.save()
+    # Changes after the snapshot: the journal keeps these in its log
+    engine.toggle(10)
+    engine.delete(11)
+    engine.add("late", 'High')
+    engine.close()
+    
+    full = TaskEngine(task_file, kind)
+    full.load(recover=False)
+    streamed = TaskEngine(task_file, kind, verify_stats=True)
+    stats = streamed.stats
+    index = streamed.index
+    loader = streamed.load_incrementally(batch_size=128)
+    steps = 0
+    while not loader.step(0):
+        steps += 1
+    assert loader.error is None and steps > 1
+    assert [task.to_dict() for task in streamed.store] == [task.to_dict() for task in full.store]
+    assert streamed.store.next_id == full.store.next_id
+    assert [task.id for task in index.view('pending')] == [task.id for task in full.filtered('pending')]
+    stats.check()
+    full.close()
+    streamed.close()
+
+def test_unreadable_file_is_quarantined(task_file):
+    with open(task_file, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(make_tasks(500))[:-100])
+    engine = TaskEngine(task_file)
+    loader = engine.load_incrementally(batch_size=100)
+    assert loader.finish() is not None
+    # The batches read before the error are kept, and the file is moved aside
+    assert 0 < len(engine.store) < 500
+    with open(task_file + ".corrupt", encoding='utf-8') as f:
+        assert f.read().startswith("[")
+    engine.close()
\ No newline at end of file
@@ -0,0 +1,29 @@
+# The inverted index and search views against a plain scan of the store
+import random
+
+from conftest import make_tasks, mutate
+from todo_engine import FILTER_PREDICATES, TaskIndex, TaskSearchIndex, TaskStore, display_key, tokenize
+
+def expected_search(store, query):
+    terms = set(tokenize(query))
+    return {task.id for task in store
+            if all(any(word.startswith(term) for word in tokenize(task.text)) for term in terms)}
+
+def expected_pending(store):
+    matches = FILTER_PREDICATES['pending']
+    return [task.id for task in sorted(store, key=display_key) if matches(display_key(task))]
+
+def test_search_follows_the_store():
+    store = TaskStore(make_tasks(200, seed=3))
+    index = TaskIndex(store)
+    search_index = TaskSearchIndex(store)
+    store.subscribe(index)
+    store.subscribe(search_index)
+    mutate(store, random.Random(3), 200)
+    for query in ("r", "rep", "report", "report fri", "edited bud", "zzz", "new"):
+        assert search_index.matches(query) == expected_search(store, query)
+        found = index.search('pending', search_index.matches(query))
+        pending = [task_id for task_id in expected_pending(store)
+                   if task_id in expected_search(store, query)]
+        assert [task.id for task in found] == pending
+        assert len(found) == len(pending)
\ No newline at end of file
@@ -0,0 +1,63 @@
+# TaskStats in verify mode: every listener call recounts the store from scratch and
+# raises AssertionError if the incremental counters drifted
+import random
+
+import pytest
+
+from conftest import make_tasks
+from todo_engine import TaskEngine, TaskStats, TaskStore
+
+def verified_store(tasks=()):
+    store = TaskStore(tasks)
+    stats = TaskStats(store, verify=True)
+    store.subscribe(stats)
+    return store, stats
+
+def test_single_changes_keep_counters_exact():
+    store, stats = verified_store(make_tasks(50))
+    rng = random.Random(1)
+    for step in range(300):
+        task_ids = [task.id for task in store]
+        action = rng.choice(['add', 'toggle', 'edit', 'delete'])
+        if action == 'add' or not task_ids:
+            store.add(f"task {step}", rng.choice(['High', 'Medium', 'Low']))
+        elif action == 'toggle':
+            store.toggle(rng.choice(task_ids))
+        elif action == 'edit':
+            store.update(rng.choice(task_ids), priority=rng.choice(['High', 'Medium', 'Low', 'Someday']))
+        else:
+            store.delete(rng.choice(task_ids))
+    stats.check()
+    assert stats.total == len(store)
+    assert stats.completed == sum(task.completed for task in store)
+
+def test_batch_loads_keep_counters_exact():
+    store, stats = verified_store()
+    tasks = make_tasks(300)
+    for start in range(0, len(tasks), 64):
+        store.extend(tasks[start:start + 64])
+    store.add_many([{'text': "imported", 'completed': True}, {'text': "other", 'priority': 'Low'}])
+    # A task loaded again replaces its first copy
+    store.extend([dict(tasks[0], completed=not tasks[0]['completed'])])
+    stats.check()
+    assert stats.total == 302
+
+def test_drift_is_reported():
+    store, stats = verified_store(make_tasks(10))
+    stats.completed += 1
+    with pytest.raises(AssertionError, match="drifted"):
+        stats.check()
+
+def test_engine_bulk_operations(task_file):
+    engine = TaskEngine(task_file, verify_stats=True)
+    engine.load(recover=False)
+    stats = engine.stats
+    engine.import_tasks([{'text': f"task {i}", 'priority': 'High' if i % 3 else 'Low'} for i in range(40)])
+    engine.set_completed_many(range(1, 21))
+    engine.set_priority_many([5, 6, 7, 25], 'Medium')
+    engine.delete_many([2, 30, 2, 31])
+    engine.edit(3, text="renamed", priority='Low')
+    engine.toggle(4)
+    stats.check()
+    assert (stats.total, stats.completed) == (37, 18)
+    engine.close()
\ No newline at end of file
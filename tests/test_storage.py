@@ -0,0 +1,90 @@
+# Every storage backend saves and loads the same tasks.json objects
+import os
+
+import pytest
+
+from conftest import make_tasks
+from todo_engine import STORAGE_BACKENDS, TaskEngine, TaskStore
+
+def legacy_tasks():
+    # Fields the app did not always write: no priority, no created_at, extras
+    return [
+        {'id': 1, 'text': "old", 'completed': False},
+        {'id': 2, 'text': "due", 'priority': 'High', 'completed': False, 'created_at': "2024-05-01 09:00",
+         'due_at': "2024-05-03 17:00"},
+        {'id': 3, 'text': "done", 'priority': 'Low', 'completed': True, 'created_at': "2024-05-01 09:00",
+         'completed_at': "2024-05-02 10:00", 'parent_id': 2}
+    ]
+
+@pytest.mark.parametrize('kind', list(STORAGE_BACKENDS))
+def test_save_and_load_round_trip(task_file, kind):
+    tasks = make_tasks(500)
+    storage = STORAGE_BACKENDS[kind](task_file)
+    storage.save(TaskStore(tasks, 600))
+    storage.close()
+    storage = STORAGE_BACKENDS[kind](task_file)
+    loaded, next_id = storage.load()
+    storage.close()
+    assert sorted(loaded, key=lambda task: task['id']) == tasks
+    assert next_id == 600
+
+@pytest.mark.parametrize('kind', list(STORAGE_BACKENDS))
+def test_engine_changes_persist(task_file, kind):
+    engine = TaskEngine(task_file, kind)
+    engine.load(recover=False)
+    engine.import_tasks([{'text': f"task {i}"} for i in range(20)])
+    engine.toggle(3)
+    engine.edit(4, text="renamed", priority='High', due_at="2024-06-01 09:00")
+    engine.delete_many([5, 6])
+    added = engine.add("subtask", 'Low', parent_id=4)
+    expected = [task.to_dict() for task in engine.store]
+    engine.close()
+    
+    reopened = TaskEngine(task_file, kind)
+    reopened.load(recover=False)
+    assert [task.to_dict() for task in reopened.store] == expected
+    assert reopened.tree.parent_of(added.id) == 4
+    reopened.close()
+
+def test_sqlite_keeps_legacy_tasks(task_file):
+    storage = STORAGE_BACKENDS['sqlite'](task_file)
+    storage.save(TaskStore(legacy_tasks(), 4))
+    loaded, _ = storage.load()
+    # A missing priority or timestamp stays missing
+    assert loaded == legacy_tasks()
+    # Without a priority a task sorts after the known ones, as in TaskStore
+    assert [task['id'] for task in storage.query('pending')] == [2, 1]
+    storage.close()
+
+def test_journal_read_only_run_leaves_the_snapshot(task_file):
+    writer = TaskEngine(task_file, 'journal')
+    writer.load(recover=False)
+    writer.add("one")
+    writer.add("two")
+    # As if the writer exited without folding its log into the snapshot
+    writer.storage.log_file.close()
+    writer.storage.log_file = None
+    assert not os.path.exists(task_file)
+    
+    reader = TaskEngine(task_file, 'journal')
+    reader.load(recover=False)
+    assert [task.text for task in reader.filtered('all')] == ["one", "two"]
+    reader.close()
+    assert not os.path.exists(task_file)
+    
+    editor = TaskEngine(task_file, 'journal')
+    editor.load(recover=False)
+    editor.toggle(1)
+    editor.close()
+    assert os.path.exists(task_file) and not os.path.exists(task_file + ".log")
+
+def test_background_writer_saves_on_close(task_file):
+    engine = TaskEngine(task_file, 'json', save_interval=60)
+    engine.load(recover=False)
+    engine.import_tasks([{'text': f"task {i}"} for i in range(10)])
+    engine.toggle(2)
+    engine.close()
+    reopened = TaskEngine(task_file)
+    reopened.load(recover=False)
+    assert len(reopened.store) == 10 and reopened.store[2].completed
+    reopened.close()
\ No newline at end of file
@@ -0,0 +1,73 @@
+# Engines in separate processes (here: separate instances) sharing one task file
+# merge each other's changes under the file lock
+import os
+
+import pytest
+
+from todo_engine import STORAGE_BACKENDS, TaskEngine
+
+@pytest.mark.parametrize('kind', list(STORAGE_BACKENDS))
+def test_engines_merge_each_others_changes(task_file, kind):
+    first = TaskEngine(task_file, kind)
+    first.load(recover=False)
+    first.add("from first")
+    second = TaskEngine(task_file, kind)
+    second.load(recover=False)
+    second.add("from second")
+    second.toggle(1)
+    first.poll()
+    assert [(task.text, task.completed) for task in first.store] == [("from first", True), ("from second", False)]
+    first.close()
+    second.close()
+
+def test_renumbered_add_takes_its_subtasks_along(task_file):
+    # The parent and its subtask wait for a background write while another engine
+    # saves a task under the parent's id
+    first = TaskEngine(task_file, 'json', save_interval=60)
+    first.load(recover=False)
+    parent = first.add("local parent")
+    first.add("local child", parent_id=parent.id)
+    second = TaskEngine(task_file)
+    second.load(recover=False)
+    other = second.add("other")
+    second.add("other child", parent_id=other.id)
+    second.close()
+    
+    with first.storage.lock:
+        first.sync()
+    by_text = {task.text: task for task in first.store}
+    moved = by_text["local parent"]
+    assert moved.id != other.id
+    assert by_text["local child"].parent == moved.id
+    assert by_text["other child"].parent == other.id
+    assert first.tree.progress(moved.id) == (0, 1)
+    assert first.tree.progress(other.id) == (0, 1)
+    first.close()
+
+def test_background_write_leaves_a_save_made_meanwhile(task_file, monkeypatch):
+    # The file is written without the lock; another engine saves before the rename
+    first = TaskEngine(task_file, 'json', save_interval=60)
+    first.load(recover=False)
+    first.add("local")
+    storage = first.storage.storage
+    write_temp = storage.write_temp
+    
+    def write_temp_then_other_save(store):
+        temp_path = write_temp(store)
+        second = TaskEngine(task_file)
+        second.load(recover=False)
+        second.add("other")
+        second.close()
+        return temp_path
+    
+    monkeypatch.setattr(storage, 'write_temp', write_temp_then_other_save)
+    first.storage.write()
+    monkeypatch.undo()
+    assert first.storage.pending and 1 in first.storage.unsaved_changes()
+    assert not [name for name in os.listdir(os.path.dirname(task_file)) if name.endswith(".tmp")]
+    first.close()
+    
+    reopened = TaskEngine(task_file)
+    reopened.load(recover=False)
+    assert sorted(task.text for task in reopened.store) == ["local", "other"]
+    reopened.close()
\ No newline at end of file
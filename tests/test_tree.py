@@ -0,0 +1,125 @@
+# Subtasks: rolled-up progress kept incrementally against a recount, the outline
+# view, and parent_id loops
+import random
+
+import pytest
+
+from conftest import make_tasks
+from todo_engine import TaskEngine, TaskIndex, TaskStore, TaskTree, display_key
+
+def recount(store):
+    # (completed, total) over every task's subtasks, by walking up from each task
+    progress = {}
+    for task in store:
+        parent = task.parent
+        seen = set()
+        while parent is not None and parent in store and parent not in seen:
+            seen.add(parent)
+            done, total = progress.get(parent, (0, 0))
+            progress[parent] = (done + task.completed, total + 1)
+            parent = store[parent].parent
+    return progress
+
+def nested_tasks(count, seed):
+    rng = random.Random(seed)
+    tasks = make_tasks(count, seed)
+    for task in tasks[1:]:
+        if rng.random() < 0.8:
+            task['parent_id'] = rng.randint(1, task['id'] - 1)
+    return tasks
+
+def tree_store(tasks):
+    store = TaskStore(tasks)
+    index = TaskIndex(store)
+    tree = TaskTree(store)
+    store.subscribe(index)
+    store.subscribe(tree)
+    return store, index, tree
+
+def test_rollup_follows_changes():
+    store, _, tree = tree_store(nested_tasks(300, 4))
+    rng = random.Random(4)
+    for step in range(400):
+        task_ids = [task.id for task in store]
+        action = rng.choice(['add', 'toggle', 'move', 'delete'])
+        if action == 'add':
+            store.add(f"subtask {step}", 'Low', parent_id=rng.choice(task_ids))
+        elif action == 'toggle':
+            store.toggle(rng.choice(task_ids))
+        elif action == 'move':
+            task_id, parent = rng.choice(task_ids), rng.choice(task_ids + [None])
+            if parent is None or (parent != task_id and task_id not in tree.ancestors(parent)):
+                store.update(task_id, parent_id=parent)
+        else:
+            store.delete(rng.choice(task_ids))
+        if step % 50 == 0:
+            expected = recount(store)
+            assert {task.id: tree.progress(task.id) for task in store if tree.progress(task.id)} == expected
+    expected = recount(store)
+    assert {task.id: tree.progress(task.id) for task in store if tree.progress(task.id)} == expected
+
+def test_outline_lists_expanded_subtasks_under_their_parents():
+    store = TaskStore([
+        {'id': 1, 'text': "plan", 'priority': 'Low', 'completed': False, 'created_at': "2024-05-01 09:00"},
+        {'id': 2, 'text': "outline", 'priority': 'High', 'completed': False, 'created_at': "2024-05-01 09:00", 'parent_id': 1},
+        {'id': 3, 'text': "sources", 'priority': 'High', 'completed': True, 'created_at': "2024-05-01 09:00", 'parent_id': 2},
+        {'id': 4, 'text': "other", 'priority': 'High', 'completed': False, 'created_at': "2024-05-01 09:00"},
+        {'id': 5, 'text': "draft", 'priority': 'Medium', 'completed': False, 'created_at': "2024-05-01 09:00", 'parent_id': 1}
+    ])
+    index = TaskIndex(store)
+    tree = TaskTree(store)
+    store.subscribe(index)
+    store.subscribe(tree)
+    view = tree.view(index, 'all')
+    assert [task.id for task in view] == [4, 1]
+    assert tree.progress(1) == (1, 3)
+    
+    tree.set_expanded(1)
+    assert [task.id for task in view] == [4, 1, 2, 5]
+    tree.set_expanded(2)
+    assert [task.id for task in view] == [4, 1, 2, 3, 5]
+    assert [view[i].id for i in range(len(view))] == [4, 1, 2, 3, 5]
+    assert view.index_of(store[3]) == 3
+    
+    # A completed subtask still shows under a pending parent; deleting the parent
+    # lifts its subtasks to the top level
+    assert [task.id for task in tree.view(index, 'pending')] == [4, 1, 2, 3, 5]
+    store.delete(1)
+    assert sorted(task.id for task in view) == [2, 3, 4, 5]
+    assert tree.progress(2) == (1, 1)
+
+def test_loops_in_a_file_are_cut(task_file):
+    engine = TaskEngine(task_file)
+    engine.load(recover=False)
+    engine.store.extend([
+        {'id': 1, 'text': "a", 'priority': 'Low', 'completed': False, 'created_at': "2024-05-01 09:00", 'parent_id': 2},
+        {'id': 2, 'text': "b", 'priority': 'Low', 'completed': False, 'created_at': "2024-05-01 09:00", 'parent_id': 1},
+        {'id': 3, 'text': "c", 'priority': 'Low', 'completed': True, 'created_at': "2024-05-01 09:00", 'parent_id': 2}
+    ])
+    tree = engine.tree
+    tree.count()
+    # One task of the loop is cut loose and the rest hang under it
+    assert [tree.parent_of(task_id) for task_id in (1, 2, 3)] == [None, 1, 2]
+    for task_id in (1, 2, 3):
+        tree.set_expanded(task_id)
+    assert [task.id for task in engine.outline('all')] == [1, 2, 3]
+    assert tree.progress(1) == (1, 2)
+    with pytest.raises(ValueError):
+        engine.edit(1, parent_id=3)
+    engine.close()
+
+def test_moves_that_close_a_loop_are_refused(task_file):
+    engine = TaskEngine(task_file)
+    engine.load(recover=False)
+    parent = engine.add("parent")
+    child = engine.add("child", parent_id=parent.id)
+    grandchild = engine.add("grandchild", parent_id=child.id)
+    for target in (parent.id, child.id, grandchild.id):
+        with pytest.raises(ValueError):
+            engine.edit(parent.id, parent_id=target)
+    engine.toggle(grandchild.id)
+    assert engine.tree.progress(parent.id) == (1, 2)
+    engine.edit(child.id, parent_id=None)
+    assert engine.tree.progress(parent.id) is None
+    assert display_key(engine.store[child.id]) in [display_key(task) for task in engine.outline('all')]
+    engine.close()
\ No newline at end of file
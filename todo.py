@@ -0,0 +1,290 @@
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from todo_engine import FILTER_NAMES, PRIORITY_ORDER, STORAGE_BACKENDS, TaskEngine, parse_when, read_import_file
+# todo_analytics, todo_export and todo_rpc (which pulls in asyncio) are imported
+# by the commands that use them, so the others start faster
+
+# Command line access to the same tasks.json the app uses, without starting Tk:
+#   python todo.py add "Write report" --priority High --due tomorrow --remind +2h
+#   python todo.py add "Draft outline" --parent 12
+#   python todo.py list --filter pending --json
+#   python todo.py list --tree
+#   python todo.py list --filter overdue
+#   python todo.py list --search "rep fri"
+#   python todo.py --archive-days 30 list --filter completed --history
+#   python todo.py done 3 4
+#   python todo.py import groceries.txt
+#   python todo.py export pending.ics --filter pending
+#   python todo.py --archive-days 30 analytics
+#   python todo.py --save-interval 250 serve --socket /tmp/todo.sock
+# It is safe to run while the app is open: changes are made under the file lock
+# after merging what the app saved, and the app picks them up within a second.
+
+@contextmanager
+def looking_up_ids():
+    # The engine raises KeyError for an unknown task id; only those are reported as
+    # such, so a KeyError anywhere else still shows as the bug it is
+    try:
+        yield
+    except KeyError as e:
+        raise ValueError(f"No task with id {e.args[0]}") from None
+
+def format_task(task):
+    checkbox = "[x]" if task['completed'] else "[ ]"
+    # Old and imported tasks may have no priority
+    line = f"{checkbox} {task['id']:>5}  {task.get('priority', '-'):<6}  {task['text']}"
+    if 'due_at' in task:
+        line += f"  (due {task['due_at']})"
+    return line
+
+def print_outline(engine, tasks):
+    # Each task with its subtasks indented under it, and how many of those are done
+    tree = engine.tree
+    stack = [(task, 0) for task in reversed(tasks)]
+    while stack:
+        task, depth = stack.pop()
+        line = "    " * depth + format_task(task)
+        progress = tree.progress(task['id'])
+        if progress is not None:
+            line += f"  ({progress[0]}/{progress[1]} done)"
+        print(line)
+        stack.extend((subtask, depth + 1) for subtask in reversed(tree.subtasks(task['id'])))
+
+def print_tasks(tasks, as_json):
+    if as_json:
+        json.dump([task.to_dict() for task in tasks], sys.stdout, indent=2)
+        print()
+    else:
+        for task in tasks:
+            print(format_task(task))
+
+def cmd_add(engine, args):
+    with looking_up_ids():
+        task = engine.add(" ".join(args.text), args.priority, parse_when(args.due), parse_when(args.remind), args.parent)
+    if args.json:
+        print_tasks([task], True)
+    else:
+        print(f"Added task {task['id']}")
+
+def cmd_list(engine, args):
+    if args.search:
+        tasks = engine.search(args.search, args.filter, args.history)
+    else:
+        tasks = engine.filtered(args.filter, args.history)
+    if args.tree and not args.json:
+        # The filter picks the top-level tasks; their subtasks are listed whatever it is
+        tasks = [task for task in tasks if engine.tree.parent_of(task['id']) is None]
+        print_outline(engine, tasks[:args.limit] if args.limit else tasks)
+        return
+    print_tasks(list(tasks[:args.limit] if args.limit else tasks), args.json)
+
+def cmd_done(engine, args):
+    with looking_up_ids():
+        tasks = engine.set_completed_many(args.ids, True)
+    print_tasks(tasks, args.json)
+
+def cmd_undone(engine, args):
+    with looking_up_ids():
+        tasks = engine.set_completed_many(args.ids, False)
+    print_tasks(tasks, args.json)
+
+def cmd_edit(engine, args):
+    changes = {}
+    if args.text:
+        changes['text'] = " ".join(args.text)
+    if args.priority:
+        changes['priority'] = args.priority
+    # An empty value clears the due date or reminder
+    if args.due is not None:
+        changes['due_at'] = parse_when(args.due)
+    if args.remind is not None:
+        changes['remind_at'] = parse_when(args.remind)
+    # An empty value (or 0) makes it a top-level task again
+    if args.parent is not None:
+        changes['parent_id'] = args.parent or None
+    with looking_up_ids():
+        task = engine.edit(args.id, **changes)
+    print_tasks([task], args.json)
+
+def cmd_delete(engine, args):
+    with looking_up_ids():
+        tasks = engine.delete_many(args.ids)
+    if args.json:
+        print_tasks(tasks, True)
+    else:
+        print(f"Deleted {len(tasks)} task(s)")
+
+def cmd_import(engine, args):
+    tasks = engine.import_tasks(read_import_file(args.path))
+    if args.json:
+        print_tasks(tasks, True)
+    else:
+        print(f"Imported {len(tasks)} task(s)")
+
+def cmd_export(engine, args):
+    from todo_export import write_export
+    # Streamed straight from the view, so the list is never built in memory
+    if args.search:
+        tasks = engine.search(args.search, args.filter, args.history)
+    else:
+        tasks = engine.filtered(args.filter, args.history)
+    write_export(args.path, (task.to_dict() for task in tasks))
+    if args.json:
+        json.dump({'path': args.path, 'exported': len(tasks)}, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"Exported {len(tasks)} task(s) to {args.path}")
+
+def cmd_stats(engine, args):
+    stats = engine.stats
+    summary = {
+        'total': stats.total,
+        'completed': stats.completed,
+        'pending': stats.pending,
+        'completed_today': stats.completed_today(),
+        'pending_by_priority': {priority: stats.pending_by_priority[priority] for priority in PRIORITY_ORDER},
+        'overdue': len(engine.filtered('overdue')),
+        'archive_bytes_by_month': engine.archive.segment_sizes()
+    }
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"Total: {summary['total']} | Completed: {summary['completed']} | Pending: {summary['pending']} | Done today: {summary['completed_today']} | Overdue: {summary['overdue']}")
+        for month, size in summary['archive_bytes_by_month'].items():
+            print(f"Archived {month}: {size:,} bytes")
+
+def cmd_analytics(engine, args):
+    from todo_analytics import TaskAnalytics, format_duration
+    report = TaskAnalytics(engine).report()
+    if args.json:
+        json.dump({key: value for key, value in report.items() if key != 'day'}, sys.stdout, indent=2)
+        print()
+        return
+    print(f"Completed per day:  {'  '.join(f'{day[5:]} {count}' for day, count in report['completed_per_day'])}")
+    print(f"Completed per week: {'  '.join(f'{day[5:]} {count}' for day, count in report['completed_per_week'])}")
+    for priority, (median, count) in report['median_lead_time'].items():
+        print(f"Median time to complete, {priority}: {format_duration(median)} ({count} tasks)")
+    print(f"Pending by age:     {'  '.join(f'{label}: {count}' for label, count in report['backlog_age'])}")
+    print(f"{report['tasks']} tasks including the archive, in {report['seconds'] * 1000:.1f} ms ({report['backend']})")
+
+def cmd_serve(engine, args):
+    # The app without its window: requests from the socket run on this thread, and
+    # other processes' saves are merged whenever the socket is quiet for a second
+    from todo_rpc import RpcServer
+    server = RpcServer(engine, args.socket)
+    try:
+        server.start()
+    except OSError as e:
+        print(f"Could not serve tasks on {args.socket}: {e}", file=sys.stderr)
+        return 1
+    print(f"Serving {args.file} on {args.socket} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        while True:
+            if server.wait(1.0):
+                # Long slices: with no window to keep responsive, fewer saves win
+                server.drain(0.25)
+            else:
+                engine.poll()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+def parent_id(value):
+    # A task id for --parent; "" is 0, no parent
+    return int(value) if value.strip() else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="todo", description="Manage tasks without the GUI.")
+    parser.add_argument("--file", default="tasks.json", help="task file (default: tasks.json)")
+    parser.add_argument("--storage", choices=list(STORAGE_BACKENDS), default="json", help="storage backend")
+    parser.add_argument("--archive-days", type=int, help="first archive tasks completed more than this many days ago")
+    parser.add_argument("--save-interval", type=int, default=0, metavar="MS",
+                        help="rewrite a json file from a background thread at most this often (for serve)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    # Every command accepts --json after its own arguments
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="print JSON instead of text")
+    
+    add = commands.add_parser("add", parents=[common], help="add a task")
+    add.add_argument("text", nargs="+")
+    add.add_argument("--priority", choices=list(PRIORITY_ORDER), default="Medium")
+    add.add_argument("--due", help="due date: YYYY-MM-DD [HH:MM], today, tomorrow or +30m/+2h/+3d/+1w")
+    add.add_argument("--remind", help="when to be reminded, in the same forms")
+    add.add_argument("--parent", type=int, help="make it a subtask of this task")
+    add.set_defaults(handler=cmd_add)
+    
+    list_cmd = commands.add_parser("list", parents=[common], help="list tasks in display order")
+    list_cmd.add_argument("--filter", choices=FILTER_NAMES, default="all")
+    list_cmd.add_argument("--limit", type=int, default=0)
+    list_cmd.add_argument("--search", help="only tasks with words starting with each of these")
+    list_cmd.add_argument("--history", action="store_true", help="include archived tasks")
+    list_cmd.add_argument("--tree", action="store_true", help="list subtasks indented under their parents")
+    list_cmd.set_defaults(handler=cmd_list)
+    
+    done = commands.add_parser("done", parents=[common], help="mark tasks completed")
+    done.add_argument("ids", nargs="+", type=int)
+    done.set_defaults(handler=cmd_done)
+    
+    undone = commands.add_parser("undone", parents=[common], help="mark tasks pending again")
+    undone.add_argument("ids", nargs="+", type=int)
+    undone.set_defaults(handler=cmd_undone)
+    
+    edit = commands.add_parser("edit", parents=[common], help="change a task's text, priority, due date, reminder or parent")
+    edit.add_argument("id", type=int)
+    edit.add_argument("--text", nargs="+")
+    edit.add_argument("--priority", choices=list(PRIORITY_ORDER))
+    edit.add_argument("--due", help="new due date (\"\" clears it)")
+    edit.add_argument("--remind", help="new reminder time (\"\" clears it)")
+    edit.add_argument("--parent", type=parent_id, help="new parent task id (\"\" makes it top-level)")
+    edit.set_defaults(handler=cmd_edit)
+    
+    delete = commands.add_parser("delete", parents=[common], help="delete tasks")
+    delete.add_argument("ids", nargs="+", type=int)
+    delete.set_defaults(handler=cmd_delete)
+    
+    import_cmd = commands.add_parser("import", parents=[common], help="add tasks from a .csv, .json or text file")
+    import_cmd.add_argument("path")
+    import_cmd.set_defaults(handler=cmd_import)
+    
+    export = commands.add_parser("export", parents=[common], help="write tasks to a .csv, .md or .ics file")
+    export.add_argument("path")
+    export.add_argument("--filter", choices=FILTER_NAMES, default="all")
+    export.add_argument("--search", help="only tasks with words starting with each of these")
+    export.add_argument("--history", action="store_true", help="include archived tasks")
+    export.set_defaults(handler=cmd_export)
+    
+    stats = commands.add_parser("stats", parents=[common], help="show task counts")
+    stats.set_defaults(handler=cmd_stats)
+    
+    analytics = commands.add_parser("analytics", parents=[common], help="show completions, lead times and backlog age")
+    analytics.set_defaults(handler=cmd_analytics)
+    
+    serve = commands.add_parser("serve", help="serve the tasks over JSON-RPC until interrupted")
+    serve.add_argument("--socket", default="todo.sock", help="Unix socket path (default: todo.sock)")
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engine = TaskEngine(args.file, args.storage, save_interval=args.save_interval / 1000, archive_days=args.archive_days)
+    try:
+        engine.load(recover=False)
+    except Exception as e:
+        print(f"Could not load tasks: {e}", file=sys.stderr)
+        return 1
+    
+    try:
+        return args.handler(engine, args) or 0
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
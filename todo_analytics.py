@@ -0,0 +1,153 @@
+# Productivity figures over every task, archived ones included: completions per day
+# and per week, the median time from created_at to completed_at per priority, and
+# how old the pending backlog is. With NumPy the store columns are copied into arrays
+# (epoch seconds, priority codes, completion flags) and every figure is a handful of
+# vectorized passes; without it the same figures come from one plain loop. Either
+# way the report is kept until the next change to the live or archived tasks.
+import bisect
+import statistics
+import time
+from collections import Counter
+from todo_engine import NO_TIME, PRIORITY_NAMES, current_timestamp, format_day
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ANALYTICS_DAYS = 14
+ANALYTICS_WEEKS = 12
+
+# Backlog age buckets: pending tasks younger than each limit (in days), then the rest
+BACKLOG_AGE_LIMITS = [1, 7, 30, 90, 365]
+BACKLOG_AGE_LABELS = ["< 1 day", "1-7 days", "1-4 weeks", "1-3 months", "3-12 months", "> 1 year"]
+BACKLOG_AGE_SECONDS = [days * 86400 for days in BACKLOG_AGE_LIMITS]
+
+def week_of(day):
+    # Weeks start on Monday; day 0 (1970-01-01) was a Thursday
+    return (day + 3) // 7
+
+def format_duration(seconds):
+    # "3d 4h", "5h 20m" or "12m"; "-" for no value
+    if seconds is None:
+        return "-"
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+def numpy_columns(stores):
+    # created, finished, ranks and done of every store, end to end. The columns are
+    # copied under each store's lock, so the store can keep growing meanwhile.
+    parts = []
+    for store in stores:
+        with store.lock:
+            parts.append((np.frombuffer(store.created, dtype=np.int64).copy(),
+                          np.frombuffer(store.finished, dtype=np.int64).copy(),
+                          np.frombuffer(store.ranks, dtype=np.uint8).copy(),
+                          np.frombuffer(store.done, dtype=np.uint8).copy()))
+    return [np.concatenate(column) for column in zip(*parts)]
+
+def numpy_figures(stores, now, first_day, first_week):
+    created, finished, ranks, done = numpy_columns(stores)
+    today = now // 86400
+    completed = (done != 0) & (finished != NO_TIME)
+    
+    days = finished[completed] // 86400
+    recent = days[(days >= first_day) & (days <= today)]
+    per_day = np.bincount(recent - first_day, minlength=today - first_day + 1)
+    weeks = week_of(days)
+    recent = weeks[(weeks >= first_week) & (weeks <= week_of(today))]
+    per_week = np.bincount(recent - first_week, minlength=week_of(today) - first_week + 1)
+    
+    timed = completed & (created != NO_TIME)
+    lead = finished[timed] - created[timed]
+    lead_ranks = ranks[timed]
+    lead_time = {}
+    for rank, priority in enumerate(PRIORITY_NAMES):
+        values = lead[lead_ranks == rank]
+        lead_time[priority] = (float(np.median(values)) if len(values) else None, len(values))
+    
+    ages = now - created[(done == 0) & (created != NO_TIME)]
+    backlog = np.bincount(np.searchsorted(BACKLOG_AGE_SECONDS, ages, side='right'),
+                          minlength=len(BACKLOG_AGE_LABELS))
+    return per_day.tolist(), per_week.tolist(), lead_time, backlog.tolist()
+
+def python_figures(stores, now, first_day, first_week):
+    # The same figures one task at a time, for when NumPy is not installed
+    today = now // 86400
+    by_day = Counter()
+    leads = [[] for _ in PRIORITY_NAMES]
+    backlog = [0] * len(BACKLOG_AGE_LABELS)
+    for store in stores:
+        with store.lock:
+            columns = zip(store.created, store.finished, store.ranks, store.done)
+            for created, finished, rank, done in columns:
+                if done:
+                    if finished != NO_TIME:
+                        by_day[finished // 86400] += 1
+                        if created != NO_TIME and rank < len(leads):
+                            leads[rank].append(finished - created)
+                elif created != NO_TIME:
+                    backlog[bisect.bisect_right(BACKLOG_AGE_SECONDS, now - created)] += 1
+    
+    per_day = [by_day[day] for day in range(first_day, today + 1)]
+    per_week = [0] * (week_of(today) - first_week + 1)
+    for day, count in by_day.items():
+        if day <= today and week_of(day) >= first_week:
+            per_week[week_of(day) - first_week] += count
+    lead_time = {priority: (statistics.median(values) if values else None, len(values))
+                 for priority, values in zip(PRIORITY_NAMES, leads)}
+    return per_day, per_week, lead_time, backlog
+
+class TaskAnalytics:
+    # The report for one engine. It listens to both the live store and the archive's,
+    # and any change there drops the cached report; a new day does too, since the
+    # daily and weekly windows move. Deleted tasks have no timestamps in the columns
+    # (see TaskStore.delete), so the passes need no separate liveness mask.
+    def __init__(self, engine, use_numpy=None):
+        self.engine = engine
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self.cached = None
+        # The archive is read now, so its tasks reach the store before we listen
+        engine.history()
+        engine.store.subscribe(self)
+        engine.archive.store.subscribe(self)
+    
+    def invalidate(self, *args):
+        self.cached = None
+    
+    tasks_loaded = task_added = task_changed = task_removed = invalidate
+    
+    def report(self, now=None):
+        # A dict of the figures; the same object until something changes
+        now = current_timestamp() if now is None else now
+        today = now // 86400
+        if self.cached is not None and self.cached['day'] == today:
+            return self.cached
+        
+        # Segments archived since the last report; their tasks arrive through tasks_loaded
+        self.engine.history()
+        start = time.perf_counter()
+        first_day = today - ANALYTICS_DAYS + 1
+        first_week = week_of(today) - ANALYTICS_WEEKS + 1
+        stores = [self.engine.store, self.engine.archive.store]
+        figures = numpy_figures if self.use_numpy else python_figures
+        per_day, per_week, lead_time, backlog = figures(stores, now, first_day, first_week)
+        self.cached = {
+            'day': today,
+            'tasks': sum(len(store) for store in stores),
+            'completed_per_day': [(format_day((first_day + offset) * 86400), count)
+                                  for offset, count in enumerate(per_day)],
+            'completed_per_week': [(format_day(((first_week + offset) * 7 - 3) * 86400), count)
+                                   for offset, count in enumerate(per_week)],
+            'median_lead_time': lead_time,
+            'backlog_age': list(zip(BACKLOG_AGE_LABELS, backlog)),
+            'backend': "numpy" if self.use_numpy else "python",
+            'seconds': time.perf_counter() - start
+        }
+        return self.cached
\ No newline at end of file
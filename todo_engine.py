@@ -0,0 +1,3076 @@
+# Task data model, indexes and storage backends. Nothing here imports tkinter, so
+# scripts, the command line and benchmarks can use it without a display.
+import json
+import os
+import re
+import bisect
+import csv
+import heapq
+import io
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: byte-range locks from msvcrt instead of flock
+    fcntl = None
+    import msvcrt
+
+# Display order of priorities in the task list
+PRIORITY_ORDER = {'High': 0, 'Medium': 1, 'Low': 2}
+PRIORITY_NAMES = list(PRIORITY_ORDER)
+
+# Rank of a priority name that is not one of PRIORITY_ORDER; the name itself is
+# kept with the task's other unrecognised fields
+OTHER_RANK = 3
+
+# Timestamps are stored as seconds since 1970-01-01 00:00 on the same wall clock
+# as the "%Y-%m-%d %H:%M" strings of tasks.json, so converting back and forth
+# never depends on the time zone. NO_TIME marks a missing one in the columns.
+TIMESTAMP = re.compile(r'\d{4}-\d\d-\d\d (?:[01]\d|2[0-3]):[0-5]\d')
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_TIME = -(1 << 63)
+CLOCK_NAMES = [f" {hour:02d}:{minute:02d}" for hour in range(24) for minute in range(60)]
+CLOCK_TIMES = {name: minute * 60 for minute, name in enumerate(CLOCK_NAMES)}
+day_numbers = {}
+day_names = {}
+
+def parse_timestamp(text):
+    # None for anything that would not format back to the same string. A day seen
+    # before and the time of day are dict lookups; only a new day goes through the
+    # regex and the calendar.
+    try:
+        number = day_numbers.get(text[:10])
+        if number is None:
+            if TIMESTAMP.fullmatch(text) is None:
+                return None
+            number = day_numbers[text[:10]] = date.fromisoformat(text[:10]).toordinal() - EPOCH_ORDINAL
+        return number * 86400 + CLOCK_TIMES[text[10:]]
+    except (TypeError, KeyError, ValueError):
+        return None
+
+def format_day(seconds):
+    # "%Y-%m-%d" of a timestamp, or "" for a missing one
+    if seconds is None:
+        return ""
+    number = seconds // 86400
+    name = day_names.get(number)
+    if name is None:
+        name = day_names[number] = date.fromordinal(number + EPOCH_ORDINAL).isoformat()
+    return name
+
+def format_timestamp(seconds):
+    return format_day(seconds) + CLOCK_NAMES[seconds % 86400 // 60]
+
+def current_timestamp():
+    return parse_timestamp(datetime.now().strftime("%Y-%m-%d %H:%M"))
+
+WALL_EPOCH = datetime(1970, 1, 1)
+
+def current_seconds():
+    # The same clock with seconds and their fractions, for timers that wait for a timestamp
+    return (datetime.now() - WALL_EPOCH).total_seconds()
+
+# Due dates and reminders are optional due_at and remind_at fields in the same
+# format. Few tasks have them, so they live in extra like any field without a
+# column. As typed, a time can also be relative: "+30m", "+2h", "+3d", "+1w".
+RELATIVE_TIME = re.compile(r'\+\s*(\d+)\s*([mhdw])')
+RELATIVE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+END_OF_DAY = " 23:59"
+
+def parse_when(text, now=None):
+    # "2024-05-01 14:30", "2024-05-01" (the end of that day), "today", "tomorrow" or
+    # a relative time as a due_at/remind_at value; None for an empty one
+    text = str(text or "").strip().lower()
+    if not text:
+        return None
+    now = current_timestamp() if now is None else now
+    relative = RELATIVE_TIME.fullmatch(text)
+    if relative:
+        return format_timestamp(now + int(relative.group(1)) * RELATIVE_UNITS[relative.group(2)])
+    if text in ('today', 'tomorrow'):
+        return format_day(now + 86400 * (text == 'tomorrow')) + END_OF_DAY
+    if len(text) == 10:
+        text += END_OF_DAY
+    if parse_timestamp(text) is None:
+        raise ValueError(f"{text!r} is not a date (YYYY-MM-DD HH:MM, today, tomorrow or +2h)")
+    return text
+
+class TaskFields:
+    # Read access shared by TaskRef (a live row of the store) and TaskSnapshot (a
+    # detached copy). Code inside the engine reads the compact fields: id, text,
+    # rank, completed and the created/completed_at timestamps. task['priority'],
+    # task['created_at'] and the rest give the tasks.json values, converted on
+    # the way out, and to_dict() builds the whole JSON object.
+    __slots__ = ()
+    
+    def key(self):
+        return (self.completed, self.rank, self.id)
+    
+    @property
+    def priority(self):
+        if self.rank < OTHER_RANK:
+            return PRIORITY_NAMES[self.rank]
+        return (self.extra or {}).get('priority')
+    
+    def __getitem__(self, field):
+        if field == 'id':
+            return self.id
+        if field == 'text':
+            return self.text
+        if field == 'completed':
+            return self.completed
+        if field == 'created_at' and self.created is not None:
+            return format_timestamp(self.created)
+        if field == 'completed_at' and self.completed_at is not None:
+            return format_timestamp(self.completed_at)
+        if field == 'priority' and self.rank < OTHER_RANK:
+            return PRIORITY_NAMES[self.rank]
+        extra = self.extra
+        if extra and field in extra:
+            return extra[field]
+        raise KeyError(field)
+    
+    def __contains__(self, field):
+        try:
+            self[field]
+        except KeyError:
+            return False
+        return True
+    
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+    
+    @property
+    def due(self):
+        # due_at and remind_at as timestamps, None when unset
+        return parse_timestamp((self.extra or {}).get('due_at'))
+    
+    @property
+    def remind(self):
+        return parse_timestamp((self.extra or {}).get('remind_at'))
+    
+    @property
+    def parent(self):
+        # parent_id as a task id, None when unset or not one
+        parent = (self.extra or {}).get('parent_id')
+        return parent if type(parent) is int and parent > 0 else None
+    
+    def to_dict(self):
+        task = {'id': self.id, 'text': self.text}
+        if self.rank < OTHER_RANK:
+            task['priority'] = PRIORITY_NAMES[self.rank]
+        task['completed'] = self.completed
+        if self.created is not None:
+            task['created_at'] = format_timestamp(self.created)
+        if self.completed_at is not None:
+            task['completed_at'] = format_timestamp(self.completed_at)
+        if self.extra:
+            task.update(self.extra)
+        return task
+
+class TaskRef(TaskFields):
+    # One row of a TaskStore. It reads the columns on every access, so it always
+    # shows the task's current state; after a delete, use the returned snapshot.
+    __slots__ = ('store', 'id')
+    
+    def __init__(self, store, task_id):
+        self.store = store
+        self.id = task_id
+    
+    def key(self):
+        store, task_id = self.store, self.id
+        return (store.done[task_id] == 1, store.ranks[task_id], task_id)
+    
+    def to_dict(self):
+        # Same as TaskFields.to_dict, reading the columns directly (saves call it for every task)
+        store, task_id = self.store, self.id
+        task = {'id': task_id, 'text': store.texts[task_id]}
+        rank = store.ranks[task_id]
+        if rank < OTHER_RANK:
+            task['priority'] = PRIORITY_NAMES[rank]
+        task['completed'] = store.done[task_id] == 1
+        seconds = store.created[task_id]
+        if seconds != NO_TIME:
+            task['created_at'] = format_timestamp(seconds)
+        seconds = store.finished[task_id]
+        if seconds != NO_TIME:
+            task['completed_at'] = format_timestamp(seconds)
+        extra = store.extras.get(task_id)
+        if extra:
+            task.update(extra)
+        return task
+    
+    @property
+    def text(self):
+        return self.store.texts[self.id]
+    
+    @property
+    def rank(self):
+        return self.store.ranks[self.id]
+    
+    @property
+    def completed(self):
+        return self.store.done[self.id] == 1
+    
+    @property
+    def created(self):
+        seconds = self.store.created[self.id]
+        return None if seconds == NO_TIME else seconds
+    
+    @property
+    def completed_at(self):
+        seconds = self.store.finished[self.id]
+        return None if seconds == NO_TIME else seconds
+    
+    @property
+    def extra(self):
+        return self.store.extras.get(self.id)
+    
+    def __eq__(self, other):
+        return isinstance(other, TaskRef) and other.store is self.store and other.id == self.id
+    
+    def __hash__(self):
+        return hash(self.id)
+    
+    def __repr__(self):
+        return f"TaskRef({self.to_dict()!r})"
+
+class TaskRows:
+    # A batch of tasks by id, as handed to tasks_loaded. Rows are made as they are
+    # read, so a million-task load never holds a million TaskRefs at once.
+    __slots__ = ('store', 'ids')
+    
+    def __init__(self, store, ids):
+        self.store = store
+        self.ids = ids
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TaskRows(self.store, self.ids[index])
+        return TaskRef(self.store, self.ids[index])
+    
+    def __iter__(self):
+        store = self.store
+        for task_id in self.ids:
+            yield TaskRef(store, task_id)
+
+class TaskSnapshot(TaskFields):
+    # The fields of one task at one moment: the "before" of a change, a deleted
+    # task, or a row read from SQLite
+    __slots__ = ('id', 'text', 'rank', 'completed', 'created', 'completed_at', 'extra')
+    
+    def __init__(self, task_id, text, rank, completed, created, completed_at, extra):
+        self.id = task_id
+        self.text = text
+        self.rank = rank
+        self.completed = completed
+        self.created = created
+        self.completed_at = completed_at
+        self.extra = extra
+    
+    @classmethod
+    def of(cls, task):
+        return cls(task.id, task.text, task.rank, task.completed, task.created, task.completed_at,
+                   dict(task.extra) if task.extra else None)
+    
+    @classmethod
+    def from_dict(cls, task):
+        return cls(*compact_fields(task))
+    
+    def __repr__(self):
+        return f"TaskSnapshot({self.to_dict()!r})"
+
+COLUMN_FIELDS = ('id', 'text', 'completed')
+
+def compact_fields(task):
+    # A tasks.json object as (id, text, rank, completed, created, completed_at,
+    # extra). extra keeps whatever has no compact form (unknown keys, an unknown
+    # priority, a timestamp in another format), so to_dict() gives the object back.
+    rank = PRIORITY_ORDER.get(task.get('priority'), OTHER_RANK)
+    created = parse_timestamp(task.get('created_at'))
+    completed_at = parse_timestamp(task.get('completed_at'))
+    extra = None
+    compact = (2 + ('completed' in task) + (rank != OTHER_RANK)
+               + (created is not None) + (completed_at is not None))
+    if len(task) > compact:
+        extra = {key: value for key, value in task.items() if key not in COLUMN_FIELDS}
+        if rank != OTHER_RANK:
+            del extra['priority']
+        if created is not None:
+            del extra['created_at']
+        if completed_at is not None:
+            del extra['completed_at']
+    return (task['id'], task['text'], rank, bool(task.get('completed')), created, completed_at, extra)
+
+def display_key(task):
+    # Sort key of the task list; the id keeps insertion order within a group
+    return task.key()
+
+# Which display keys belong to each filter
+FILTER_PREDICATES = {
+    'all': lambda key: True,
+    'pending': lambda key: not key[0],
+    'completed': lambda key: key[0],
+    'high': lambda key: key[1] == 0,
+    'medium': lambda key: key[1] == 1,
+    'low': lambda key: key[1] == 2
+}
+
+# Filters that depend on the time of day rather than the display key; TaskSchedule
+# serves them
+SCHEDULE_FILTERS = ('overdue',)
+FILTER_NAMES = list(FILTER_PREDICATES) + list(SCHEDULE_FILTERS)
+
+class TaskStore:
+    # Tasks in columns indexed by id: texts, priority ranks and completion flags
+    # in bytearrays, timestamps in arrays of 64-bit ints, and a dict of extra
+    # fields only for the rare task that has any. That is about 26 bytes a task
+    # plus its text, where a dict per task costs several hundred. Ids are dense
+    # (the counter never goes backwards), so a deleted task leaves a hole that
+    # texts[id] is None marks. tasks.json objects come in through put/extend and
+    # go out through to_dict(); everything else sees TaskRef rows. Iteration
+    # follows id order. Changes hold the lock so a background writer can take a
+    # consistent copy.
+    def __init__(self, tasks=(), next_id=1):
+        self.texts = [None]
+        self.ranks = bytearray(1)
+        self.done = bytearray(1)
+        self.created = array('q', [NO_TIME])
+        self.finished = array('q', [NO_TIME])
+        self.extras = {}
+        self.count = 0
+        self.next_id = next_id
+        self.listeners = []
+        self.lock = threading.RLock()
+        if tasks:
+            self.extend(tasks)
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        texts = self.texts
+        for task_id in range(1, len(texts)):
+            if texts[task_id] is not None:
+                yield TaskRef(self, task_id)
+    
+    def __contains__(self, task_id):
+        return 0 < task_id < len(self.texts) and self.texts[task_id] is not None
+    
+    def __getitem__(self, task_id):
+        if task_id not in self:
+            raise KeyError(task_id)
+        return TaskRef(self, task_id)
+    
+    def get(self, task_id):
+        return TaskRef(self, task_id) if task_id in self else None
+    
+    def subscribe(self, listener):
+        # Listeners get task_added(task), task_changed(task, before), task_removed(task)
+        # and tasks_loaded(tasks) for a batch of new tasks from extend(). before and
+        # removed tasks are TaskSnapshots.
+        self.listeners.append(listener)
+    
+    def reserve(self, last_id):
+        # Grow the columns to hold ids up to last_id, by at least an eighth so
+        # adding tasks one at a time does not copy the arrays every time
+        size = len(self.texts)
+        if last_id >= size:
+            missing = max(last_id + 1, size + size // 8) - size
+            self.texts.extend([None] * missing)
+            self.ranks.extend(bytes(missing))
+            self.done.extend(bytes(missing))
+            self.created.extend(array('q', [NO_TIME]) * missing)
+            self.finished.extend(array('q', [NO_TIME]) * missing)
+    
+    def write(self, fields):
+        task_id, text, rank, completed, created, completed_at, extra = fields
+        if not isinstance(task_id, int) or task_id < 1:
+            raise ValueError(f"Task id must be a positive integer, not {task_id!r}")
+        if task_id >= len(self.texts):
+            self.reserve(task_id)
+        self.texts[task_id] = text
+        self.ranks[task_id] = rank
+        self.done[task_id] = completed
+        self.created[task_id] = NO_TIME if created is None else created
+        self.finished[task_id] = NO_TIME if completed_at is None else completed_at
+        if extra:
+            self.extras[task_id] = extra
+        else:
+            self.extras.pop(task_id, None)
+        self.next_id = max(self.next_id, task_id + 1)
+    
+    def put(self, task):
+        # Insert or replace a tasks.json object that already has an id (loading, importing)
+        with self.lock:
+            fields = compact_fields(task)
+            before = self.get(fields[0])
+            if before is not None:
+                before = TaskSnapshot.of(before)
+            else:
+                self.count += 1
+            self.write(fields)
+            task = TaskRef(self, fields[0])
+            for listener in self.listeners:
+                if before is None:
+                    listener.task_added(task)
+                else:
+                    listener.task_changed(task, before)
+        return task
+    
+    def extend(self, tasks):
+        # Bulk insert of tasks.json objects for incremental loading: one listener
+        # call per batch. Returns the new tasks as TaskRows. The loop handles objects with
+        # exactly the usual fields itself; anything else goes through
+        # compact_fields() and write().
+        with self.lock:
+            loaded = []
+            texts, ranks, done, created, finished = self.texts, self.ranks, self.done, self.created, self.finished
+            for task in tasks:
+                task_id = task['id']
+                if type(task_id) is not int or task_id < 1:
+                    raise ValueError(f"Task id must be a positive integer, not {task_id!r}")
+                if task_id < len(texts) and texts[task_id] is not None:
+                    self.put(task)
+                    continue
+                rank = PRIORITY_ORDER.get(task.get('priority'), OTHER_RANK)
+                started = parse_timestamp(task.get('created_at'))
+                ended = parse_timestamp(task.get('completed_at'))
+                completed = task.get('completed')
+                if (rank == OTHER_RANK or started is None or type(completed) is not bool
+                        or len(task) != 5 + (ended is not None)):
+                    self.write(compact_fields(task))
+                else:
+                    if task_id >= len(texts):
+                        self.reserve(task_id)
+                    texts[task_id] = task['text']
+                    ranks[task_id] = rank
+                    done[task_id] = completed
+                    created[task_id] = started
+                    finished[task_id] = NO_TIME if ended is None else ended
+                loaded.append(task_id)
+            self.count += len(loaded)
+            if loaded:
+                self.next_id = max(self.next_id, max(loaded) + 1)
+            loaded = TaskRows(self, loaded)
+            for listener in self.listeners:
+                listener.tasks_loaded(loaded)
+        return loaded
+    
+    def add_many(self, entries):
+        # Bulk add (imports): ids are handed out in order and listeners get one
+        # tasks_loaded call for the lot
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self.lock:
+            tasks = []
+            for entry in entries:
+                task = {
+                    'id': self.next_id + len(tasks),
+                    'text': entry['text'],
+                    'priority': entry.get('priority', 'Medium'),
+                    'completed': bool(entry.get('completed')),
+                    'created_at': now
+                }
+                if task['completed']:
+                    task['completed_at'] = now
+                tasks.append(task)
+            return self.extend(tasks)
+    
+    def add(self, text, priority, **fields):
+        # fields are further tasks.json fields, e.g. due_at="..."; None ones are left out
+        with self.lock:
+            task = TaskRef(self, self.next_id)
+            self.write(compact_fields(dict({
+                'id': task.id,
+                'text': text,
+                'priority': priority,
+                'completed': False,
+                'created_at': datetime.now().strftime("%Y-%m-%d %H:%M")
+            }, **{field: value for field, value in fields.items() if value is not None})))
+            self.count += 1
+            for listener in self.listeners:
+                listener.task_added(task)
+        return task
+    
+    def update(self, task_id, **changes):
+        # changes are tasks.json fields, e.g. text="...", priority="High"; a field
+        # changed to None is removed (due_at=None clears the due date)
+        with self.lock:
+            task = self[task_id]
+            before = TaskSnapshot.of(task)
+            fields = before.to_dict()
+            for field, value in changes.items():
+                if value is None:
+                    fields.pop(field, None)
+                else:
+                    fields[field] = value
+            self.write(compact_fields(fields))
+            for listener in self.listeners:
+                listener.task_changed(task, before)
+        return task
+    
+    def toggle(self, task_id):
+        with self.lock:
+            task = self[task_id]
+            before = TaskSnapshot.of(task)
+            if self.done[task_id]:
+                self.done[task_id] = 0
+                self.finished[task_id] = NO_TIME
+            else:
+                self.done[task_id] = 1
+                self.finished[task_id] = current_timestamp()
+            for listener in self.listeners:
+                listener.task_changed(task, before)
+        return task
+    
+    def delete(self, task_id):
+        # Returns the deleted task as a TaskSnapshot. The hole keeps no timestamps,
+        # so passes over the columns alone (analytics) skip it like a never used id.
+        with self.lock:
+            task = TaskSnapshot.of(self[task_id])
+            self.texts[task_id] = None
+            self.created[task_id] = NO_TIME
+            self.finished[task_id] = NO_TIME
+            self.extras.pop(task_id, None)
+            self.count -= 1
+            for listener in self.listeners:
+                listener.task_removed(task)
+        return task
+    
+    def copy(self):
+        # A detached copy that another thread can serialize while this store keeps
+        # changing; copying the columns is a handful of memcpy-like operations
+        with self.lock:
+            clone = TaskStore(next_id=self.next_id)
+            clone.texts = self.texts[:]
+            clone.ranks = self.ranks[:]
+            clone.done = self.done[:]
+            clone.created = self.created[:]
+            clone.finished = self.finished[:]
+            clone.extras = {task_id: dict(extra) for task_id, extra in self.extras.items()}
+            clone.count = self.count
+        return clone
+    
+    def completed_before(self, cutoff):
+        # Ids of tasks completed before the cutoff timestamp, from the columns alone;
+        # find() skips over pending tasks at C speed
+        texts, done, finished = self.texts, self.done, self.finished
+        task_ids = []
+        task_id = done.find(1)
+        while task_id != -1:
+            if NO_TIME < finished[task_id] < cutoff and texts[task_id] is not None:
+                task_ids.append(task_id)
+            task_id = done.find(1, task_id + 1)
+        return task_ids
+
+class TaskIndex:
+    # Display keys grouped by (completed, priority rank), each group kept sorted by
+    # bisect insertion as the store changes. A filter is the run of groups it
+    # selects, in display order, so switching filters never sorts and a bulk load
+    # only appends: tasks arrive in id order, which is each group's order.
+    GROUPS = [(completed, rank) for completed in (False, True) for rank in range(4)]
+    
+    def __init__(self, store):
+        self.store = store
+        self.groups = {group: [] for group in self.GROUPS}
+        self.members = {group: set() for group in self.GROUPS}
+        self.filters = {filter_key: [(group, self.groups[group]) for group in self.GROUPS if matches(group)]
+                        for filter_key, matches in FILTER_PREDICATES.items()}
+        self.tasks_loaded(store)
+    
+    def insert(self, key):
+        bisect.insort(self.groups[key[:2]], key)
+        self.members[key[:2]].add(key[2])
+    
+    def remove(self, key):
+        keys = self.groups[key[:2]]
+        index = bisect.bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            del keys[index]
+            self.members[key[:2]].discard(key[2])
+    
+    def tasks_loaded(self, tasks):
+        unsorted = set()
+        for task in tasks:
+            key = task.key()
+            keys = self.groups[key[:2]]
+            if keys and keys[-1] > key:
+                unsorted.add(key[:2])
+            keys.append(key)
+            self.members[key[:2]].add(key[2])
+        for group in unsorted:
+            self.groups[group].sort()
+    
+    def task_added(self, task):
+        self.insert(display_key(task))
+    
+    def task_changed(self, task, before):
+        old_key, new_key = display_key(before), display_key(task)
+        if old_key != new_key:
+            self.remove(old_key)
+            self.insert(new_key)
+    
+    def task_removed(self, task):
+        self.remove(display_key(task))
+    
+    def view(self, filter_key):
+        return TaskIndexView(self.store, self.filters[filter_key])
+    
+    def search(self, filter_key, ids):
+        # The tasks of one filter whose ids are in ids (e.g. search matches)
+        return TaskSearchView(self.store, [(group, self.members[group]) for group, _ in self.filters[filter_key]], ids)
+
+class TaskIndexView:
+    # Live, read-only sequence of tasks over the groups of one filter
+    def __init__(self, store, groups):
+        self.store = store
+        self.groups = groups
+    
+    def __len__(self):
+        return sum(len(keys) for _, keys in self.groups)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for _, keys in self.groups:
+                if index < len(keys):
+                    return self.store.get(keys[index][2])
+                index -= len(keys)
+        raise IndexError("task index out of range")
+    
+    def __iter__(self):
+        for _, keys in self.groups:
+            for key in keys:
+                yield self.store.get(key[2])
+    
+    def index_of(self, task):
+        key = display_key(task)
+        offset = 0
+        for group, keys in self.groups:
+            if group == key[:2]:
+                index = bisect.bisect_left(keys, key)
+                if index < len(keys) and keys[index] == key:
+                    return offset + index
+                return None
+            offset += len(keys)
+        return None
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+class TaskSearchIndex:
+    # Inverted index from word to task ids, plus the sorted vocabulary for prefix
+    # lookups. Kept in step with the store through the listener hooks, so a query
+    # never rescans task text.
+    def __init__(self, store):
+        self.store = store
+        self.postings = {}
+        self.vocabulary = []
+        self.tasks_loaded(store)
+    
+    def add(self, task):
+        for token in set(tokenize(task.text)):
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = ids = set()
+                bisect.insort(self.vocabulary, token)
+            ids.add(task.id)
+    
+    def discard(self, task):
+        for token in set(tokenize(task.text)):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(task.id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+    
+    def tasks_loaded(self, tasks):
+        # Bulk path: new words are sorted into the vocabulary once per batch
+        postings = self.postings
+        new_tokens = []
+        for task in tasks:
+            task_id = task.id
+            for token in tokenize(task.text):
+                ids = postings.get(token)
+                if ids is None:
+                    postings[token] = ids = set()
+                    new_tokens.append(token)
+                ids.add(task_id)
+        if new_tokens:
+            self.vocabulary = sorted(self.vocabulary + new_tokens)
+    
+    def task_added(self, task):
+        self.add(task)
+    
+    def task_changed(self, task, before):
+        if task.text != before.text:
+            self.discard(before)
+            self.add(task)
+    
+    def task_removed(self, task):
+        self.discard(task)
+    
+    def prefix_matches(self, prefix):
+        # Ids of tasks with a word starting with prefix
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff')
+        postings = [self.postings[token] for token in self.vocabulary[start:end]]
+        if len(postings) == 1:
+            return postings[0]
+        return set().union(*postings)
+    
+    def matches(self, query):
+        # Ids of tasks that have, for every word of the query, a word starting with it.
+        # The result may be one of the postings themselves: callers must not change it.
+        result = None
+        for term in sorted(set(tokenize(query)), key=len, reverse=True):
+            ids = self.prefix_matches(term)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result if result is not None else set()
+
+class TaskSearchView:
+    # A snapshot of the tasks of one filter whose ids are in ids, in display order.
+    # Set intersections give each group's matches and the total at once; within a
+    # group display order is id order, so a group is only sorted once a row of it
+    # is needed.
+    def __init__(self, store, groups, ids):
+        self.store = store
+        self.groups = [(group, ids & members) for group, members in groups]
+        self.ordered = {}
+        self.length = sum(len(matches) for _, matches in self.groups)
+    
+    def ids(self, position):
+        ordered = self.ordered.get(position)
+        if ordered is None:
+            ordered = self.ordered[position] = sorted(self.groups[position][1])
+        return ordered
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for position, (_, matches) in enumerate(self.groups):
+                if index < len(matches):
+                    return self.store.get(self.ids(position)[index])
+                index -= len(matches)
+        raise IndexError("task index out of range")
+    
+    def __iter__(self):
+        for position in range(len(self.groups)):
+            for task_id in self.ids(position):
+                yield self.store.get(task_id)
+    
+    def index_of(self, task):
+        group = display_key(task)[:2]
+        offset = 0
+        for position, (candidate, matches) in enumerate(self.groups):
+            if candidate == group:
+                if task.id not in matches:
+                    return None
+                return offset + bisect.bisect_left(self.ids(position), task.id)
+            offset += len(matches)
+        return None
+
+class TaskChainView:
+    # Several views shown one after the other, e.g. the live tasks of a filter and
+    # then the archived ones. Task ids never repeat between the parts.
+    def __init__(self, views):
+        self.views = views
+    
+    def __len__(self):
+        return sum(len(view) for view in self.views)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for view in self.views:
+                if index < len(view):
+                    return view[index]
+                index -= len(view)
+        raise IndexError("task index out of range")
+    
+    def __iter__(self):
+        for view in self.views:
+            yield from view
+    
+    def index_of(self, task):
+        offset = 0
+        for view in self.views:
+            index = view.index_of(task)
+            if index is not None:
+                return offset + index
+            offset += len(view)
+        return None
+    
+    def invalidate(self):
+        for view in self.views:
+            if hasattr(view, 'invalidate'):
+                view.invalidate()
+
+class TaskTree:
+    # Subtasks. A task's parent_id field names the task it belongs to; a task whose
+    # parent is not in the store (never was, deleted or archived) is top-level, so
+    # deleting a parent lifts its subtasks a level instead of losing them, and
+    # bringing it back gathers them again. For each parent the display keys of its
+    # subtasks are kept sorted, and so are those of every nested task per TaskIndex
+    # group: the top level of a filter is its index view less those.
+    # rollup holds [subtasks, completed subtasks], at any depth, for every task that
+    # has subtasks. It is counted once on first use after a load; from then on a
+    # change only walks up the changed task's ancestors. A parent_id that would close
+    # a loop (a hand-edited file) is ignored and the task stays top-level.
+    def __init__(self, store):
+        self.store = store
+        self.parents = {}
+        self.children = {}
+        self.nested = {group: [] for group in TaskIndex.GROUPS}
+        self.loops = set()
+        self.rollup = None
+        # Tasks whose subtasks are shown (a UI's state, not saved), and a counter that
+        # changes with anything that moves rows, for the views to notice
+        self.expanded = set()
+        self.version = 0
+        # Only tasks with extra fields can have a parent
+        self.tasks_loaded(TaskRows(store, sorted(store.extras)))
+    
+    def parent_of(self, task_id):
+        # The task's parent if it is shown under one, else None
+        parent = self.parents.get(task_id)
+        if parent is None or parent not in self.store or task_id in self.loops:
+            return None
+        return parent
+    
+    def ancestors(self, task_id):
+        # Parent, grandparent and so on. Loops in a loaded file are only cut when
+        # counting, so until then the walk is bounded by the number of links.
+        parent = self.parent_of(task_id)
+        for _ in range(len(self.parents)):
+            if parent is None:
+                return
+            yield parent
+            parent = self.parent_of(parent)
+    
+    def subtasks(self, task_id):
+        # The task's subtasks in display order
+        if task_id not in self.store:
+            return TaskRows(self.store, [])
+        return TaskRows(self.store, [key[2] for key in self.children.get(task_id, ())])
+    
+    def progress(self, task_id):
+        # (completed, total) over all the task's subtasks, None if it has none
+        counts = self.count().get(task_id)
+        return (counts[1], counts[0]) if counts else None
+    
+    def set_expanded(self, task_id, expanded=True):
+        if expanded:
+            self.expanded.add(task_id)
+        else:
+            self.expanded.discard(task_id)
+        self.version += 1
+    
+    def view(self, index, filter_key):
+        return TaskTreeView(self, index.filters[filter_key])
+    
+    def link(self, task, check=True):
+        # Enter the task under its parent_id. A single change checks that the parent
+        # is not among the task's own subtasks; a loaded batch leaves that to count().
+        parent = task.parent
+        if parent is None:
+            return
+        self.parents[task.id] = parent
+        if check and parent in self.store and (parent == task.id or task.id in self.ancestors(parent)):
+            self.loops.add(task.id)
+            return
+        key = task.key()
+        bisect.insort(self.children.setdefault(parent, []), key)
+        if parent in self.store:
+            bisect.insort(self.nested[key[:2]], key)
+    
+    def unlink(self, task):
+        parent = self.parents.pop(task.id, None)
+        if parent is None:
+            return
+        if task.id in self.loops:
+            self.loops.discard(task.id)
+            return
+        key = display_key(task)
+        siblings = self.children[parent]
+        del siblings[bisect.bisect_left(siblings, key)]
+        if not siblings:
+            del self.children[parent]
+        if parent in self.store:
+            nested = self.nested[key[:2]]
+            del nested[bisect.bisect_left(nested, key)]
+    
+    def adopt(self, task_id):
+        # A task arrived whose subtasks were top-level while it was away
+        for key in self.children.get(task_id, ()):
+            bisect.insort(self.nested[key[:2]], key)
+    
+    def orphan(self, task_id):
+        for key in self.children.get(task_id, ()):
+            nested = self.nested[key[:2]]
+            del nested[bisect.bisect_left(nested, key)]
+    
+    def subtree(self, task):
+        # (tasks, completed tasks) of the task and its subtasks, as its ancestors count it
+        counts = self.rollup.get(task.id, (0, 0))
+        return 1 + counts[0], task.completed + counts[1]
+    
+    def carry(self, task_id, total, completed):
+        # Add a subtree's counts to every ancestor of task_id
+        if self.rollup is None:
+            return
+        for parent in self.ancestors(task_id):
+            counts = self.rollup.setdefault(parent, [0, 0])
+            counts[0] += total
+            counts[1] += completed
+            if not counts[0]:
+                del self.rollup[parent]
+    
+    def count(self):
+        # Count every subtree from the top-level parents down, children first. Tasks
+        # never reached hang under a loop, which is cut at the first of them found.
+        if self.rollup is not None:
+            return self.rollup
+        rollup = self.rollup = {}
+        store, children = self.store, self.children
+        reached = set()
+        
+        def descend(task_id):
+            stack = [(task_id, False)]
+            while stack:
+                task_id, counted = stack.pop()
+                if counted:
+                    total = completed = 0
+                    for key in children[task_id]:
+                        counts = rollup.get(key[2])
+                        total += 1 + (counts[0] if counts else 0)
+                        completed += key[0] + (counts[1] if counts else 0)
+                    rollup[task_id] = [total, completed]
+                    continue
+                stack.append((task_id, True))
+                for key in children[task_id]:
+                    reached.add(key[2])
+                    if key[2] in children:
+                        stack.append((key[2], False))
+        
+        for task_id in children:
+            if task_id in store and self.parent_of(task_id) is None:
+                descend(task_id)
+        for keys in self.nested.values():
+            for key in list(keys):
+                if key[2] not in reached:
+                    task = TaskRef(store, key[2])
+                    self.unlink(task)
+                    self.parents[task.id] = task.parent
+                    self.loops.add(task.id)
+                    if task.id in children:
+                        descend(task.id)
+                    self.version += 1
+        return rollup
+    
+    def tasks_loaded(self, tasks):
+        store, extras, children = self.store, self.store.extras, self.children
+        if children:
+            # Parents that arrive now take back the subtasks loaded before them
+            for task_id in tasks.ids:
+                if task_id in children:
+                    self.adopt(task_id)
+        unsorted_parents = set()
+        unsorted_groups = set()
+        for task_id in tasks.ids:
+            extra = extras.get(task_id)
+            if extra and 'parent_id' in extra:
+                task = TaskRef(store, task_id)
+                parent = task.parent
+                if parent is None:
+                    continue
+                self.parents[task_id] = parent
+                key = task.key()
+                siblings = children.setdefault(parent, [])
+                if siblings and siblings[-1] > key:
+                    unsorted_parents.add(parent)
+                siblings.append(key)
+                if parent in store:
+                    nested = self.nested[key[:2]]
+                    if nested and nested[-1] > key:
+                        unsorted_groups.add(key[:2])
+                    nested.append(key)
+        for parent in unsorted_parents:
+            children[parent].sort()
+        for group in unsorted_groups:
+            self.nested[group].sort()
+        self.rollup = None
+        self.version += 1
+    
+    def task_added(self, task):
+        self.adopt(task.id)
+        if self.rollup is not None and task.id in self.children:
+            counts = self.rollup[task.id] = [0, 0]
+            for child in self.subtasks(task.id):
+                total, completed = self.subtree(child)
+                counts[0] += total
+                counts[1] += completed
+        self.link(task)
+        if self.rollup is not None:
+            self.carry(task.id, *self.subtree(task))
+        self.version += 1
+    
+    def task_changed(self, task, before):
+        old_key, new_key = display_key(before), display_key(task)
+        if task.parent == before.parent:
+            if old_key == new_key:
+                return
+            parent = self.parents.get(task.id)
+            if parent is not None and task.id not in self.loops:
+                # Same parent, another place among its subtasks (and in the nested groups)
+                siblings = self.children[parent]
+                del siblings[bisect.bisect_left(siblings, old_key)]
+                bisect.insort(siblings, new_key)
+                if parent in self.store:
+                    nested = self.nested[old_key[:2]]
+                    del nested[bisect.bisect_left(nested, old_key)]
+                    bisect.insort(self.nested[new_key[:2]], new_key)
+            if task.completed != before.completed:
+                self.carry(task.id, 0, 1 if task.completed else -1)
+        else:
+            # Moved to another parent: its whole subtree leaves one chain of ancestors for another
+            if self.rollup is not None:
+                self.carry(task.id, *(-count for count in self.subtree(before)))
+            self.unlink(before)
+            self.link(task)
+            if self.rollup is not None:
+                self.carry(task.id, *self.subtree(task))
+        self.version += 1
+    
+    def task_removed(self, task):
+        if self.rollup is not None:
+            self.carry(task.id, *(-count for count in self.subtree(task)))
+            self.rollup.pop(task.id, None)
+        self.unlink(task)
+        self.orphan(task.id)
+        self.expanded.discard(task.id)
+        self.version += 1
+
+class TaskTreeView:
+    # Live, read-only sequence of the rows of an outline: the top-level tasks of one
+    # filter in display order, each followed by its subtasks if it is expanded, and
+    # theirs in turn. Only expanded tasks cost anything: a row is found by stepping
+    # over the subtrees opened before it, so expanding or collapsing a task with
+    # 50,000 subtasks changes a single row count and materializes nothing.
+    def __init__(self, tree, groups):
+        self.tree = tree
+        self.store = tree.store
+        self.groups = groups
+        self.version = None
+    
+    def invalidate(self):
+        self.version = None
+    
+    def layout(self):
+        # openings: for each parent shown (None for the top level) the (position, id)
+        # of its expanded subtasks in order; sizes: the rows each one's subtree adds
+        tree = self.tree
+        tree.count()
+        if self.version == tree.version:
+            return
+        store, children = self.store, tree.children
+        openings = {}
+        for task_id in tree.expanded:
+            if task_id not in store or task_id not in children:
+                continue
+            key = TaskRef(store, task_id).key()
+            parent = tree.parent_of(task_id)
+            if parent is None:
+                position = self.top_index(key)
+                if position is None:
+                    continue
+            else:
+                position = bisect.bisect_left(children[parent], key)
+            openings.setdefault(parent, []).append((position, task_id))
+        for opened in openings.values():
+            opened.sort()
+        
+        sizes = {}
+        for task_id in [task_id for opened in openings.values() for _, task_id in opened]:
+            stack = [task_id]
+            while stack:
+                task_id = stack[-1]
+                inner = [child for _, child in openings.get(task_id, ()) if child not in sizes]
+                if inner:
+                    stack.extend(inner)
+                    continue
+                stack.pop()
+                sizes[task_id] = len(children[task_id]) + sum(sizes[child] for _, child in openings.get(task_id, ()))
+        
+        self.openings = openings
+        self.sizes = sizes
+        self.length = (sum(len(keys) - len(tree.nested[group]) for group, keys in self.groups)
+                       + sum(sizes[task_id] for _, task_id in openings.get(None, ())))
+        self.version = tree.version
+    
+    def top_key(self, index):
+        # The index-th top-level key: within a group, keys[p] is the (p + 1 - nested
+        # keys up to it)-th top-level one, which only grows, so it is bisected for
+        for group, keys in self.groups:
+            nested = self.tree.nested[group]
+            size = len(keys) - len(nested)
+            if index < size:
+                if not nested:
+                    return keys[index]
+                low, high = index, index + len(nested)
+                while low < high:
+                    middle = (low + high) // 2
+                    if middle - bisect.bisect_right(nested, keys[middle]) >= index:
+                        high = middle
+                    else:
+                        low = middle + 1
+                return keys[low]
+            index -= size
+        raise IndexError("task index out of range")
+    
+    def top_index(self, key):
+        offset = 0
+        for group, keys in self.groups:
+            nested = self.tree.nested[group]
+            if group == key[:2]:
+                index = bisect.bisect_left(keys, key)
+                if index == len(keys) or keys[index] != key:
+                    return None
+                skipped = bisect.bisect_left(nested, key)
+                if skipped < len(nested) and nested[skipped] == key:
+                    return None
+                return offset + index - skipped
+            offset += len(keys) - len(nested)
+        return None
+    
+    def __len__(self):
+        self.layout()
+        return self.length
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        
+        self.layout()
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("task index out of range")
+        parent = None
+        while True:
+            child = None
+            for position, task_id in self.openings.get(parent, ()):
+                if index <= position:
+                    break
+                if index <= position + self.sizes[task_id]:
+                    child = task_id
+                    break
+                index -= self.sizes[task_id]
+            if child is None:
+                key = self.top_key(index) if parent is None else self.tree.children[parent][index]
+                return self.store.get(key[2])
+            parent, index = child, index - position - 1
+    
+    def top_keys(self):
+        for group, keys in self.groups:
+            nested = set(self.tree.nested[group])
+            for key in keys:
+                if key not in nested:
+                    yield key
+    
+    def __iter__(self):
+        self.layout()
+        stack = [self.top_keys()]
+        while stack:
+            key = next(stack[-1], None)
+            if key is None:
+                stack.pop()
+                continue
+            yield self.store.get(key[2])
+            if key[2] in self.sizes:
+                stack.append(iter(self.tree.children[key[2]]))
+    
+    def index_of(self, task):
+        self.layout()
+        if task.id not in self.store:
+            return None
+        tree = self.tree
+        path = [task.id] + list(tree.ancestors(task.id))
+        row = 0
+        parent = None
+        for task_id in reversed(path):
+            key = display_key(task) if task_id == task.id else TaskRef(self.store, task_id).key()
+            if parent is None:
+                position = self.top_index(key)
+            else:
+                siblings = tree.children[parent]
+                position = bisect.bisect_left(siblings, key)
+                if position == len(siblings) or siblings[position] != key:
+                    position = None
+            if position is None:
+                return None
+            row += position + sum(self.sizes[opened] for at, opened in self.openings.get(parent, ()) if at < position)
+            if task_id != task.id:
+                if task_id not in self.sizes:
+                    return None
+                row += 1
+            parent = task_id
+        return row
+
+class TaskSchedule:
+    # Due dates and reminders of pending tasks, so one timer can serve them all.
+    # Each is a (timestamp, id) entry in a min-heap; the UI sets its timer for
+    # next_time() and collects what is due when it goes off. Changes only push
+    # (O(log n)): an entry whose task has since been completed, deleted or given
+    # another time stays in its heap and is dropped once it reaches the top, and
+    # the heaps are rebuilt when such stale entries make up most of them.
+    # Deadlines that have passed move to the overdue list, kept in (due, id)
+    # order, which is what the Overdue filter shows.
+    def __init__(self, store):
+        self.store = store
+        self.deadlines = []
+        self.reminders = []
+        self.overdue = []
+        self.overdue_ids = set()
+        self.stale = 0
+        # Called when a change brings the next reminder or deadline forward of
+        # armed, the time the owner's timer is set for
+        self.on_sooner = None
+        self.armed = None
+        self.load(list(store.extras))
+    
+    def load(self, task_ids):
+        # Only tasks with extra fields can have a due date or a reminder
+        extras = self.store.extras
+        done = self.store.done
+        for task_id in task_ids:
+            extra = extras.get(task_id)
+            if extra and not done[task_id]:
+                due = parse_timestamp(extra.get('due_at'))
+                if due is not None:
+                    self.deadlines.append((due, task_id))
+                remind = parse_timestamp(extra.get('remind_at'))
+                if remind is not None:
+                    self.reminders.append((remind, task_id))
+        heapq.heapify(self.deadlines)
+        heapq.heapify(self.reminders)
+    
+    def current(self, field, seconds, task_id):
+        # Whether a heap entry still describes its task
+        store = self.store
+        if task_id not in store or store.done[task_id]:
+            return False
+        return parse_timestamp((store.extras.get(task_id) or {}).get(field)) == seconds
+    
+    def push(self, task):
+        if task.completed:
+            return
+        for heap, seconds in ((self.deadlines, task.due), (self.reminders, task.remind)):
+            if seconds is not None:
+                heapq.heappush(heap, (seconds, task.id))
+                if self.on_sooner is not None and (self.armed is None or seconds < self.armed):
+                    self.on_sooner()
+    
+    def retire(self, task):
+        if task.completed:
+            return
+        if task.id in self.overdue_ids:
+            # Shown right now, so it leaves the overdue list at once
+            self.overdue_ids.discard(task.id)
+            del self.overdue[bisect.bisect_left(self.overdue, (task.due, task.id))]
+        elif task.due is not None:
+            self.stale += 1
+        if task.remind is not None:
+            self.stale += 1
+        if self.stale > 1000 and self.stale * 2 > len(self.deadlines) + len(self.reminders):
+            self.compact()
+    
+    def compact(self):
+        self.deadlines = list({entry for entry in self.deadlines
+                               if entry[1] not in self.overdue_ids and self.current('due_at', *entry)})
+        self.reminders = list({entry for entry in self.reminders if self.current('remind_at', *entry)})
+        heapq.heapify(self.deadlines)
+        heapq.heapify(self.reminders)
+        self.stale = 0
+    
+    def tasks_loaded(self, tasks):
+        self.load(tasks.ids)
+    
+    def task_added(self, task):
+        self.push(task)
+    
+    def task_changed(self, task, before):
+        if (task.completed, task.due, task.remind) != (before.completed, before.due, before.remind):
+            self.retire(before)
+            self.push(task)
+    
+    def task_removed(self, task):
+        self.retire(task)
+    
+    def head(self, heap, field):
+        while heap and not self.current(field, *heap[0]):
+            heapq.heappop(heap)
+            self.stale = max(self.stale - 1, 0)
+        return heap[0] if heap else None
+    
+    def next_time(self):
+        # The earliest reminder or deadline still to come, or None
+        times = [entry[0] for entry in (self.head(self.deadlines, 'due_at'), self.head(self.reminders, 'remind_at'))
+                 if entry is not None]
+        return min(times) if times else None
+    
+    def advance(self, now=None):
+        # Move deadlines up to now to the overdue list; returns the tasks that just became overdue
+        now = current_timestamp() if now is None else now
+        tasks = []
+        while True:
+            entry = self.head(self.deadlines, 'due_at')
+            if entry is None or entry[0] > now:
+                return tasks
+            heapq.heappop(self.deadlines)
+            if entry[1] not in self.overdue_ids:
+                bisect.insort(self.overdue, entry)
+                self.overdue_ids.add(entry[1])
+                tasks.append(TaskRef(self.store, entry[1]))
+    
+    def pop_reminders(self, now=None):
+        # Tasks whose reminder time has come, each once
+        now = current_timestamp() if now is None else now
+        tasks = {}
+        while True:
+            entry = self.head(self.reminders, 'remind_at')
+            if entry is None or entry[0] > now:
+                return list(tasks.values())
+            heapq.heappop(self.reminders)
+            tasks[entry[1]] = TaskRef(self.store, entry[1])
+    
+    def view(self, ids=None):
+        # The overdue tasks, most overdue first; with ids, only those among them
+        if ids is None:
+            return TaskScheduleView(self.store, self.overdue)
+        return TaskScheduleView(self.store, [entry for entry in self.overdue if entry[1] in ids])
+
+class TaskScheduleView:
+    # Tasks of a list of (timestamp, id) entries, in that order. Over the overdue
+    # list itself it is live, like the index views.
+    def __init__(self, store, entries):
+        self.store = store
+        self.entries = entries
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.get(task_id) for _, task_id in self.entries[index]]
+        return self.store.get(self.entries[index][1])
+    
+    def __iter__(self):
+        for _, task_id in self.entries:
+            yield self.store.get(task_id)
+    
+    def index_of(self, task):
+        entry = (task.due, task.id)
+        if entry[0] is None:
+            return None
+        index = bisect.bisect_left(self.entries, entry)
+        return index if index < len(self.entries) and self.entries[index] == entry else None
+
+class TaskStats:
+    # Counters kept in step with the store through its listener hooks, so reading
+    # them is O(1). Only construction scans every task. With verify=True every
+    # update is cross-checked against a full recount.
+    def __init__(self, store, verify=False):
+        self.store = store
+        self.verify = verify
+        self.total = 0
+        self.completed = 0
+        self.by_priority = Counter()
+        self.pending_by_priority = Counter()
+        self.completed_by_day = Counter()
+        for task in store:
+            self.count(task, 1)
+    
+    def tasks_loaded(self, tasks):
+        for task in tasks:
+            self.count(task, 1)
+        self.check()
+    
+    @property
+    def pending(self):
+        return self.total - self.completed
+    
+    def completed_today(self):
+        return self.completed_by_day[date.today().isoformat()]
+    
+    def count(self, task, sign):
+        self.total += sign
+        completed, rank, _ = task.key()
+        priority = PRIORITY_NAMES[rank] if rank < OTHER_RANK else task.priority
+        self.by_priority[priority] += sign
+        if completed:
+            self.completed += sign
+            self.completed_by_day[format_day(task.completed_at)] += sign
+        else:
+            self.pending_by_priority[priority] += sign
+    
+    def task_added(self, task):
+        self.count(task, 1)
+        self.check()
+    
+    def task_changed(self, task, before):
+        self.count(before, -1)
+        self.count(task, 1)
+        self.check()
+    
+    def task_removed(self, task):
+        self.count(task, -1)
+        self.check()
+    
+    def snapshot(self):
+        return (self.total,
+                self.completed,
+                +self.by_priority,
+                +self.pending_by_priority,
+                +self.completed_by_day)
+    
+    def check(self):
+        if not self.verify:
+            return
+        expected = TaskStats(self.store).snapshot()
+        if self.snapshot() != expected:
+            raise AssertionError(f"Task stats drifted: {self.snapshot()} != {expected}")
+
+def read_task_file(data):
+    # tasks.json is either the original bare list or {"next_id": ..., "tasks": [...]}
+    if isinstance(data, list):
+        return data, 1
+    return data['tasks'], data.get('next_id', 1)
+
+class TaskFileStream:
+    # Reads a task file a chunk at a time: batches() yields lists of tasks as soon
+    # as they are parsed, so nothing waits for the whole file. Both file layouts
+    # are accepted; next_id is known once the file has been read to the end.
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+    SEPARATOR = re.compile(r'[ \t\n\r]*,?[ \t\n\r]*')
+    
+    def __init__(self, path, batch_size=2000, chunk_size=1 << 16):
+        self.path = path
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.file = None
+        self.buffer = ""
+        self.pos = 0
+        self.next_id = 1
+    
+    def read_more(self):
+        chunk = self.file.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+    
+    def peek(self):
+        # The next character that is not whitespace, reading further as needed
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                raise ValueError(f"Unexpected end of {self.path}")
+    
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the current chunk in {self.path}")
+        self.pos += 1
+    
+    def value(self):
+        # A complete JSON value; one cut off by the end of the chunk is retried with more text
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the chunk may continue in the next one
+                if end < len(self.buffer) or not self.read_more():
+                    self.pos = end
+                    return value
+            except ValueError:
+                if not self.read_more():
+                    raise
+    
+    def items(self):
+        # Elements of the array at the current position, in batches. The inner loop
+        # calls the C scanner directly on the current chunk; a value cut off by the
+        # end of the chunk (or an invalid one) goes through value(), which reads on.
+        self.expect('[')
+        scan = self.decoder.scan_once
+        skip = self.SEPARATOR.match
+        batch = []
+        while True:
+            buffer = self.buffer
+            limit = len(buffer)
+            pos = skip(buffer, self.pos).end()
+            while len(batch) < self.batch_size and pos < limit and buffer[pos] != ']':
+                try:
+                    value, end = scan(buffer, pos)
+                except (StopIteration, ValueError):
+                    break
+                if end >= limit:
+                    break
+                batch.append(value)
+                pos = skip(buffer, end).end()
+            self.pos = pos
+            
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+                continue
+            char = self.peek()
+            if char == ']':
+                self.pos += 1
+                break
+            if char == ',':
+                self.pos += 1
+                continue
+            batch.append(self.value())
+        if batch:
+            yield batch
+    
+    def batches(self):
+        with open(self.path, 'r', encoding='utf-8') as self.file:
+            if self.peek() == '[':
+                yield from self.items()
+                return
+            
+            self.expect('{')
+            while True:
+                char = self.peek()
+                if char == '}':
+                    return
+                if char == ',':
+                    self.pos += 1
+                    continue
+                key = self.value()
+                self.expect(':')
+                if key == 'tasks':
+                    yield from self.items()
+                elif key == 'next_id':
+                    self.next_id = self.value()
+                else:
+                    self.value()
+
+def batched(tasks, batch_size):
+    for start in range(0, len(tasks), batch_size):
+        yield tasks[start:start + batch_size]
+
+def normalize_priority(value, default='Medium'):
+    # "high", "🔴 High" and "HIGH" all mean High
+    text = str(value or "").lower()
+    for priority in PRIORITY_ORDER:
+        if priority.lower() in text:
+            return priority
+    return default
+
+def parse_completed(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'x', 'done', 'completed')
+
+def import_entry(text, priority=None, completed=False):
+    text = str(text or "").strip()
+    if not text:
+        return None
+    return {'text': text, 'priority': normalize_priority(priority), 'completed': completed}
+
+def parse_text_import(text):
+    # One task per line. Bullets ("- ", "* ", "1. "), checkboxes ("[ ]", "[x]") and a
+    # trailing "!high" / "!low" are understood.
+    entries = []
+    for line in text.splitlines():
+        line = re.sub(r'^\s*(?:[-*•]|\d+[.)])?\s*', '', line)
+        checkbox = re.match(r'\[([ xX])\]\s*', line)
+        if checkbox:
+            line = line[checkbox.end():]
+        priority = re.search(r'\s+!(high|medium|low)\s*$', line, re.IGNORECASE)
+        if priority:
+            line = line[:priority.start()]
+        entry = import_entry(line, priority.group(1) if priority else None, bool(checkbox) and checkbox.group(1) != ' ')
+        if entry:
+            entries.append(entry)
+    return entries
+
+def parse_csv_import(text):
+    # With a header row, columns are found by name (text/task/title, priority,
+    # completed/done/status); without one they are text, priority, completed.
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    columns = {'text': 0, 'priority': 1, 'completed': 2}
+    names = {'text': ('text', 'task', 'title', 'description'),
+             'priority': ('priority',),
+             'completed': ('completed', 'done', 'status')}
+    if any(name in header for options in names.values() for name in options):
+        columns = {field: next((header.index(name) for name in options if name in header), None)
+                   for field, options in names.items()}
+        rows = rows[1:]
+    
+    def cell(row, field):
+        index = columns[field]
+        return row[index] if index is not None and index < len(row) else None
+    
+    entries = []
+    for row in rows:
+        entry = import_entry(cell(row, 'text'), cell(row, 'priority'), parse_completed(cell(row, 'completed')))
+        if entry:
+            entries.append(entry)
+    return entries
+
+def parse_json_import(data):
+    # A list of strings, a list of task objects, or a whole tasks.json
+    if isinstance(data, dict):
+        data = data.get('tasks', [])
+    entries = []
+    for item in data:
+        if isinstance(item, dict):
+            text = item.get('text') or item.get('task') or item.get('title')
+            entry = import_entry(text, item.get('priority'), parse_completed(item.get('completed', False)))
+        else:
+            entry = import_entry(item)
+        if entry:
+            entries.append(entry)
+    return entries
+
+def read_import_file(path):
+    # Tasks to import from a .csv, .json or plain text file, picked by extension
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return parse_csv_import(text)
+    if extension == '.json':
+        return parse_json_import(json.loads(text))
+    return parse_text_import(text)
+
+def task_file_data(store):
+    return {'next_id': store.next_id, 'tasks': [task.to_dict() for task in store]}
+
+def write_json_synced(path, data, indent=None):
+    # The file is on disk when this returns, ready to be renamed over another
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+
+def write_json_atomic(path, data, indent=None):
+    # Write to a temp file and rename it over the target, so a crash never leaves a half-written file
+    temp_path = path + ".tmp"
+    write_json_synced(temp_path, data, indent)
+    os.replace(temp_path, path)
+
+def file_signature(path):
+    # Cheap fingerprint for noticing that another process changed a file: every
+    # rewrite is a rename (new inode) and every append changes the size
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def same_file(f, path):
+    # Whether an open file is still the one at path (not renamed away or replaced)
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except OSError:
+        return False
+
+def lock_file(path, blocking=True):
+    # Exclusive advisory lock on path, held through the returned file object until
+    # unlock_file(); None if blocking=False and another holder has it. Separate
+    # opens conflict even within one process, so a lock taken on one thread can be
+    # released on another.
+    f = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return f
+        while True:
+            try:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return f
+            except OSError:
+                if not blocking:
+                    raise
+                time.sleep(0.01)
+    except BlockingIOError:
+        f.close()
+        return None
+    except OSError:
+        f.close()
+        if not blocking:
+            return None
+        raise
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    f.close()
+
+class FileLock:
+    # Lock shared by every process using the same task file: app windows, todo.py
+    # and scripts. Writers hold it while they merge what others saved and write
+    # their own changes. Re-entrant for the thread holding it.
+    def __init__(self, path):
+        self.path = path
+        self.mutex = threading.RLock()
+        self.depth = 0
+        self.file = None
+    
+    def acquire(self):
+        self.mutex.acquire()
+        if self.depth == 0:
+            try:
+                self.file = lock_file(self.path)
+            except BaseException:
+                self.mutex.release()
+                raise
+        self.depth += 1
+    
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            file, self.file = self.file, None
+            unlock_file(file)
+        self.mutex.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+
+class JsonTaskStorage:
+    # The whole task list in one JSON file, rewritten on every change
+    supports_queries = False
+    rewrites_on_change = True
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = FileLock(path + ".lock")
+        self.seen = None
+        self.last_write_seconds = 0.0
+    
+    def load(self):
+        # The file is only ever replaced by a rename, so reading needs no lock
+        self.mark_seen()
+        if self.seen is None:
+            return [], 1
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return read_task_file(json.load(f))
+    
+    def stream(self, batch_size=2000):
+        # Generator of task batches for incremental loading; returns next_id
+        self.mark_seen()
+        if self.seen is None:
+            return 1
+        reader = TaskFileStream(self.path, batch_size)
+        yield from reader.batches()
+        return reader.next_id
+    
+    def mark_seen(self):
+        self.seen = file_signature(self.path)
+    
+    def changed(self):
+        # Whether another process saved since this one last read or wrote the file
+        return file_signature(self.path) != self.seen
+    
+    def external_changes(self):
+        # (tasks, deleted ids, next_id, complete) saved by other processes since the
+        # last look, or None. A JSON file can only be read whole, so it is complete:
+        # every task missing from it was deleted.
+        if not self.changed():
+            return None
+        tasks, next_id = self.load()
+        return tasks, (), next_id, True
+    
+    def unsaved_changes(self):
+        return {}
+    
+    def record(self, op, task, store):
+        self.save(store)
+    
+    def record_many(self, changes, store):
+        self.save(store)
+    
+    def save(self, store):
+        os.replace(self.write_temp(store), self.path)
+        self.mark_seen()
+    
+    def write_temp(self, store):
+        # The slow half of a save: the new file, under a temp name of this storage's
+        # own so it needs no lock. Returns the name; replace() or save() renames it.
+        start = time.perf_counter()
+        temp_path = f"{self.path}.{os.getpid()}-{id(self):x}.tmp"
+        write_json_synced(temp_path, task_file_data(store), indent=2)
+        self.last_write_seconds = time.perf_counter() - start
+        return temp_path
+    
+    def replace(self, temp_path, seen):
+        # The quick half, with the lock held: put the new file in place unless the
+        # task file changed since its signature was seen. Returns whether it did.
+        if file_signature(self.path) != seen:
+            os.remove(temp_path)
+            return False
+        os.replace(temp_path, self.path)
+        self.mark_seen()
+        return True
+    
+    def close(self, store=None):
+        pass
+
+class JournalTaskStorage:
+    # A JSON snapshot plus an append-only log of add/toggle/edit/delete records.
+    # Every change appends one line; once the log grows past compact_threshold
+    # records it is folded into a new snapshot on a background thread. Other
+    # processes' records are picked up by reading the log from where this one
+    # stopped; only a new snapshot or a rotated log means reading everything.
+    supports_queries = False
+    rewrites_on_change = False
+    
+    def __init__(self, path, compact_threshold=2000):
+        self.path = path
+        self.log_path = path + ".log"
+        self.compacting_path = path + ".log.compacting"
+        self.compact_threshold = compact_threshold
+        self.lock = FileLock(path + ".lock")
+        # Held by whichever process is writing a snapshot from a rotated log
+        self.compaction_lock_path = path + ".compact.lock"
+        self.log_file = None
+        # Records in the log, replayed or appended, and how many of those this
+        # process appended since the snapshot it last wrote
+        self.log_records = 0
+        self.appended = 0
+        self.compactor = None
+        self.error = None
+        self.last_write_seconds = 0.0
+        
+        # What this process has read or written: snapshot and rotated log
+        # signatures, and the live log's (inode, length)
+        self.seen_snapshot = None
+        self.seen_compacting = None
+        self.seen_log = None
+    
+    def load(self):
+        with self.lock:
+            tasks = {}
+            next_id = 1
+            self.log_records = 0
+            self.seen_snapshot = file_signature(self.path)
+            if self.seen_snapshot is not None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    snapshot, next_id = read_task_file(json.load(f))
+                for task in snapshot:
+                    tasks[task['id']] = task
+            
+            # Replay a log left over from an interrupted compaction, then the live
+            # log. A rotated log is only interrupted if no one is compacting it.
+            interrupted = False
+            if os.path.exists(self.compacting_path):
+                compaction_lock = lock_file(self.compaction_lock_path, blocking=False)
+                if compaction_lock is not None:
+                    unlock_file(compaction_lock)
+                    interrupted = True
+            for log_path in (self.compacting_path, self.log_path):
+                count, next_id = self.replay(log_path, tasks, next_id)
+                self.log_records += count
+            self.seen_compacting = file_signature(self.compacting_path)
+            self.seen_log = self.log_position()
+            
+            loaded = [task for task in tasks.values() if task is not None]
+            if interrupted:
+                self.save(TaskStore(loaded, next_id))
+            return loaded, next_id
+    
+    def stream(self, batch_size=2000):
+        # The logs are small next to the snapshot, so they are replayed first and
+        # applied to the snapshot batches as those are read
+        with self.lock:
+            rotated = os.path.exists(self.compacting_path)
+            if not rotated:
+                logged = {}
+                self.log_records, next_id = self.replay(self.log_path, logged, 1)
+                self.seen_compacting = None
+                self.seen_log = self.log_position()
+                self.seen_snapshot = file_signature(self.path)
+        if rotated:
+            # A rotated log is merged (or an interrupted compaction finished) by
+            # load() before anything is shown
+            tasks, next_id = self.load()
+            yield from batched(tasks, batch_size)
+            return next_id
+        
+        if self.seen_snapshot is not None:
+            reader = TaskFileStream(self.path, batch_size)
+            for batch in reader.batches():
+                merged = []
+                for task in batch:
+                    # A logged record replaces the snapshot's copy; None means deleted
+                    task = logged.pop(task['id'], task)
+                    if task is not None:
+                        merged.append(task)
+                yield merged
+            next_id = max(next_id, reader.next_id)
+        
+        # Tasks added since the snapshot was written
+        yield [task for task in logged.values() if task is not None]
+        return next_id
+    
+    def replay(self, log_path, tasks, next_id):
+        # Callers hold self.lock, so a torn tail cannot be a record still being written
+        if not os.path.exists(log_path):
+            return 0, next_id
+        
+        with open(log_path, 'rb') as f:
+            data = f.read()
+        count, next_id, valid_length = self.read_records(data, tasks, next_id)
+        
+        # Cut off a torn write at the end so new records start on a clean line
+        if valid_length < len(data):
+            with open(log_path, 'r+b') as f:
+                f.truncate(valid_length)
+        return count, next_id
+    
+    def read_records(self, data, tasks, next_id):
+        # Apply the complete log lines in data (bytes) to tasks, which maps ids to
+        # tasks or None for deleted ones. Records carry the full task, so replaying
+        # one twice is harmless. Returns (records, next_id, bytes used).
+        count = 0
+        valid_length = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record['op'] == 'delete':
+                tasks[record['id']] = None
+            else:
+                tasks[record['task']['id']] = record['task']
+            next_id = max(next_id, record.get('next_id', 1))
+            count += 1
+            valid_length += len(line)
+        return count, next_id, valid_length
+    
+    def log_position(self):
+        # (inode, length) of the live log, or None if there is none
+        signature = file_signature(self.log_path)
+        return None if signature is None else (signature[0], signature[2])
+    
+    def changed(self):
+        return (self.log_position() != self.seen_log
+                or file_signature(self.path) != self.seen_snapshot
+                or file_signature(self.compacting_path) != self.seen_compacting)
+    
+    def external_changes(self):
+        # Records appended by other processes since this one last read or wrote the
+        # log, as (tasks, deleted ids, next_id, complete); None if nothing changed
+        with self.lock:
+            if not self.changed():
+                return None
+            log = self.log_position()
+            appended = (log is not None
+                        and file_signature(self.path) == self.seen_snapshot
+                        and file_signature(self.compacting_path) == self.seen_compacting
+                        and (self.seen_log is None or (log[0] == self.seen_log[0] and log[1] > self.seen_log[1])))
+            if not appended:
+                tasks, next_id = self.load()
+                return tasks, (), next_id, True
+            
+            start = 0 if self.seen_log is None else self.seen_log[1]
+            with open(self.log_path, 'rb') as f:
+                f.seek(start)
+                data = f.read()
+            logged = {}
+            count, next_id, valid_length = self.read_records(data, logged, 1)
+            self.log_records += count
+            self.seen_log = (log[0], start + valid_length)
+            tasks = [task for task in logged.values() if task is not None]
+            deleted = [task_id for task_id, task in logged.items() if task is None]
+            return tasks, deleted, next_id, False
+    
+    def mark_seen(self):
+        self.seen_snapshot = file_signature(self.path)
+        self.seen_compacting = file_signature(self.compacting_path)
+        self.seen_log = self.log_position()
+    
+    def unsaved_changes(self):
+        return {}
+    
+    def record(self, op, task, store):
+        self.record_many([(op, task)], store)
+    
+    def record_many(self, changes, store):
+        # All records go out in one write; if that write is torn, load() keeps the
+        # complete lines, i.e. a prefix of the batch
+        start = time.perf_counter()
+        lines = []
+        for op, task in changes:
+            if op == 'delete':
+                record = {'op': op, 'id': task.id}
+            elif op == 'add':
+                record = {'op': op, 'task': task.to_dict(), 'next_id': store.next_id}
+            else:
+                record = {'op': op, 'task': task.to_dict()}
+            lines.append(json.dumps(record) + "\n")
+        if self.log_file is not None and not same_file(self.log_file, self.log_path):
+            # Another process rotated or removed the log since it was opened
+            self.log_file.close()
+            self.log_file = None
+        if self.log_file is None:
+            self.log_file = open(self.log_path, 'a', encoding='utf-8', newline='')
+        self.log_file.write("".join(lines))
+        self.log_file.flush()
+        stat = os.fstat(self.log_file.fileno())
+        self.seen_log = (stat.st_ino, stat.st_size)
+        self.log_records += len(lines)
+        self.appended += len(lines)
+        self.last_write_seconds = time.perf_counter() - start
+        
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        
+        if self.log_records >= self.compact_threshold and not self.is_compacting():
+            self.start_compaction(store)
+    
+    def is_compacting(self):
+        # A leftover file from a failed compaction blocks new ones until the next load
+        return (self.compactor is not None and self.compactor.is_alive()) or os.path.exists(self.compacting_path)
+    
+    def start_compaction(self, store):
+        # Rotate the log so new records keep appending while the snapshot is written;
+        # the copy is turned into JSON on the compaction thread, which releases the
+        # compaction lock taken here once the rotated log is gone
+        snapshot = store.copy()
+        compaction_lock = lock_file(self.compaction_lock_path)
+        self.log_file.close()
+        self.log_file = None
+        os.replace(self.log_path, self.compacting_path)
+        self.log_records = 0
+        self.appended = 0
+        self.seen_log = None
+        self.seen_compacting = file_signature(self.compacting_path)
+        
+        self.compactor = threading.Thread(target=self._compact, args=(snapshot, compaction_lock), daemon=True)
+        self.compactor.start()
+    
+    def _compact(self, snapshot, compaction_lock):
+        try:
+            write_json_atomic(self.path, task_file_data(snapshot))
+            self.seen_snapshot = file_signature(self.path)
+            os.remove(self.compacting_path)
+            self.seen_compacting = None
+        except Exception as e:
+            self.error = e
+        finally:
+            unlock_file(compaction_lock)
+    
+    def save(self, store):
+        # Synchronous compaction: write a full snapshot and start a fresh log
+        if self.compactor is not None:
+            self.compactor.join()
+        start = time.perf_counter()
+        with self.lock:
+            compaction_lock = lock_file(self.compaction_lock_path)
+            try:
+                write_json_atomic(self.path, task_file_data(store))
+                if self.log_file is not None:
+                    self.log_file.close()
+                    self.log_file = None
+                for log_path in (self.compacting_path, self.log_path):
+                    if os.path.exists(log_path):
+                        os.remove(log_path)
+                self.mark_seen()
+            finally:
+                unlock_file(compaction_lock)
+        self.log_records = 0
+        self.appended = 0
+        self.last_write_seconds = time.perf_counter() - start
+    
+    def close(self, store=None):
+        # Fold the log into the snapshot so tasks.json is complete on its own after
+        # exit. Only a process that wrote records does: one that just read the tasks
+        # leaves the log to whoever appends next (and to the compaction threshold).
+        if store is not None and self.appended:
+            self.save(store)
+        if self.compactor is not None:
+            self.compactor.join()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+class SqliteTaskStorage:
+    # Tasks in an SQLite database (WAL mode) next to the JSON file. Every filter
+    # option maps to an indexed query that returns rows already in display order.
+    # The JSON file is imported when the database is new and stays the export format.
+    supports_queries = True
+    rewrites_on_change = False
+    
+    COLUMNS = ('id', 'text', 'priority', 'completed', 'created_at', 'completed_at')
+    
+    FILTER_CLAUSES = {
+        'all': "",
+        'pending': "WHERE completed = 0",
+        'completed': "WHERE completed = 1",
+        'high': "WHERE priority_rank = 0",
+        'medium': "WHERE priority_rank = 1",
+        'low': "WHERE priority_rank = 2"
+    }
+    
+    def __init__(self, path):
+        self.json_path = path
+        self.path = os.path.splitext(path)[0] + ".db"
+        self.lock = FileLock(self.path + ".lock")
+        self.connection = None
+        self.seen_version = None
+        self.last_write_seconds = 0.0
+    
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    priority TEXT NOT NULL,
+                    priority_rank INTEGER NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT,
+                    completed_at TEXT,
+                    extra TEXT
+                );
+                CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (completed, priority_rank);
+                CREATE INDEX IF NOT EXISTS tasks_by_priority ON tasks (priority_rank, completed);
+                CREATE INDEX IF NOT EXISTS tasks_by_created ON tasks (created_at);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value
+                );
+            """)
+        return self.connection
+    
+    def to_row(self, task):
+        # Keys without a column of their own are kept as JSON so exports round-trip
+        task = task.to_dict()
+        extra = {key: value for key, value in task.items() if key not in self.COLUMNS}
+        # Old and imported tasks may lack a priority: it is stored as '' and ranks
+        # after the known priorities, as in TaskStore
+        priority = task.get('priority', '')
+        return (task['id'],
+                task['text'],
+                priority,
+                PRIORITY_ORDER.get(priority, OTHER_RANK),
+                int(bool(task['completed'])),
+                task.get('created_at'),
+                task.get('completed_at'),
+                json.dumps(extra) if extra else None)
+    
+    def to_dict(self, row):
+        task_id, text, priority, completed, created_at, completed_at, extra = row
+        task = {'id': task_id, 'text': text}
+        # An empty priority and NULL columns are keys the task did not have, as in the JSON file
+        if priority:
+            task['priority'] = priority
+        task['completed'] = bool(completed)
+        if created_at is not None:
+            task['created_at'] = created_at
+        if completed_at is not None:
+            task['completed_at'] = completed_at
+        if extra:
+            task.update(json.loads(extra))
+        return task
+    
+    def select(self, where="", suffix="", params=()):
+        # Rows as tasks.json objects
+        cursor = self.connect().execute(
+            "SELECT id, text, priority, completed, created_at, completed_at, extra "
+            f"FROM tasks {where} {suffix}", params)
+        return [self.to_dict(row) for row in cursor]
+    
+    def load(self):
+        connection = self.connect()
+        empty = connection.execute("SELECT NOT EXISTS (SELECT 1 FROM tasks)").fetchone()[0]
+        if empty and os.path.exists(self.json_path):
+            self.import_json(self.json_path)
+        self.mark_seen()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        return self.select(suffix="ORDER BY id"), row[0] if row else 1
+    
+    def stream(self, batch_size=2000):
+        connection = self.connect()
+        empty = connection.execute("SELECT NOT EXISTS (SELECT 1 FROM tasks)").fetchone()[0]
+        if empty and os.path.exists(self.json_path):
+            self.import_json(self.json_path)
+        self.mark_seen()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        # In display order (read off tasks_by_status), so the first batch is the top
+        # of the list: pending tasks by priority
+        cursor = connection.execute(
+            "SELECT id, text, priority, completed, created_at, completed_at, extra FROM tasks "
+            "ORDER BY completed, priority_rank, id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return row[0] if row else 1
+            yield [self.to_dict(task_row) for task_row in rows]
+    
+    def mark_seen(self):
+        # data_version changes whenever another connection commits
+        self.seen_version = self.connect().execute("PRAGMA data_version").fetchone()[0]
+    
+    def changed(self):
+        return self.connect().execute("PRAGMA data_version").fetchone()[0] != self.seen_version
+    
+    def external_changes(self):
+        # Rows do not say when they changed, so another process's commit means
+        # reading the table again; only tasks that differ are touched afterwards
+        if not self.changed():
+            return None
+        tasks, next_id = self.load()
+        return tasks, (), next_id, True
+    
+    def unsaved_changes(self):
+        return {}
+    
+    def query(self, filter_key, limit=-1, offset=0):
+        # One page of a filter as TaskSnapshots, like the rows of the in-memory views
+        tasks = self.select(self.FILTER_CLAUSES[filter_key],
+                            "ORDER BY completed, priority_rank, id LIMIT ? OFFSET ?",
+                            (limit, offset))
+        return [TaskSnapshot.from_dict(task) for task in tasks]
+    
+    def count(self, filter_key):
+        cursor = self.connect().execute(f"SELECT COUNT(*) FROM tasks {self.FILTER_CLAUSES[filter_key]}")
+        return cursor.fetchone()[0]
+    
+    def position(self, filter_key, task):
+        # Row number of a task within a filter query, or None if it is not part of it
+        key = display_key(task)
+        where = self.FILTER_CLAUSES[filter_key]
+        cursor = self.connect().execute(
+            f"SELECT EXISTS (SELECT 1 FROM tasks {where} {'AND' if where else 'WHERE'} id = ?), "
+            f"(SELECT COUNT(*) FROM tasks {where} {'AND' if where else 'WHERE'} "
+            "(completed, priority_rank, id) < (?, ?, ?))",
+            (task.id, int(key[0]), key[1], key[2]))
+        exists, position = cursor.fetchone()
+        return position if exists else None
+    
+    def record(self, op, task, store):
+        self.record_many([(op, task)], store)
+    
+    def record_many(self, changes, store):
+        # One SQL transaction for the whole batch
+        start = time.perf_counter()
+        connection = self.connect()
+        with connection:
+            for op, task in changes:
+                if op == 'delete':
+                    connection.execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+                else:
+                    connection.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self.to_row(task))
+            if any(op == 'add' for op, _ in changes):
+                self.save_next_id(store.next_id)
+        self.last_write_seconds = time.perf_counter() - start
+    
+    def save_next_id(self, next_id):
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (next_id,))
+    
+    def save(self, store):
+        start = time.perf_counter()
+        connection = self.connect()
+        with connection:
+            connection.execute("DELETE FROM tasks")
+            connection.executemany("INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (self.to_row(task) for task in store))
+            self.save_next_id(store.next_id)
+        self.last_write_seconds = time.perf_counter() - start
+    
+    def import_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.save(TaskStore(*read_task_file(json.load(f))))
+    
+    def export_json(self, path):
+        tasks, next_id = self.load()
+        write_json_atomic(path, {'next_id': next_id, 'tasks': tasks}, indent=2)
+    
+    def close(self, store=None):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class SqliteTaskView:
+    # Lazy sequence over one filter query, fetched a page at a time as rows are shown
+    PAGE_SIZE = 64
+    
+    def __init__(self, storage, filter_key):
+        self.storage = storage
+        self.filter_key = filter_key
+        self.invalidate()
+    
+    def invalidate(self):
+        self.length = None
+        self.page_start = 0
+        self.page = []
+    
+    def __len__(self):
+        if self.length is None:
+            self.length = self.storage.count(self.filter_key)
+        return self.length
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            return self.storage.query(self.filter_key, max(stop - start, 0), start)
+        
+        if index < 0:
+            index += len(self)
+        if not self.page_start <= index < self.page_start + len(self.page):
+            self.page_start = index - index % self.PAGE_SIZE
+            self.page = self.storage.query(self.filter_key, self.PAGE_SIZE, self.page_start)
+        return self.page[index - self.page_start]
+    
+    def __iter__(self):
+        return iter(self.storage.query(self.filter_key))
+    
+    def index_of(self, task):
+        return self.storage.position(self.filter_key, task)
+
+class BackgroundWriter:
+    # Asynchronous persistence for a backend that rewrites everything on each save.
+    # Changes only mark the store dirty; a worker thread writes at most one copy of
+    # it per interval, so a burst of clicks costs a single write off the Tk thread.
+    # The file is written without the storage lock, which is only held for the
+    # rename, so transactions never wait for a write. If another process saved in
+    # between, the write waits until the engine has merged that save, so it is
+    # never overwritten.
+    supports_queries = False
+    rewrites_on_change = False
+    
+    def __init__(self, storage, interval=0.25, on_error=None):
+        self.storage = storage
+        self.path = storage.path
+        self.lock = storage.lock
+        self.interval = interval
+        self.on_error = on_error
+        self.store = None
+        self.pending = False
+        # Ids of tasks changed since the last write, with the latest operation
+        self.unsaved = {}
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_write_seconds = 0.0
+    
+    def load(self):
+        return self.storage.load()
+    
+    def stream(self, batch_size=2000):
+        return self.storage.stream(batch_size)
+    
+    def mark_seen(self):
+        self.storage.mark_seen()
+    
+    def changed(self):
+        return self.storage.changed()
+    
+    def external_changes(self):
+        return self.storage.external_changes()
+    
+    def unsaved_changes(self):
+        return self.unsaved
+    
+    def record(self, op, task, store):
+        if task is not None:
+            # A task added and changed again before the write still counts as added
+            if self.unsaved.get(task.id) != 'add':
+                self.unsaved[task.id] = op
+        self.store = store
+        self.pending = True
+        self.wake.set()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+    
+    def record_many(self, changes, store):
+        for op, task in changes:
+            self.record(op, task, store)
+        self.record(None, None, store)
+    
+    def save(self, store):
+        self.record(None, None, store)
+    
+    def run(self):
+        while True:
+            self.wake.wait()
+            # Let the rest of a burst arrive before writing
+            if self.stopped.wait(self.interval):
+                return
+            self.wake.clear()
+            try:
+                self.write()
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+    
+    def write(self):
+        # The signature is taken before the copy: if the file changes after it, by
+        # another process or by the engine merging one, the copy may lack those
+        # tasks, and the rename is skipped
+        seen = self.storage.seen
+        if self.storage.changed():
+            # Not merged yet: try again after the engine's next poll
+            self.wake.set()
+            return
+        self.pending = False
+        unsaved, self.unsaved = self.unsaved, {}
+        try:
+            temp_path = self.storage.write_temp(self.store.copy())
+            previous = self.hold_previous()
+            try:
+                with self.lock:
+                    written = self.storage.replace(temp_path, seen)
+            finally:
+                if previous is not None:
+                    previous.close()
+        except Exception:
+            self.requeue(unsaved)
+            raise
+        if not written:
+            self.requeue(unsaved)
+            self.wake.set()
+            return
+        self.last_write_seconds = self.storage.last_write_seconds
+    
+    def hold_previous(self):
+        # The file being replaced, kept open across the rename: its blocks are then
+        # freed on this close, after the lock is released, since for a large file
+        # that takes about as long as writing it. Not on Windows, where an open
+        # file cannot be replaced.
+        if fcntl is None:
+            return None
+        try:
+            return open(self.path, 'rb')
+        except OSError:
+            return None
+    
+    def requeue(self, unsaved):
+        # A write that did not happen: its changes are unsaved again, under any
+        # newer ones
+        self.pending = True
+        unsaved.update(self.unsaved)
+        self.unsaved = unsaved
+    
+    def stop(self):
+        # End the worker once a write in progress is done. That write takes the
+        # storage lock to rename, so call this without holding it.
+        self.stopped.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+    
+    def close(self, store=None):
+        # Stop the worker, then flush whatever it had not written yet
+        self.stop()
+        if self.pending:
+            self.write()
+        self.storage.close(store)
+
+STORAGE_BACKENDS = {
+    'json': JsonTaskStorage,
+    'journal': JournalTaskStorage,
+    'sqlite': SqliteTaskStorage
+}
+
+# Archive segment file names: the month of completed_at
+ARCHIVE_SEGMENT = re.compile(r'\d{4}-\d\d\.json')
+
+class TaskArchive:
+    # Completed tasks moved out of the task file, one JSON file per month of
+    # completed_at in <name>.archive/ (e.g. tasks.archive/2024-05.json). Loading,
+    # saving, filtering and counting the live tasks never touch them. The segments
+    # are read the first time history is asked for, into a store of their own with
+    # its own indexes.
+    def __init__(self, path):
+        self.directory = os.path.splitext(path)[0] + ".archive"
+        self.store = TaskStore()
+        self.opened = False
+        self.segment_of = {}
+        self.load_seconds = {}
+        self.sizes = None
+        self._index = None
+        self._search_index = None
+    
+    def segment_path(self, month):
+        return os.path.join(self.directory, month + ".json")
+    
+    def segment_sizes(self):
+        # Bytes per month in month order; listed once, then kept up to date by writes
+        if self.sizes is None:
+            try:
+                names = sorted(os.listdir(self.directory))
+            except OSError:
+                names = []
+            self.sizes = {name[:-5]: os.path.getsize(os.path.join(self.directory, name))
+                          for name in names if ARCHIVE_SEGMENT.fullmatch(name)}
+        return self.sizes
+    
+    def read_segment(self, month):
+        with open(self.segment_path(month), 'r', encoding='utf-8') as f:
+            return read_task_file(json.load(f))[0]
+    
+    def write_segment(self, month, tasks):
+        sizes = self.segment_sizes()
+        if tasks:
+            path = self.segment_path(month)
+            write_json_atomic(path, {'tasks': tasks})
+            sizes[month] = os.path.getsize(path)
+        elif month in sizes:
+            os.remove(self.segment_path(month))
+            del sizes[month]
+    
+    def load(self, live=()):
+        # Read the segments not read yet, timing each. A task that is also in live
+        # (an archive pass cut short before the task file was saved) stays live.
+        self.opened = True
+        for month in self.segment_sizes():
+            if month in self.load_seconds:
+                continue
+            start = time.perf_counter()
+            tasks = [task for task in self.read_segment(month) if task['id'] not in live]
+            self.store.extend(tasks)
+            for task in tasks:
+                self.segment_of[task['id']] = month
+            self.load_seconds[month] = time.perf_counter() - start
+    
+    def add(self, tasks):
+        # Merge completed tasks (tasks.json objects) into their months' segments,
+        # rewriting each segment once
+        by_month = {}
+        for task in tasks:
+            by_month.setdefault(task['completed_at'][:7], []).append(task)
+        os.makedirs(self.directory, exist_ok=True)
+        for month, new_tasks in by_month.items():
+            merged = {}
+            if month in self.segment_sizes():
+                merged = {task['id']: task for task in self.read_segment(month)}
+            merged.update((task['id'], task) for task in new_tasks)
+            self.write_segment(month, list(merged.values()))
+            if self.opened:
+                self.store.extend(new_tasks)
+                for task in new_tasks:
+                    self.segment_of[task['id']] = month
+    
+    def remove(self, task_id):
+        # Take one task out of the (opened) archive; returns it as a tasks.json object
+        month = self.segment_of.pop(task_id)
+        self.write_segment(month, [task for task in self.read_segment(month) if task['id'] != task_id])
+        return self.store.delete(task_id).to_dict()
+    
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = TaskIndex(self.store)
+            self.store.subscribe(self._index)
+        return self._index
+    
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            self._search_index = TaskSearchIndex(self.store)
+            self.store.subscribe(self._search_index)
+        return self._search_index
+    
+    def view(self, filter_key):
+        return self.index.view(filter_key)
+    
+    def search(self, query, filter_key):
+        return self.index.search(filter_key, self.search_index.matches(query))
+
+class TaskLoader:
+    # Incremental load for a responsive startup. Each step() moves batches from the
+    # storage into the store for at most budget seconds (always at least one batch),
+    # and listeners see every batch through tasks_loaded. If the file turns out to
+    # be unreadable part way, the batches loaded so far are kept, the file is moved
+    # to <path>.corrupt and the error is left in self.error.
+    def __init__(self, engine, batch_size=2000):
+        self.engine = engine
+        self.batches = engine.storage.stream(batch_size)
+        self.done = False
+        self.error = None
+    
+    def step(self, budget=0.01):
+        deadline = time.perf_counter() + budget
+        while not self.done:
+            try:
+                self.engine.store.extend(next(self.batches))
+            except StopIteration as finished:
+                store = self.engine.store
+                store.next_id = max(store.next_id, finished.value or 1)
+                self.done = True
+                self.engine.archive_completed()
+            except Exception as e:
+                self.error = e
+                self.done = True
+                self.engine.quarantine()
+            if time.perf_counter() >= deadline:
+                break
+        return self.done
+    
+    def finish(self):
+        while not self.step(60):
+            pass
+        return self.error
+
+class TaskEngine:
+    # Loading, changing, filtering and counting tasks with no UI attached. The Tk
+    # app and the command line both drive tasks through this class. Errors from
+    # persistence go to on_error when it is set and are raised otherwise.
+    # Several engines (in different processes) may share one file: every change
+    # first merges what the others saved, and on_external_change receives the
+    # merged (task, old_key, removed) triples, like reconcile_task arguments.
+    # With archive_days set, tasks completed longer ago than that move to the
+    # archive (see TaskArchive) once the tasks are loaded.
+    def __init__(self, path="tasks.json", storage_kind='json', save_interval=None,
+                 on_error=None, verify_stats=False, on_external_change=None, archive_days=None):
+        self.storage = STORAGE_BACKENDS[storage_kind](path)
+        if save_interval and self.storage.rewrites_on_change:
+            # Asynchronous persistence: full rewrites move to a worker thread
+            self.storage = BackgroundWriter(self.storage, save_interval, on_error=on_error)
+        self.on_error = on_error
+        self.on_external_change = on_external_change
+        self.verify_stats = verify_stats
+        self.archive = TaskArchive(path)
+        self.archive_days = archive_days
+        self.store = TaskStore()
+        self.loader = None
+        self.pending_changes = None
+        # The error from the last transaction's save (after on_error had it), or None
+        self.save_error = None
+        self._index = None
+        self._stats = None
+        self._search_index = None
+        self._schedule = None
+        self._tree = None
+    
+    def quarantine(self):
+        try:
+            os.replace(self.storage.path, self.storage.path + ".corrupt")
+        except OSError:
+            pass
+        # The move is not someone else's save: what is left loads as usual
+        self.storage.mark_seen()
+    
+    def load(self, recover=True):
+        # With recover=True an unreadable file is moved to <path>.corrupt instead of
+        # being overwritten by the next save, and the error is returned.
+        try:
+            self.store = TaskStore(*self.storage.load())
+        except Exception as e:
+            if not recover:
+                raise
+            error = e
+        else:
+            self.archive_completed()
+            return None
+        
+        self.quarantine()
+        
+        # Whatever is still readable (e.g. the journal log) is loaded on its own
+        try:
+            self.store = TaskStore(*self.storage.load())
+        except Exception:
+            self.store = TaskStore()
+        return error
+    
+    def load_incrementally(self, batch_size=2000):
+        # Start filling the (empty) store batch by batch; see TaskLoader
+        self.loader = TaskLoader(self, batch_size)
+        return self.loader
+    
+    @property
+    def loading(self):
+        return self.loader is not None and not self.loader.done
+    
+    @property
+    def index(self):
+        # Built on first use, so one-off commands that never filter skip the sort
+        if self._index is None:
+            self._index = TaskIndex(self.store)
+            self.store.subscribe(self._index)
+        return self._index
+    
+    @property
+    def search_index(self):
+        # Built on first use; a UI can touch it early (e.g. when the search box gets focus)
+        if self._search_index is None:
+            self._search_index = TaskSearchIndex(self.store)
+            self.store.subscribe(self._search_index)
+        return self._search_index
+    
+    def search(self, query, filter_key='all', history=False):
+        # Tasks of one filter matching every word of query as a prefix, in display
+        # order; with history=True archived matches follow the live ones
+        if not tokenize(query):
+            return self.filtered(filter_key, history)
+        if filter_key in SCHEDULE_FILTERS:
+            # Archived tasks are completed, so never overdue
+            self.schedule.advance()
+            return self.schedule.view(self.search_index.matches(query))
+        found = self.index.search(filter_key, self.search_index.matches(query))
+        if not history:
+            return found
+        return TaskChainView([found, self.history().search(query, filter_key)])
+    
+    @property
+    def stats(self):
+        if self._stats is None:
+            self._stats = TaskStats(self.store, verify=self.verify_stats)
+            self.store.subscribe(self._stats)
+        return self._stats
+    
+    @property
+    def schedule(self):
+        # Built on first use; a UI arms its reminder timer from it once loading is done
+        if self._schedule is None:
+            self._schedule = TaskSchedule(self.store)
+            self.store.subscribe(self._schedule)
+        return self._schedule
+    
+    @property
+    def tree(self):
+        # Built on first use from the tasks with extra fields, like the schedule
+        if self._tree is None:
+            self._tree = TaskTree(self.store)
+            self.store.subscribe(self._tree)
+        return self._tree
+    
+    def filtered(self, filter_key='all', history=False):
+        # Tasks of one filter in display order, as a lazy sequence; with history=True
+        # the archived tasks of the filter follow the live ones. Overdue tasks come
+        # most overdue first.
+        if filter_key in SCHEDULE_FILTERS:
+            self.schedule.advance()
+            return self.schedule.view()
+        if self.storage.supports_queries:
+            view = SqliteTaskView(self.storage, filter_key)
+        else:
+            view = self.index.view(filter_key)
+        if not history:
+            return view
+        return TaskChainView([view, self.history().view(filter_key)])
+    
+    def outline(self, filter_key='all', history=False):
+        # filtered() with subtasks under their parents: the top-level tasks of the
+        # filter, each followed by the subtasks of the expanded ones whatever filter
+        # those match. Overdue tasks stay a flat list, as does the SQL view while no
+        # task has a parent; archived tasks follow flat as well.
+        if filter_key in SCHEDULE_FILTERS or (self.storage.supports_queries and not self.tree.parents):
+            return self.filtered(filter_key, history)
+        view = self.tree.view(self.index, filter_key)
+        if not history:
+            return view
+        return TaskChainView([view, self.history().view(filter_key)])
+    
+    def history(self):
+        # The archive, with its segments read on first use
+        self.archive.load(self.store)
+        return self.archive
+    
+    def get(self, task_id):
+        # A live task or, once history has been read, an archived one
+        task = self.store.get(task_id)
+        return task if task is not None else self.archive.store.get(task_id)
+    
+    def archive_completed(self, days=None):
+        # Move tasks completed more than days (default archive_days) ago from the
+        # task file to the archive. Returns them as tasks.json objects.
+        days = self.archive_days if days is None else days
+        if days is None or self.loading:
+            return []
+        with self.transaction():
+            task_ids = self.store.completed_before(current_timestamp() - days * 86400)
+            tasks = [self.store[task_id].to_dict() for task_id in task_ids]
+            if not tasks:
+                return []
+            # The archive is written first: if saving the task file fails, the
+            # tasks are in both and the live copies win when history is read
+            try:
+                self.archive.add(tasks)
+            except OSError as e:
+                self.report(e)
+                return []
+            for task_id in task_ids:
+                self.delete(task_id)
+        return tasks
+    
+    def unarchive(self, task_id):
+        # Changing an archived task (shown with history) brings it back to the task file
+        if task_id not in self.store and task_id in self.archive.store:
+            self.persist('add', self.store.put(self.archive.remove(task_id)))
+    
+    def report(self, error):
+        if self.on_error is None:
+            raise error
+        self.on_error(error)
+    
+    def persist(self, op, task):
+        # Queue one change for the enclosing transaction
+        self.pending_changes.append((op, task))
+    
+    @contextmanager
+    def transaction(self):
+        # Changes made inside the block are persisted together when it ends: one
+        # rewrite, one log append or one SQL transaction, however many tasks changed.
+        # The storage lock is held throughout and other processes' saves are merged
+        # first, so new ids never collide and nothing they saved is overwritten.
+        if self.pending_changes is not None:
+            yield
+            return
+        self.save_error = None
+        with self.storage.lock:
+            self.sync()
+            self.pending_changes = []
+            try:
+                yield
+            finally:
+                changes, self.pending_changes = self.pending_changes, None
+                # A task added or changed and then deleted within the block only needs the delete
+                changes = [(op, task) for op, task in changes if op == 'delete' or task.id in self.store]
+                if changes:
+                    try:
+                        self.storage.record_many(changes, self.store)
+                    except Exception as e:
+                        self.save_error = e
+                        self.report(e)
+    
+    def sync(self):
+        # Merge what other processes saved into the store record by record: tasks
+        # that are unchanged are not touched, so listeners and the UI only see the
+        # real differences. Call with the storage lock held. A task changed here but
+        # not written yet (background writes) keeps this process's version; if it was
+        # a new task whose id someone else took meanwhile, it moves to a fresh id and
+        # its unsaved subtasks move with it.
+        if self.loading:
+            return []
+        try:
+            changes = self.storage.external_changes()
+        except Exception as e:
+            self.report(e)
+            return []
+        if changes is None:
+            return []
+        tasks, deleted, next_id, complete = changes
+        store = self.store
+        unsaved = self.storage.unsaved_changes()
+        store.next_id = max(store.next_id, next_id)
+        merged = []
+        saved_ids = set()
+        for task in tasks:
+            task_id = task['id']
+            saved_ids.add(task_id)
+            current = store.get(task_id)
+            if task_id in unsaved:
+                if unsaved[task_id] == 'add' and current is not None:
+                    moved = store.delete(task_id)
+                    merged.append((moved, display_key(moved), True))
+                    added = store.put(dict(moved.to_dict(), id=store.next_id))
+                    unsaved.pop(task_id)
+                    self.storage.record('add', added, store)
+                    merged.append((added, None, False))
+                    # Saved tasks under task_id are the other process's subtasks
+                    children = [child_id for child_id, extra in store.extras.items()
+                                if extra.get('parent_id') == task_id and child_id in unsaved]
+                    for child_id in children:
+                        old_key = display_key(store[child_id])
+                        child = store.update(child_id, parent_id=added.id)
+                        self.storage.record('edit', child, store)
+                        merged.append((child, old_key, False))
+                    current = None
+                else:
+                    continue
+            elif current is not None and current.to_dict() == task:
+                continue
+            old_key = None if current is None else display_key(current)
+            merged.append((store.put(task), old_key, False))
+        if complete:
+            deleted = [task.id for task in store if task.id not in saved_ids]
+        for task_id in deleted:
+            if task_id in store and task_id not in unsaved:
+                task = store.delete(task_id)
+                merged.append((task, display_key(task), True))
+        if merged and self.on_external_change is not None:
+            self.on_external_change(merged)
+        return merged
+    
+    def poll(self):
+        # For a UI timer: a stat (or a PRAGMA) when nothing changed, a merge when
+        # something did. Returns the merged changes.
+        if self.loading or not self.storage.changed():
+            return []
+        with self.storage.lock:
+            return self.sync()
+    
+    def check_parent(self, task_id, parent_id):
+        # A parent is a live task, and neither the task itself nor one of its subtasks
+        if parent_id is None:
+            return
+        if parent_id not in self.store:
+            raise KeyError(parent_id)
+        if parent_id == task_id or task_id in self.tree.ancestors(parent_id):
+            raise ValueError(f"Task {task_id} cannot become a subtask of itself or of its own subtasks")
+    
+    def add(self, text, priority='Medium', due_at=None, remind_at=None, parent_id=None):
+        with self.transaction():
+            self.check_parent(None, parent_id)
+            task = self.store.add(text, priority, due_at=due_at, remind_at=remind_at, parent_id=parent_id)
+            self.persist('add', task)
+        return task
+    
+    def toggle(self, task_id):
+        with self.transaction():
+            self.unarchive(task_id)
+            task = self.store.toggle(task_id)
+            self.persist('toggle', task)
+        return task
+    
+    def set_completed(self, task_id, completed=True):
+        with self.transaction():
+            self.unarchive(task_id)
+            task = self.store[task_id]
+            if task.completed != completed:
+                self.toggle(task_id)
+        return task
+    
+    def edit(self, task_id, **changes):
+        # parent_id=None makes the task top-level again
+        with self.transaction():
+            self.unarchive(task_id)
+            if changes.get('parent_id') is not None:
+                self.check_parent(task_id, changes['parent_id'])
+            task = self.store.update(task_id, **changes)
+            self.persist('edit', task)
+        return task
+    
+    def delete(self, task_id):
+        with self.transaction():
+            self.unarchive(task_id)
+            task = self.store.delete(task_id)
+            self.persist('delete', task)
+        return task
+    
+    def due_reminders(self, now=None):
+        # Pending tasks whose reminder time has come. remind_at is cleared as they
+        # are returned, so a reminder is shown once, not again after a restart or
+        # in another window.
+        now = current_timestamp() if now is None else now
+        tasks = self.schedule.pop_reminders(now)
+        if not tasks:
+            return []
+        with self.transaction():
+            # Merging other processes' saves may have changed some meanwhile
+            tasks = [task for task in tasks
+                     if task.id in self.store and not task.completed and task.remind is not None and task.remind <= now]
+            for task in tasks:
+                self.edit(task.id, remind_at=None)
+        return tasks
+    
+    def require(self, task_ids):
+        # Bulk changes check every id first, so an unknown one changes nothing. Returns
+        # the ids in order without repeats: a task is changed (or deleted) once.
+        task_ids = list(dict.fromkeys(task_ids))
+        for task_id in task_ids:
+            if task_id not in self.store and task_id not in self.archive.store:
+                raise KeyError(task_id)
+        return task_ids
+    
+    def set_completed_many(self, task_ids, completed=True):
+        with self.transaction():
+            task_ids = self.require(task_ids)
+            return [self.set_completed(task_id, completed) for task_id in task_ids]
+    
+    def set_priority_many(self, task_ids, priority):
+        with self.transaction():
+            tasks = [self.get(task_id) for task_id in self.require(task_ids)]
+            return [self.edit(task.id, priority=priority) for task in tasks if task.priority != priority]
+    
+    def delete_many(self, task_ids):
+        with self.transaction():
+            task_ids = self.require(task_ids)
+            return [self.delete(task_id) for task_id in task_ids]
+    
+    def import_tasks(self, entries):
+        # entries are {'text', 'priority', 'completed'} dicts, e.g. from read_import_file
+        with self.transaction():
+            tasks = self.store.add_many(entries)
+            for task in tasks:
+                self.persist('add', task)
+        return tasks
+    
+    def save(self):
+        # Rewrite the whole store, keeping whatever other processes saved
+        with self.storage.lock:
+            self.sync()
+            try:
+                self.storage.save(self.store)
+            except Exception as e:
+                self.report(e)
+    
+    def close(self):
+        # A partly loaded store must never replace the file it came from; a loaded
+        # one takes in other processes' last changes before the final write
+        if self.loading:
+            self.storage.close(None)
+            return
+        if isinstance(self.storage, BackgroundWriter):
+            self.storage.stop()
+        with self.storage.lock:
+            self.sync()
+            self.storage.close(self.store)
\ No newline at end of file
@@ -0,0 +1,226 @@
+# Exports of a task list as CSV, a Markdown checklist or an iCalendar file of VTODOs.
+# Each format is a generator that turns tasks.json objects into chunks of text, and
+# write_export() streams those chunks to a temp file that replaces the target at the
+# end, so memory stays flat however many tasks there are:
+#   write_export("tasks.csv", (task.to_dict() for task in engine.filtered('pending')))
+# TaskExport does the same beside a UI: the UI thread reads the rows of its view a
+# batch at a time, and a worker thread formats and writes them.
+import csv
+import io
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from todo_engine import TaskSnapshot
+
+# Rows read per batch, and how many batches may wait for the writer
+EXPORT_BATCH_SIZE = 2000
+EXPORT_QUEUE_BATCHES = 4
+
+# Text is handed to the file in chunks of about this many characters
+EXPORT_CHUNK_SIZE = 1 << 16
+
+CSV_FIELDS = ('id', 'text', 'priority', 'completed', 'created_at', 'completed_at', 'due_at')
+
+# iCalendar priorities run from 1 (highest) to 9 (lowest)
+ICS_PRIORITIES = {'High': 1, 'Medium': 5, 'Low': 9}
+
+class ExportCancelled(Exception):
+    pass
+
+def csv_chunks(tasks):
+    # A header row, then one row per task; the import reads the file back
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_FIELDS)
+    for task in tasks:
+        writer.writerow([task.get(field, "") for field in CSV_FIELDS])
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def markdown_chunks(tasks):
+    # "- [x] Text !priority", the checklist form the text import understands. A task
+    # without a priority gets no suffix and imports as Medium.
+    lines = []
+    for task in tasks:
+        text = " ".join(task['text'].split())
+        priority = task.get('priority')
+        suffix = f" !{priority.lower()}" if priority else ""
+        lines.append(f"- [{'x' if task['completed'] else ' '}] {text}{suffix}\n")
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "".join(lines)
+            lines = []
+    yield "".join(lines)
+
+def ics_time(timestamp):
+    # "2024-05-01 14:30" as a floating iCalendar time, in the file's own wall clock
+    return timestamp[:10].replace("-", "") + "T" + timestamp[11:].replace(":", "") + "00"
+
+def ics_text(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def ics_fold(line):
+    # Content lines longer than 75 octets continue on lines starting with a space,
+    # without splitting a UTF-8 character
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    start = 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start = end
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+def ics_chunks(tasks):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Modern To-Do Manager//EN\r\n"
+    lines = []
+    for task in tasks:
+        lines.append("BEGIN:VTODO\r\n")
+        lines.append(f"UID:task-{task['id']}@todo\r\n")
+        lines.append(f"DTSTAMP:{stamp}\r\n")
+        lines.append(ics_fold(f"SUMMARY:{ics_text(task['text'])}"))
+        if task.get('priority') in ICS_PRIORITIES:
+            lines.append(f"PRIORITY:{ICS_PRIORITIES[task['priority']]}\r\n")
+        if task.get('created_at'):
+            lines.append(f"CREATED:{ics_time(task['created_at'])}\r\n")
+        if task.get('due_at'):
+            lines.append(f"DUE:{ics_time(task['due_at'])}\r\n")
+        if task.get('parent_id'):
+            # A subtask: RELATED-TO defaults to the PARENT relation
+            lines.append(f"RELATED-TO:task-{task['parent_id']}@todo\r\n")
+        if task['completed']:
+            lines.append("STATUS:COMPLETED\r\n")
+            if task.get('completed_at'):
+                lines.append(f"COMPLETED:{ics_time(task['completed_at'])}\r\n")
+        else:
+            lines.append("STATUS:NEEDS-ACTION\r\n")
+        lines.append("END:VTODO\r\n")
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "".join(lines)
+            lines = []
+    lines.append("END:VCALENDAR\r\n")
+    yield "".join(lines)
+
+EXPORT_FORMATS = {
+    '.csv': csv_chunks,
+    '.md': markdown_chunks,
+    '.ics': ics_chunks
+}
+
+def export_format(path):
+    # The format of an export file, picked by extension like the imports
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Cannot export to {extension or 'a file without extension'}: use {', '.join(EXPORT_FORMATS)}")
+    return EXPORT_FORMATS[extension]
+
+def write_export(path, tasks, chunks=None):
+    # Stream tasks (tasks.json objects, from any iterable) to path in the format of
+    # its extension. The file is written beside the target and renamed over it, so
+    # a failed or cancelled export leaves any earlier one in place.
+    chunks = chunks or export_format(path)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks(tasks):
+                f.write(chunk)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(temp_path, path)
+
+class TaskExport:
+    # An export of a live view (e.g. the app's filtered list). The UI thread calls
+    # step() from a timer: each batch of the view is read there, where the view
+    # may be used, and queued as plain dicts; a worker thread formats and writes
+    # them. The queue is bounded, so reading waits for writing rather than
+    # buffering the list. Each batch resumes after the last task read, so tasks
+    # added or removed meanwhile do not shift the rest of the export.
+    def __init__(self, view, path, batch_size=EXPORT_BATCH_SIZE):
+        self.chunks = export_format(path)
+        self.view = view
+        self.path = path
+        self.batch_size = batch_size
+        self.total = len(view)
+        self.position = 0
+        self.last = None
+        self.read = 0
+        self.written = 0
+        self.queued = False
+        self.cancelled = False
+        self.error = None
+        self.batches = queue.Queue(EXPORT_QUEUE_BATCHES)
+        self.thread = threading.Thread(target=self.run, name="todo-export", daemon=True)
+        self.thread.start()
+    
+    @property
+    def done(self):
+        # Written, cancelled or failed (see error)
+        return not self.thread.is_alive()
+    
+    def step(self):
+        # Queue the next batch if the writer has room; True once every row is queued
+        # or the writer has stopped
+        if self.done:
+            self.queued = True
+        if self.queued or self.batches.full():
+            return self.queued
+        if self.last is not None:
+            index = self.view.index_of(self.last)
+            if index is not None:
+                self.position = index + 1
+        batch = self.view[self.position:self.position + self.batch_size]
+        if not batch:
+            self.queued = True
+            self.batches.put(None)
+            return True
+        self.position += len(batch)
+        # A search view has None for a task deleted since the search
+        tasks = [task for task in batch if task is not None]
+        if tasks:
+            # As read: if the task changes later, the view no longer finds it there
+            self.last = TaskSnapshot.of(tasks[-1])
+            self.read += len(tasks)
+            self.batches.put([task.to_dict() for task in tasks])
+        return False
+    
+    def cancel(self):
+        # The worker stops at its next batch and removes the partial file
+        self.cancelled = True
+        if not self.queued:
+            self.queued = True
+            try:
+                self.batches.put_nowait(None)
+            except queue.Full:
+                pass
+    
+    def rows(self):
+        while True:
+            batch = self.batches.get()
+            if self.cancelled:
+                raise ExportCancelled()
+            if batch is None:
+                return
+            yield from batch
+            self.written += len(batch)
+    
+    def run(self):
+        try:
+            write_export(self.path, self.rows(), self.chunks)
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            self.error = e
\ No newline at end of file
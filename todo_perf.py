@@ -0,0 +1,97 @@
+# Instrumentation for finding out where the app spends its time: timing spans
+# around handlers, widget counters, an optional JSON-lines log and cProfile capture.
+# Nothing here imports tkinter; the overlay that displays it lives in the app.
+import cProfile
+import functools
+import json
+import pstats
+import time
+from collections import deque
+
+class PerfMonitor:
+    # Spans are always recorded (two perf_counter calls per handler); the log file
+    # and the profiler only cost anything when they are switched on.
+    def __init__(self, log_path=None, history=200):
+        self.latest = {}
+        self.totals = {}
+        self.recent = deque(maxlen=history)
+        self.widgets_destroyed = 0
+        self.profiler = None
+        self.log_file = open(log_path, 'a', encoding='utf-8', buffering=1) if log_path else None
+    
+    def record(self, name, seconds):
+        self.latest[name] = seconds
+        totals = self.totals.get(name)
+        if totals is None:
+            self.totals[name] = [1, seconds, seconds]
+        else:
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+        self.recent.append((name, seconds))
+        if self.log_file is not None:
+            self.log({'span': name, 'ms': round(seconds * 1000, 3)})
+    
+    def timed(self, fn):
+        # Decorator: one span per call, named after the function
+        name = fn.__name__
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return wrapper
+    
+    def widget_destroyed(self, event=None):
+        self.widgets_destroyed += 1
+    
+    def latest_spans(self, limit=8):
+        # The most recently finished spans, newest first, one line per name
+        seen = []
+        for name, _ in reversed(self.recent):
+            if name not in seen:
+                seen.append(name)
+                if len(seen) == limit:
+                    break
+        return [(name, self.latest[name]) for name in seen]
+    
+    def summary(self):
+        return {name: {'count': count, 'total_ms': round(total * 1000, 3), 'max_ms': round(longest * 1000, 3)}
+                for name, (count, total, longest) in self.totals.items()}
+    
+    def log(self, record):
+        if self.log_file is not None:
+            record['at'] = round(time.time(), 3)
+            self.log_file.write(json.dumps(record) + "\n")
+    
+    @property
+    def profiling(self):
+        return self.profiler is not None
+    
+    def start_profile(self):
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+    
+    def stop_profile(self, path, top=15):
+        # Writes the pstats file to path and the top entries by cumulative time to
+        # path + ".txt", and logs both; returns the report's path (None if not profiling)
+        profiler, self.profiler = self.profiler, None
+        if profiler is None:
+            return None
+        profiler.disable()
+        profiler.dump_stats(path)
+        report_path = path + ".txt"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(top)
+        self.log({'profile': path, 'report': report_path})
+        return report_path
+    
+    def close(self):
+        if self.log_file is not None:
+            self.log({'summary': self.summary()})
+            self.log_file.close()
+            self.log_file = None
\ No newline at end of file
@@ -0,0 +1,420 @@
+# Optional JSON-RPC 2.0 server on a Unix domain socket, so scripts and other tools
+# can change tasks in a running app (or in `python todo.py serve`) through its engine:
+#   TODO_RPC_SOCKET=/tmp/todo.sock python Task-1.py
+#   echo '{"jsonrpc": "2.0", "id": 1, "method": "add", "params": {"text": "Call Bob"}}' | nc -U /tmp/todo.sock
+# Each line is one request or a batch array, and responses come back one line each
+# in request order, so a client may send many requests before reading any replies.
+# Methods: add, toggle, edit, delete, list and stats.
+#
+# The sockets are served by an asyncio loop on a background thread, which only parses
+# and queues requests. The engine belongs to the thread that owns the UI: it calls
+# drain() (from a Tk timer, say), which runs everything queued since the last call
+# in one engine transaction, so a burst of requests costs one save and one redraw.
+import asyncio
+import json
+import os
+import socket
+import stat
+import threading
+import time
+from collections import deque
+from inspect import signature
+from todo_engine import FILTER_NAMES, PRIORITY_ORDER, display_key, parse_when
+
+# A client may have this many requests in flight before the server stops reading from it
+RPC_MAX_IN_FLIGHT = 1000
+RPC_LINE_LIMIT = 1024 * 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+UNKNOWN_TASK = -32000
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+def check_text(text):
+    if not isinstance(text, str) or not text.strip():
+        raise RpcError(INVALID_PARAMS, "text must be a non-empty string")
+    return text.strip()
+
+def check_priority(priority):
+    if priority not in PRIORITY_ORDER:
+        raise RpcError(INVALID_PARAMS, f"priority must be one of {', '.join(PRIORITY_ORDER)}")
+    return priority
+
+def check_when(value):
+    # A due_at/remind_at param; "" clears the field
+    try:
+        return parse_when(value)
+    except ValueError as e:
+        raise RpcError(INVALID_PARAMS, str(e))
+
+def check_id(engine, task_id):
+    if not isinstance(task_id, int) or isinstance(task_id, bool):
+        raise RpcError(INVALID_PARAMS, "id must be an integer")
+    task = engine.get(task_id)
+    if task is None:
+        raise RpcError(UNKNOWN_TASK, f"No task with id {task_id}")
+    return task
+
+def check_parent(engine, task_id, parent_id):
+    # A parent_id param: a live task that is not task_id or one of its subtasks;
+    # "" makes the task top-level
+    if parent_id == "":
+        return None
+    if not isinstance(parent_id, int) or isinstance(parent_id, bool):
+        raise RpcError(INVALID_PARAMS, "parent_id must be an integer")
+    try:
+        engine.check_parent(task_id, parent_id)
+    except KeyError:
+        raise RpcError(UNKNOWN_TASK, f"No task with id {parent_id}")
+    except ValueError as e:
+        raise RpcError(INVALID_PARAMS, str(e))
+    return parent_id
+
+# Methods take the engine and a Changes collector, then the request's params.
+# They return what goes into the response's "result".
+
+def rpc_add(engine, changes, text, priority='Medium', due_at=None, remind_at=None, parent_id=None):
+    parent_id = None if parent_id is None else check_parent(engine, None, parent_id)
+    task = engine.add(check_text(text), check_priority(priority), check_when(due_at), check_when(remind_at), parent_id)
+    changes.note(task, None)
+    return task.to_dict()
+
+def rpc_toggle(engine, changes, id):
+    task = check_id(engine, id)
+    old_key = changes.key_of(task)
+    task = engine.toggle(id)
+    changes.note(task, old_key)
+    return task.to_dict()
+
+def rpc_edit(engine, changes, id, text=None, priority=None, due_at=None, remind_at=None, parent_id=None):
+    task = check_id(engine, id)
+    edits = {}
+    if text is not None:
+        edits['text'] = check_text(text)
+    if priority is not None:
+        edits['priority'] = check_priority(priority)
+    if due_at is not None:
+        edits['due_at'] = check_when(due_at)
+    if remind_at is not None:
+        edits['remind_at'] = check_when(remind_at)
+    if parent_id is not None:
+        edits['parent_id'] = check_parent(engine, id, parent_id)
+    if not edits:
+        return task.to_dict()
+    old_key = changes.key_of(task)
+    task = engine.edit(id, **edits)
+    changes.note(task, old_key)
+    return task.to_dict()
+
+def rpc_delete(engine, changes, id):
+    task = check_id(engine, id)
+    old_key = changes.key_of(task)
+    task = engine.delete(id)
+    changes.note(task, old_key, removed=True)
+    return task.to_dict()
+
+def rpc_list(engine, changes, filter='all', search=None, limit=100, offset=0, history=False):
+    if filter not in FILTER_NAMES:
+        raise RpcError(INVALID_PARAMS, f"filter must be one of {', '.join(FILTER_NAMES)}")
+    if not isinstance(limit, int) or not isinstance(offset, int) or limit < 0 or offset < 0:
+        raise RpcError(INVALID_PARAMS, "limit and offset must be non-negative integers")
+    if search:
+        tasks = engine.search(str(search), filter, bool(history))
+    else:
+        tasks = engine.filtered(filter, bool(history))
+    return {'total': len(tasks), 'tasks': [task.to_dict() for task in tasks[offset:offset + limit]]}
+
+def rpc_stats(engine, changes):
+    stats = engine.stats
+    return {
+        'total': stats.total,
+        'completed': stats.completed,
+        'pending': stats.pending,
+        'completed_today': stats.completed_today(),
+        'pending_by_priority': {priority: stats.pending_by_priority[priority] for priority in PRIORITY_ORDER},
+        'overdue': len(engine.filtered('overdue'))
+    }
+
+RPC_METHODS = {
+    'add': rpc_add,
+    'toggle': rpc_toggle,
+    'edit': rpc_edit,
+    'delete': rpc_delete,
+    'list': rpc_list,
+    'stats': rpc_stats
+}
+# Parameter names of each method after engine and changes, and which are required
+RPC_PARAMS = {name: [(param.name, param.default is param.empty) for param in list(signature(method).parameters.values())[2:]]
+              for name, method in RPC_METHODS.items()}
+
+def named_params(name, params):
+    # Positional params are matched to names in order; returns them all as keywords
+    expected = RPC_PARAMS[name]
+    if isinstance(params, list):
+        if len(params) > len(expected):
+            raise RpcError(INVALID_PARAMS, f"{name} takes at most {len(expected)} params")
+        params = {param: value for (param, _), value in zip(expected, params)}
+    elif not isinstance(params, dict):
+        raise RpcError(INVALID_PARAMS, "params must be an object or an array")
+    for param in params:
+        if not any(param == known for known, _ in expected):
+            raise RpcError(INVALID_PARAMS, f"{name} has no param {param!r}")
+    for param, required in expected:
+        if required and param not in params:
+            raise RpcError(INVALID_PARAMS, f"{name} needs param {param!r}")
+    return params
+
+class Changes:
+    # What one drain() changed, as (task, old_key, removed) triples for a UI's
+    # reconcile_task: one per task, with its key from before the first change.
+    # Changing an archived task brings it back to the task file; that moves it
+    # between history rows and live ones, so history_changed is set.
+    def __init__(self, engine):
+        self.engine = engine
+        self.changed = {}
+        self.history_changed = False
+    
+    @property
+    def items(self):
+        return list(self.changed.values())
+    
+    def key_of(self, task):
+        if task.id not in self.engine.store:
+            self.history_changed = True
+            return None
+        return display_key(task)
+    
+    def note(self, task, old_key, removed=False):
+        first = self.changed.get(task.id)
+        if first is not None:
+            old_key = first[1]
+        self.changed[task.id] = (task, old_key, removed)
+
+def error_response(request_id, code, message):
+    return {'jsonrpc': "2.0", 'id': request_id, 'error': {'code': code, 'message': message}}
+
+class RpcServer:
+    # start() and close() are called by the engine's thread, like drain(). Everything
+    # else runs on the server thread's event loop.
+    def __init__(self, engine, path):
+        self.engine = engine
+        self.path = path
+        self.queue = deque()
+        self.wake = threading.Event()
+        self.started = threading.Event()
+        self.thread = None
+        self.loop = None
+        self.server = None
+        self.clients = set()
+        self.error = None
+        self.handled = 0
+    
+    @property
+    def pending(self):
+        return bool(self.queue)
+    
+    def wait(self, timeout=None):
+        # For a loop without a UI: True once there is something to drain
+        return self.wake.wait(timeout)
+    
+    def remove_stale_socket(self):
+        # A socket file left by a process that died; one that still answers is in use
+        try:
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                return
+        except FileNotFoundError:
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.remove(self.path)
+        else:
+            raise OSError(f"{self.path} is in use by another server")
+        finally:
+            probe.close()
+    
+    def start(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise OSError("Unix domain sockets are not available on this platform")
+        self.remove_stale_socket()
+        self.thread = threading.Thread(target=self.run, name="todo-rpc", daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            raise self.error
+    
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_unix_server(self.serve_client, self.path, limit=RPC_LINE_LIMIT))
+            # Requests act with the user's rights, so only the user may connect
+            os.chmod(self.path, 0o600)
+        except Exception as e:
+            self.error = e
+            self.started.set()
+            self.loop.close()
+            return
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            for writer in self.clients:
+                writer.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+    
+    async def serve_client(self, reader, writer):
+        # Reading and answering are separate tasks, so requests keep flowing in while
+        # earlier ones wait for the engine; the bounded queue is the backpressure
+        replies = asyncio.Queue(RPC_MAX_IN_FLIGHT)
+        sender = asyncio.ensure_future(self.send_replies(replies, writer))
+        self.clients.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await replies.put(self.answered(error_response(None, PARSE_ERROR, "Request line too long")))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await replies.put(self.submit(line))
+            await replies.put(None)
+            await sender
+        except (ConnectionError, asyncio.CancelledError):
+            # The client went away, or the server is closing: whatever is still
+            # queued runs, but nobody reads the replies
+            sender.cancel()
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+    
+    async def send_replies(self, replies, writer):
+        try:
+            while True:
+                future = await replies.get()
+                if future is None:
+                    return
+                response = await future
+                if response is not None:
+                    writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+                # Flush once per burst rather than once per reply
+                if replies.empty():
+                    await writer.drain()
+        except ConnectionError:
+            # Also ends the reading side, so nothing more is queued for this client
+            writer.close()
+    
+    def answered(self, response):
+        future = self.loop.create_future()
+        future.set_result(response)
+        return future
+    
+    def submit(self, line):
+        # Parsing happens here, off the engine's thread
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return self.answered(error_response(None, PARSE_ERROR, "Parse error"))
+        if isinstance(message, list) and not message:
+            return self.answered(error_response(None, INVALID_REQUEST, "Empty batch"))
+        future = self.loop.create_future()
+        self.queue.append((message, future))
+        self.wake.set()
+        return future
+    
+    def resolve(self, done):
+        for future, response in done:
+            if not future.done():
+                future.set_result(response)
+    
+    def drain(self, budget=0.01):
+        # Run queued requests, for up to budget seconds, in one engine transaction.
+        # Returns a Changes with what they changed.
+        changes = Changes(self.engine)
+        done = []
+        self.wake.clear()
+        deadline = time.perf_counter() + budget
+        try:
+            with self.engine.transaction():
+                while self.queue and time.perf_counter() < deadline:
+                    message, future = self.queue.popleft()
+                    if isinstance(message, list):
+                        responses = [self.call(request, changes) for request in message]
+                        response = [response for response in responses if response is not None] or None
+                    else:
+                        response = self.call(message, changes)
+                    done.append((future, response))
+            # With an on_error handler the engine reports a failed save there instead of raising
+            error = self.engine.save_error
+        except Exception as e:
+            error = e
+        if error is not None:
+            # The changes ran but could not be saved: none of them is reported as done
+            for index, (future, response) in enumerate(done):
+                done[index] = (future, self.failed(response, error))
+        if self.queue:
+            self.wake.set()
+        self.handled += len(done)
+        if done:
+            try:
+                self.loop.call_soon_threadsafe(self.resolve, done)
+            except RuntimeError:
+                # The server was closed meanwhile; nobody is waiting any more
+                pass
+        return changes
+    
+    def failed(self, response, error):
+        if isinstance(response, list):
+            return [self.failed(item, error) for item in response]
+        if response is None or 'error' in response:
+            return response
+        return error_response(response['id'], INTERNAL_ERROR, f"Could not save tasks: {error}")
+    
+    def call(self, request, changes):
+        if not isinstance(request, dict) or request.get('jsonrpc') != "2.0" or not isinstance(request.get('method'), str):
+            return error_response(request.get('id') if isinstance(request, dict) else None, INVALID_REQUEST, "Invalid Request")
+        # A request without an id is a notification: it runs but gets no response
+        notification = 'id' not in request
+        request_id = request.get('id')
+        name = request['method']
+        params = request.get('params', {})
+        method = RPC_METHODS.get(name)
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {name}")
+            result = method(self.engine, changes, **named_params(name, params))
+        except RpcError as e:
+            response = error_response(request_id, e.code, str(e))
+        except KeyError as e:
+            response = error_response(request_id, UNKNOWN_TASK, f"No task with id {e.args[0]}")
+        except Exception as e:
+            response = error_response(request_id, INTERNAL_ERROR, str(e))
+        else:
+            response = {'jsonrpc': "2.0", 'id': request_id, 'result': result}
+        return None if notification else response
+    
+    def close(self):
+        # Requests still queued are dropped; their connections are closed unanswered
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(5)
\ No newline at end of file